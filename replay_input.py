@@ -0,0 +1,5 @@
+import sys
+from src.Replay.InputReplayer import main
+
+if __name__ == '__main__':
+    sys.exit(main())
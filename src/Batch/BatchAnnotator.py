@@ -0,0 +1,213 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import cv2
+import numpy as np
+from src.DrawableElement import DrawableElement
+from src.Rendering import compositing
+from src.Rendering.renderers import render_element
+from src.utils.image_rendering import to_bgra
+from src.utils.Box import Box
+
+'''
+Annotate many images with the same drawable elements. The elements are described in
+a JSON template:
+
+    {
+        "elements": [
+            {"tool": "PencilTool",
+             "instructions": {"points": [[10, 10], [200, 10]], "color": [0, 0, 255], "thickness": 3, "alpha": 255}},
+            {"tool": "TextTool",
+             "instructions": {"html": "<p>Draft</p>", "text_color": "#ff0000", "text_opacity": 1.0,
+                              "font_size": 20, "width": 120, "height": 40},
+             "transformation": [[1, 0, 20], [0, 1, 30]]}
+        ]
+    }
+
+Each worker process draws the elements once per image size with the procedural
+renderers and overlays the result on every image it is given. The outputs are
+written by the workers as soon as they are ready, so nothing is accumulated.
+'''
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+# State of a worker process
+_template_elements: List[dict] = [] # the element descriptions of the template
+_overlays: Dict[Tuple[int, int], Tuple[np.ndarray, Box]] = {} # canvas shape -> the drawn elements and their box
+
+
+def load_template(path: str) -> List[dict]:
+    '''
+    Read the element descriptions from a template file.
+    '''
+    with open(path, 'r') as file:
+        template = json.load(file)
+    elements = template['elements'] if isinstance(template, dict) else template
+    for element in elements:
+        if 'tool' not in element or 'instructions' not in element:
+            raise ValueError(f'Every template element needs a "tool" and "instructions": {element}')
+    return elements
+
+
+def element_from_template(description: dict, canvas_shape: Tuple[int, int]) -> DrawableElement:
+    '''
+    Create a drawable element from its template description. Elements without a size
+    (e.g. pencil lines in canvas coordinates) get the size of the canvas.
+    '''
+    size = description.get('size')
+    transformation = description.get('transformation')
+    element = DrawableElement(description['tool'],
+                              description['instructions'],
+                              size=tuple(size) if size is not None else tuple(canvas_shape),
+                              transformation=np.array(transformation, dtype=np.float32) if transformation is not None else None)
+    element.visible = description.get('visible', True)
+    return element
+
+
+def resolve_inputs(inputs: Iterable[str]) -> List[str]:
+    '''
+    Expand directories and glob patterns to a sorted list of image files.
+    '''
+    paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            paths.extend(os.path.join(pattern, name) for name in os.listdir(pattern))
+        else:
+            paths.extend(glob.glob(pattern, recursive=True))
+    return sorted({path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(path)})
+
+
+def output_path(input_path: str, output_dir: str, output_format: Optional[str]) -> str:
+    '''
+    Get the path of the annotated image. The extension is kept unless a format is given.
+    '''
+    root, extension = os.path.splitext(os.path.basename(input_path))
+    if output_format is not None:
+        extension = '.' + output_format.lstrip('.')
+    return os.path.join(output_dir, root + extension)
+
+
+def _init_worker(elements: List[dict]) -> None:
+    '''
+    Initializer of the worker processes.
+    '''
+    global _template_elements, _overlays
+    _template_elements = elements
+    _overlays = {}
+
+
+def get_overlay(canvas_shape: Tuple[int, int]) -> Tuple[np.ndarray, Box]:
+    '''
+    Get the template elements drawn on a transparent image. It is drawn once per canvas shape.
+
+    Returns:
+        (overlay, box) where overlay is the part of the drawn image inside the box covered by
+        the elements, so that only that part of every image needs to be blended
+    '''
+    if canvas_shape not in _overlays:
+        overlay = np.zeros((*canvas_shape, 4), dtype=np.uint8)
+        for description in _template_elements:
+            element = element_from_template(description, canvas_shape)
+            if not element.visible:
+                continue
+            render_element(element)
+            compositing.overlay_element_on_image(overlay, element)
+        rows = np.flatnonzero(overlay[:, :, 3].any(axis=1))
+        cols = np.flatnonzero(overlay[:, :, 3].any(axis=0))
+        if len(rows) == 0:
+            box = Box(0, 0, 0, 0)
+        else:
+            box = Box(cols[0], rows[0], cols[-1] + 1 - cols[0], rows[-1] + 1 - rows[0])
+        _overlays[canvas_shape] = (overlay[box.top:box.top + box.height, box.left:box.left + box.width].copy(), box)
+    return _overlays[canvas_shape]
+
+
+def annotate_file(input_path: str, output_path: str) -> str:
+    '''
+    Annotate a single image and write it. Runs in a worker process.
+
+    Returns:
+        str: the path of the written image
+    '''
+    image = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f'Failed to read the image: {input_path}')
+    image = to_bgra(image)
+    overlay, box = get_overlay(image.shape[:2])
+    if box.width > 0:
+        region = (slice(box.top, box.top + box.height), slice(box.left, box.left + box.width))
+        image[region] = compositing.overlay_images(image[region], overlay)
+    if os.path.splitext(output_path)[1].lower() in ('.jpg', '.jpeg'):
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    if not cv2.imwrite(output_path, image):
+        raise ValueError(f'Failed to write the image: {output_path}')
+    return output_path
+
+
+def annotate_images(input_paths: List[str],
+                    elements: List[dict],
+                    output_dir: str,
+                    output_format: Optional[str] = None,
+                    max_workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[Exception]]]:
+    '''
+    Annotate the images across a process pool. At most two images per worker are in flight
+    so that memory stays bounded however many images there are.
+
+    Yields:
+        (input path, error or None) for every image as soon as it is finished
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(elements,)) as executor:
+        pending = {}
+        paths = iter(input_paths)
+        while True:
+            # Keep the pool busy without submitting everything at once
+            while len(pending) < 2 * max_workers:
+                path = next(paths, None)
+                if path is None:
+                    break
+                future = executor.submit(annotate_file, path, output_path(path, output_dir, output_format))
+                pending[future] = path
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                yield path, future.exception()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Annotate images with the elements of a template.')
+    parser.add_argument('inputs', nargs='+', help='directories or glob patterns of images')
+    parser.add_argument('-t', '--template', required=True, help='JSON template with the elements to draw')
+    parser.add_argument('-o', '--output-dir', required=True, help='directory for the annotated images')
+    parser.add_argument('-f', '--format', default=None, help='output format e.g. png (default: keep the input format)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    input_paths = resolve_inputs(args.inputs)
+    if not input_paths:
+        print('[batch_annotate] No images found', file=sys.stderr)
+        return 1
+    elements = load_template(args.template)
+
+    start = time.perf_counter()
+    num_done, num_failed = 0, 0
+    for path, error in annotate_images(input_paths, elements, args.output_dir, args.format, args.workers):
+        num_done += 1
+        if error is not None:
+            num_failed += 1
+            print(f'[batch_annotate] {path}: {error}', file=sys.stderr)
+        elapsed = time.perf_counter() - start
+        print(f'\r[batch_annotate] {num_done}/{len(input_paths)} images '
+              f'({num_done / elapsed:.1f} images/sec)', end='', flush=True)
+    elapsed = time.perf_counter() - start
+    print(f'\n[batch_annotate] Annotated {num_done - num_failed} images in {elapsed:.2f}s '
+          f'({num_done / elapsed:.1f} images/sec), {num_failed} failed')
+    return 0 if num_failed == 0 else 2
@@ -1,11 +1,187 @@
+import os
+import pickle
+import tempfile
+import zlib
+from typing import Optional, Union
 from src.Memento import Memento
 from src.config import config
 
+
+class PackedMemento:
+    '''
+    A memento which is no longer among the most recent ones. It is pickled and
+    compressed with zlib. If the compressed data is still large it is spilled to
+    a temporary file on disk. The original memento is restored with `unpack()`.
+    '''
+    def __init__(self,
+                 memento: Memento,
+                 compression_level: int,
+                 spill_dir: Optional[str] = None):
+        data = zlib.compress(pickle.dumps(memento, protocol=pickle.HIGHEST_PROTOCOL), compression_level)
+        self.nbytes = len(data) # the size of the compressed memento
+        self._data = data # the compressed memento if it is kept in memory
+        self._path = None # the path of the file if the memento is spilled to disk
+
+        if spill_dir is not None:
+            self.spill(spill_dir)
+
+    def spill(self, spill_dir: str) -> None:
+        '''
+        Move the already compressed memento to a temporary file in spill_dir.
+        '''
+        if self._path is not None:
+            return
+        fd, self._path = tempfile.mkstemp(suffix='.memento', dir=spill_dir)
+        with os.fdopen(fd, 'wb') as file:
+            file.write(self._data)
+        self._data = None
+
+    @property
+    def is_spilled(self) -> bool:
+        return self._path is not None
+
+    def unpack(self) -> Memento:
+        '''
+        Load the memento back from memory or from the disk.
+
+        Returns:
+            Memento: a new copy of the memento that was packed
+        '''
+        if self._path is not None:
+            with open(self._path, 'rb') as file:
+                data = file.read()
+        else:
+            data = self._data
+        return pickle.loads(zlib.decompress(data))
+
+    def discard(self) -> None:
+        '''
+        Free the resources held by the packed memento (e.g. delete the spilled file).
+        '''
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except FileNotFoundError:
+                pass
+            self._path = None
+        self._data = None
+
+
+class MementoHistory:
+    '''
+    A ring buffer with a fixed capacity holding the mementos of a single object.
+    The `num_uncompressed` most recent mementos are kept as they are. Older ones
+    are packed (see PackedMemento) and unpacked transparently when accessed.
+    '''
+    def __init__(self,
+                 capacity: int,
+                 num_uncompressed: int,
+                 compression_level: int,
+                 spill_threshold: int,
+                 caretaker: 'Caretaker'):
+        self.capacity = capacity
+        self.num_uncompressed = num_uncompressed
+        self.compression_level = compression_level
+        self.spill_threshold = spill_threshold # compressed size in bytes above which to spill to disk
+        self.caretaker = caretaker # used to get the directory for spilled mementos
+        self._slots = [None] * capacity # Memento or PackedMemento objects
+        self._start = 0 # the physical index of the oldest memento
+        self._size = 0 # the number of mementos stored
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> Memento:
+        entry = self._slots[self._physical_index(index)]
+        if isinstance(entry, PackedMemento):
+            return entry.unpack()
+        return entry
+
+    def __setitem__(self, index: int, memento: Memento) -> None:
+        physical_index = self._physical_index(index)
+        self._discard(physical_index)
+        self._slots[physical_index] = memento
+
+    def _physical_index(self, index: int) -> int:
+        '''
+        Convert a logical index (0 is the oldest memento, -1 the newest) to an index in self._slots.
+        '''
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('MementoHistory index out of range')
+        return (self._start + index) % self.capacity
+
+    def _discard(self, physical_index: int) -> None:
+        entry = self._slots[physical_index]
+        if isinstance(entry, PackedMemento):
+            entry.discard()
+        self._slots[physical_index] = None
+
+    def append(self, memento: Memento) -> None:
+        '''
+        Append a memento as the newest one. If the buffer is full the oldest memento is overwritten.
+        '''
+        if self._size == self.capacity:
+            # Drop the oldest memento in O(1)
+            self._discard(self._start)
+            self._start = (self._start + 1) % self.capacity
+            self._size -= 1
+        self._slots[(self._start + self._size) % self.capacity] = memento
+        self._size += 1
+
+        # Pack the memento which just left the window of recent mementos
+        packed_index = self._size - 1 - self.num_uncompressed
+        if packed_index >= 0:
+            self._pack(self._physical_index(packed_index))
+
+    def _pack(self, physical_index: int) -> None:
+        memento = self._slots[physical_index]
+        if memento is None or isinstance(memento, PackedMemento):
+            return
+        packed = PackedMemento(memento, self.compression_level)
+        if packed.nbytes >= self.spill_threshold:
+            # Spill the compressed bytes instead of compressing the memento again
+            packed.spill(self.caretaker.spill_dir)
+        self._slots[physical_index] = packed
+
+    def truncate(self, size: int) -> None:
+        '''
+        Keep only the `size` oldest mementos (e.g. drop undone steps).
+        '''
+        for index in range(size, self._size):
+            self._discard(self._physical_index(index))
+        self._size = min(size, self._size)
+
+    def clear(self) -> None:
+        self.truncate(0)
+        self._start = 0
+
+
 class Caretaker():
     def __init__(self):
-        self._mementos = {} # obj_id -> list of mementos
+        self._mementos = {} # obj_id -> MementoHistory
         self._idx = {} # obj_id -> index of current memento
-        self._max_mementos = {} # obj_id -> the maximum number of mementos to be stored
+        self._spill_dir: Optional[tempfile.TemporaryDirectory] = None # created on the first spill
+
+    @property
+    def spill_dir(self) -> str:
+        '''
+        The temporary directory used for spilled mementos. It is removed when the Caretaker is destroyed.
+        '''
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.TemporaryDirectory(prefix='pypainter_mementos_')
+        return self._spill_dir.name
+
+    def create_history(self) -> MementoHistory:
+        '''
+        Create an empty MementoHistory configured from the config file.
+        '''
+        return MementoHistory(capacity=config['mementos']['max_num_mementos'],
+                              num_uncompressed=config['mementos']['num_uncompressed'],
+                              compression_level=config['mementos']['compression_level'],
+                              spill_threshold=config['mementos']['spill_threshold_bytes'],
+                              caretaker=self)
 
     def save(self, obj_id:str, memento:Memento) -> None:
         '''
@@ -16,34 +192,29 @@ class Caretaker():
             memento: the Memento object
         '''
         if obj_id not in self._mementos:
-            self._mementos[obj_id] = []
+            self._mementos[obj_id] = self.create_history()
             self._idx[obj_id] = -1
-            self._max_mementos[obj_id] = config['mementos']['max_num_mementos']
+        history = self._mementos[obj_id]
 
         # Check if we should overwrite mementos
-        if len(self._mementos[obj_id]) > 0 and self._idx[obj_id] == len(self._mementos[obj_id]) - 1:
+        if len(history) > 0 and self._idx[obj_id] == len(history) - 1:
             # We are on the newest memento. Compare the newest memento with the the new one
-            if memento.is_related(self._mementos[obj_id][-1]):
+            if memento.is_related(history[-1]):
                 # Overwrite the last memento if they are related
-                self._mementos[obj_id][-1] = memento
+                history[-1] = memento
                 return
 
         # Remove any mementos after the current index (in case of undone steps)
-        if len(self._mementos[obj_id]) > 0 and self._idx[obj_id] < len(self._mementos[obj_id]) - 1:
-            self._mementos[obj_id] = self._mementos[obj_id][:self._idx[obj_id] + 1]
-
-        # Append the new memento
-        self._mementos[obj_id].append(memento)
+        if len(history) > 0 and self._idx[obj_id] < len(history) - 1:
+            history.truncate(self._idx[obj_id] + 1)
 
-        # Check if the number of mementos exceeds the maximum limit
-        if len(self._mementos[obj_id]) > self._max_mementos[obj_id]:
-            # Remove the oldest memento
-            self._mementos[obj_id].pop(0)
+        # Append the new memento. The ring buffer drops the oldest memento if it is full
+        history.append(memento)
 
         # Updae the current index to point to the last memento
-        self._idx[obj_id] = len(self._mementos[obj_id]) - 1
+        self._idx[obj_id] = len(history) - 1
 
-    def undo(self, obj_id:str):
+    def undo(self, obj_id:str) -> Union[Memento, None]:
         '''
         Undo - load one memento back in the history if there is a such one
 
@@ -59,7 +230,7 @@ class Caretaker():
         # Return the current memento object
         return self._mementos[obj_id][self._idx[obj_id]]
 
-    def redo(self, obj_id:str):
+    def redo(self, obj_id:str) -> Union[Memento, None]:
         '''
         Redo - load one memento ahead in the history if there is a such one
 
@@ -75,4 +246,4 @@ class Caretaker():
         # Return the current memento object
         return self._mementos[obj_id][self._idx[obj_id]]
 
-caretaker = Caretaker()
\ No newline at end of file
+caretaker = Caretaker()
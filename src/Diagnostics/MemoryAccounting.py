@@ -0,0 +1,246 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from src.Project.LazyRaster import LazyRaster
+from src.Rendering.TextRenderCache import text_render_cache
+
+'''
+Accounting of the memory held by a document: the images of the layers, the rasters and
+touch masks of the elements, the cached unions of layers, the cached drawn texts, the
+fake layer, the canvas, the thumbnails and the capture history. The result is a tree of MemoryNodes, e.g.
+PyPainter > layers > layer 3 > elements > element 17 (PencilTool) > touch_mask.
+
+Arrays are counted once per buffer. A view or an alias of an array which is already
+counted (e.g. the final image of a layer without elements is its image) is reported
+as shared with 0 bytes. A view of a bigger array counts the whole array because that
+is the memory it keeps alive. Lazily loaded rasters only count their decoded tiles.
+'''
+
+
+class MemoryNode:
+    '''
+    A named amount of memory and the parts it consists of.
+    '''
+    def __init__(self, name: str, nbytes: int = 0, note: str = ''):
+        '''
+        Parameters:
+            name: e.g. 'layer 3' or 'final_image'
+            nbytes: the bytes held by the node itself (not by its children)
+            note: details e.g. the shape of an array or 'shared'
+        '''
+        self.name = name
+        self.nbytes = nbytes
+        self.note = note
+        self.children: List['MemoryNode'] = []
+
+    def add(self, child: 'MemoryNode') -> 'MemoryNode':
+        self.children.append(child)
+        return child
+
+    @property
+    def total(self) -> int:
+        '''
+        The bytes held by the node and all its children.
+        '''
+        return self.nbytes + sum(child.total for child in self.children)
+
+    def find(self, *path: str) -> Optional['MemoryNode']:
+        '''
+        Get a descendant by the names on the path to it, e.g. find('layers', 'layer 0').
+        '''
+        node = self
+        for name in path:
+            node = next((child for child in node.children if child.name == name), None)
+            if node is None:
+                return None
+        return node
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'bytes': self.total, 'own_bytes': self.nbytes, 'note': self.note,
+                'children': [child.to_dict() for child in self.children]}
+
+
+class MemoryAccountant:
+    '''
+    Build MemoryNodes for the parts of a document remembering which buffers were already
+    counted. Use one accountant per report.
+    '''
+    def __init__(self):
+        self.counted: Dict[int, Any] = {} # id of a counted buffer -> the buffer (keeps the id valid)
+
+    def array(self, name: str, value: Any) -> MemoryNode:
+        '''
+        Account for an image, a mask or any other buffer.
+
+        Parameters:
+            name: the name of the node
+            value: np.ndarray, LazyRaster, bytes or None
+        '''
+        if value is None:
+            return MemoryNode(name, 0, 'empty')
+        if isinstance(value, LazyRaster):
+            return MemoryNode(name, value.decoded_nbytes, f'lazy {shape_note(value.shape)} of {value.nbytes}')
+        if isinstance(value, (bytes, bytearray)):
+            return self._count(name, value, len(value), 'compressed')
+        if isinstance(value, np.ndarray):
+            root = value
+            while isinstance(root.base, np.ndarray):
+                root = root.base
+            if root.base is not None:
+                # A view of a buffer which is not an array e.g. a memory mapped file
+                return self._count(name, root.base, value.nbytes, shape_note(value.shape) + ' mapped')
+            note = shape_note(value.shape) if root is value else f'{shape_note(value.shape)} view of {shape_note(root.shape)}'
+            return self._count(name, root, root.nbytes, note)
+        return MemoryNode(name, int(getattr(value, 'nbytes', 0)), type(value).__name__)
+
+    def _count(self, name: str, buffer: Any, nbytes: int, note: str) -> MemoryNode:
+        if id(buffer) in self.counted:
+            return MemoryNode(name, 0, 'shared')
+        self.counted[id(buffer)] = buffer
+        return MemoryNode(name, nbytes, note)
+
+    def element(self, element) -> MemoryNode:
+        '''
+        Account for the raster and the touch mask of a DrawableElement.
+        '''
+        node = MemoryNode(f'element {element.id} ({element.tool})', note='' if element.visible else 'hidden')
+        node.add(self.array('image', element.image))
+        node.add(self.array('touch_mask', element.touch_mask))
+        return node
+
+    def layer(self, layer, name: str = None) -> MemoryNode:
+        '''
+        Account for the image and the final image of a Layer and for its elements.
+        '''
+        node = MemoryNode(name or f'layer {layer.id}', note='' if layer.visible else 'hidden')
+        node.add(self.array('image', layer.image))
+        node.add(self.array('final_image', layer.final_image))
+        elements = node.add(MemoryNode('elements', note=f'{len(layer.elements)} elements'))
+        for element in layer.elements:
+            elements.add(self.element(element))
+        return node
+
+    def layers_cache(self, cache) -> MemoryNode:
+        '''
+        Account for every cached union of layers of a LayersCache.
+        '''
+        node = MemoryNode('layers cache', note=f'{len(cache.cache)} entries')
+        for layers_tuple, entry in cache.cache.items():
+            node.add(self.array(f'layers {layers_tuple}', entry['data']))
+        return node
+
+    def thumbnails(self, name: str, pixmaps: Iterable[Any]) -> MemoryNode:
+        '''
+        Account for the QPixmaps shown in a list of layers or elements.
+        '''
+        pixmaps = [pixmap for pixmap in pixmaps if pixmap is not None]
+        return MemoryNode(name, sum(pixmap_nbytes(pixmap) for pixmap in pixmaps), f'{len(pixmaps)} pixmaps')
+
+    def text_render_cache(self, cache) -> MemoryNode:
+        '''
+        Account for the drawn texts kept in a TextRenderCache. The texts shown by elements
+        are counted with the elements.
+        '''
+        node = MemoryNode('text render cache', note=f'{len(cache)} texts')
+        for i, (_, (image, touch_mask)) in enumerate(cache.entries()):
+            entry_node = node.add(MemoryNode(f'text {i}', note=shape_note(image.shape)))
+            entry_node.add(self.array('image', image))
+            entry_node.add(self.array('touch_mask', touch_mask))
+        return node
+
+    def capture_history(self, history) -> MemoryNode:
+        '''
+        Account for the screenshots kept in a CaptureHistory.
+        '''
+        node = MemoryNode('capture history', note=f'{len(history)} screenshots')
+        for entry in history.entries():
+            entry_node = node.add(MemoryNode(f'screenshot {entry.id}', note=shape_note(entry.shape)))
+            entry_node.add(self.array('thumbnail', entry.thumbnail))
+            entry_node.add(self.array('image', entry.image) if entry.image is not None else self.array('data', entry.data))
+        return node
+
+
+def account_image_processor(image_processor, capture_history=None) -> MemoryNode:
+    '''
+    Account for the memory held by the document of an ImageProcessor and the parts of the
+    application showing it.
+
+    Parameters:
+        image_processor: the ImageProcessor
+        capture_history: the CaptureHistory of the Screenshooter (optional)
+    Returns:
+        MemoryNode: 'PyPainter' with the subsystems 'layers', 'fake layer', 'layers cache',
+            'text render cache', 'canvas', 'thumbnails' and 'capture history' as children
+    '''
+    accountant = MemoryAccountant()
+    root = MemoryNode('PyPainter')
+    layer_list = image_processor.layer_list
+
+    # The layers first so that the aliases of their images elsewhere show up as shared
+    layers = root.add(MemoryNode('layers', note=f'{len(layer_list.layer_list)} layers'))
+    for layer in layer_list.layer_list:
+        layers.add(accountant.layer(layer))
+    if image_processor.fake_layer is not None:
+        root.add(accountant.layer(image_processor.fake_layer, 'fake layer'))
+    root.add(accountant.layers_cache(layer_list.cache))
+    root.add(accountant.text_render_cache(text_render_cache))
+
+    canvas = root.add(MemoryNode('canvas'))
+    canvas.add(accountant.array('final_image', image_processor.final_image))
+    zoomable_label = image_processor.zoomable_label
+    canvas.add(accountant.array('original_image', getattr(zoomable_label, 'original_image', None)))
+    canvas.add(accountant.array('transformed_image', getattr(zoomable_label, 'transformed_image', None)))
+
+    thumbnails = root.add(MemoryNode('thumbnails'))
+    if layer_list.gui is not None:
+        thumbnails.add(accountant.thumbnails('layer list', (mapping['image_label'].pixmap()
+            for mapping in layer_list.gui.gui_mapping.values() if mapping['image_label'] is not None)))
+    for layer in layer_list.layer_list:
+        if layer.gui is not None:
+            thumbnails.add(accountant.thumbnails(f'elements of layer {layer.id}', layer.gui.thumbnail_pixmaps()))
+
+    if capture_history is not None:
+        root.add(accountant.capture_history(capture_history))
+    return root
+
+
+def pixmap_nbytes(pixmap) -> int:
+    '''
+    The bytes of the pixels of a QPixmap or a QImage.
+    '''
+    if pixmap.isNull():
+        return 0
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+def shape_note(shape) -> str:
+    return 'x'.join(str(side) for side in shape)
+
+
+def process_rss() -> Optional[int]:
+    '''
+    The resident set size of the process in bytes. On systems without /proc the peak
+    resident set size is returned. None if it is not available.
+    '''
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource # not available on Windows
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, OSError, ValueError):
+        return None
+    return max_rss if os.uname().sysname == 'Darwin' else max_rss * 1024 # bytes on macOS, KiB elsewhere
+
+
+def format_bytes(nbytes: int) -> str:
+    '''
+    Format a number of bytes e.g. 1536 -> '1.5 KiB'.
+    '''
+    size = float(nbytes)
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024 or unit == 'GiB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
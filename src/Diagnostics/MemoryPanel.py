@@ -0,0 +1,93 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import Qt, QTimer
+from typing import Callable, Set, Tuple
+from src.Diagnostics.MemoryAccounting import MemoryNode, format_bytes, process_rss
+from src.config import config
+
+
+class MemoryPanel(QWidget):
+    '''
+    A window showing the memory accounting of the document as a tree with the biggest parts
+    first. It is refreshed periodically while it is visible.
+    '''
+
+    # The columns of the tree
+    COLUMN_NAME, COLUMN_SIZE, COLUMN_SHARE, COLUMN_NOTE = range(4)
+
+    def __init__(self, callback_report: Callable[[], MemoryNode], parent=None):
+        '''
+        Parameters:
+            callback_report: returns the current memory accounting (see account_image_processor)
+        '''
+        super().__init__(parent, Qt.Window)
+        self.callback_report = callback_report
+        self.setWindowTitle('Memory Usage')
+        self.resize(560, 480)
+
+        self.summary_label = QLabel()
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(['Part', 'Size', 'Share', 'Details'])
+        self.tree.setColumnWidth(self.COLUMN_NAME, 240)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.tree)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(config['memory_panel']['refresh_ms'])
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop() # do not account for the memory while nobody is looking
+
+    def refresh(self):
+        '''
+        Account for the memory again and show it keeping the expanded parts of the tree expanded.
+        '''
+        report = self.callback_report()
+        total = report.total
+        rss = process_rss()
+        summary = f'Accounted: {format_bytes(total)}'
+        if rss is not None:
+            summary = f'Process RSS: {format_bytes(rss)}    {summary}    Other: {format_bytes(max(0, rss - total))}'
+        self.summary_label.setText(summary)
+
+        expanded = self.expanded_paths()
+        self.tree.clear()
+        for child in sorted(report.children, key=lambda node: -node.total):
+            self.tree.addTopLevelItem(self.create_item(child, total, (child.name,)))
+        # Items can only be expanded once they are in the tree
+        items = [self.tree.topLevelItem(i) for i in range(self.tree.topLevelItemCount())]
+        while items:
+            item = items.pop()
+            if tuple(item.data(self.COLUMN_NAME, Qt.UserRole)) in expanded:
+                item.setExpanded(True)
+                items.extend(item.child(i) for i in range(item.childCount()))
+
+    def create_item(self, node: MemoryNode, total: int, path: Tuple[str, ...]) -> QTreeWidgetItem:
+        share = f'{100 * node.total / total:.1f}%' if total else ''
+        item = QTreeWidgetItem([node.name, format_bytes(node.total), share, node.note])
+        item.setData(self.COLUMN_NAME, Qt.UserRole, path)
+        item.setTextAlignment(self.COLUMN_SIZE, Qt.AlignRight | Qt.AlignVCenter)
+        item.setTextAlignment(self.COLUMN_SHARE, Qt.AlignRight | Qt.AlignVCenter)
+        for child in sorted(node.children, key=lambda child: -child.total):
+            item.addChild(self.create_item(child, total, (*path, child.name)))
+        return item
+
+    def expanded_paths(self) -> Set[Tuple[str, ...]]:
+        '''
+        Get the paths of the names of the expanded items.
+        '''
+        paths = set()
+        items = [self.tree.topLevelItem(i) for i in range(self.tree.topLevelItemCount())]
+        while items:
+            item = items.pop()
+            if item.isExpanded():
+                paths.add(tuple(item.data(self.COLUMN_NAME, Qt.UserRole)))
+                items.extend(item.child(i) for i in range(item.childCount()))
+        return paths
@@ -1,8 +1,12 @@
 import numpy as np
 import cv2
 from typing import Tuple
+from src.utils.Box import Box
 
 class DrawableElement():
+
+    _id_counter = 0 # Class variable to ensure unique IDs.
+
     def __init__(self,
                  tool_name:str,
                  instructions:dict={},
@@ -10,7 +14,8 @@ class DrawableElement():
                  size:Tuple[int,int]=None,
                  touch_mask:np.ndarray=None,
                  transformation:np.ndarray=None):
-        self.id = None # Unique id for the drawable element
+        self.id = DrawableElement._id_counter # Unique id for the drawable element
+        DrawableElement._id_counter += 1
         self.tool = tool_name # The tool which has created the drawable element
         self.z_index = None # The z-index of the element
         self.visible = True # bool
@@ -43,6 +48,7 @@ class DrawableElement():
         # Cannot check for a touch if the element has no touchmask
         if self.touch_mask is None:
             return False
+        touch_mask = np.asarray(self.touch_mask) # decode the touch mask if it is lazily loaded
 
         # Get the inverse transformation matrix
         inverse_transformation = self.get_inverse_transformation()
@@ -53,22 +59,22 @@ class DrawableElement():
 
         # Check bounds to prevent out-of-range access
         if (local_x < 0 or local_y < 0 or
-            local_x >= self.touch_mask.shape[1] or
-            local_y >= self.touch_mask.shape[0]):
+            local_x >= touch_mask.shape[1] or
+            local_y >= touch_mask.shape[0]):
             return False
 
         # Define the bounding box for the radius around (local_x, local_y)
         x_min = max(local_x - r, 0)
-        x_max = min(local_x + r, self.touch_mask.shape[1] - 1)
+        x_max = min(local_x + r, touch_mask.shape[1] - 1)
         y_min = max(local_y - r, 0)
-        y_max = min(local_y + r, self.touch_mask.shape[0] - 1)
+        y_max = min(local_y + r, touch_mask.shape[0] - 1)
 
         # Check the area within the radius for any pixel with a value of 255
         for i in range(y_min, y_max + 1):
             for j in range(x_min, x_max + 1):
                 # Check if (i, j) is within radius `r` from (local_x, local_y)
                 if (i - local_y)**2 + (j - local_x)**2 <= r**2:
-                    if self.touch_mask[i, j] == 255:
+                    if touch_mask[i, j] == 255:
                         return True # Touched area found
         return False
 
@@ -85,6 +91,36 @@ class DrawableElement():
             ], dtype=np.float32)
         return self.transformation
 
+    def get_bounding_box(self, canvas_shape: Tuple[int, int]) -> Box:
+        '''
+        Get the box on the canvas covered by the element after applying its transformation.
+
+        Parameters:
+            canvas_shape - (height, width) of the canvas. The box is clipped to the canvas
+        Returns:
+            Box: the box covered by the element. It has zero width and height if the
+                element is outside of the canvas or has no image
+        '''
+        if self.image is None:
+            return Box(0, 0, 0, 0)
+        image = np.asarray(self.image)
+        top, left = 0, 0
+        bottom, right = image.shape[:2]
+        if image.ndim == 3 and image.shape[2] == 4:
+            # Only the non-transparent part of the element changes the canvas
+            rows = np.flatnonzero(image[:, :, 3].any(axis=1))
+            if len(rows) == 0:
+                return Box(0, 0, 0, 0)
+            cols = np.flatnonzero(image[rows[0]:rows[-1] + 1, :, 3].any(axis=0))
+            top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        corners = np.array([[left, top, 1], [right, top, 1], [left, bottom, 1], [right, bottom, 1]], dtype=np.float32)
+        transformed = corners @ self.get_transformation().T
+        left = max(0, int(np.floor(transformed[:, 0].min())))
+        top = max(0, int(np.floor(transformed[:, 1].min())))
+        right = min(canvas_shape[1], int(np.ceil(transformed[:, 0].max())))
+        bottom = min(canvas_shape[0], int(np.ceil(transformed[:, 1].max())))
+        return Box(left, top, max(0, right - left), max(0, bottom - top))
+
     def get_inverse_transformation(self) -> np.ndarray:
         '''
         Get the inverse of the transformation of the DrawableElement
@@ -0,0 +1,209 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+import cv2
+import numpy as np
+
+'''
+Export a flattened image to several files in parallel. The encoding (cv2.resize and
+cv2.imencode release the GIL) and the writing happen on worker threads so that the
+caller is not blocked. This module has no Qt dependency (see QtExporter for the Qt signals).
+'''
+
+# Supported formats -> file extension used by cv2.imencode
+FORMATS: Dict[str, str] = {
+    'png': '.png',
+    'jpg': '.jpg',
+    'webp': '.webp',
+    'tiff': '.tiff',
+}
+_FORMAT_ALIASES = {'jpeg': 'jpg', 'jpe': 'jpg', 'tif': 'tiff'}
+
+
+class ExportTarget:
+    '''
+    A single file to export: the path, the format and the scale of the image.
+    '''
+    def __init__(self,
+                 path: str,
+                 scale: float = 1.0,
+                 quality: Optional[int] = None,
+                 format: Optional[str] = None):
+        '''
+        Parameters:
+            path: the destination file
+            scale: the scale of the exported image relative to the document
+            quality: the JPEG/WebP quality (0-100) or the PNG compression level (0-9).
+                If None the default from the config is used
+            format: one of FORMATS. If None it is taken from the extension of the path
+        '''
+        if format is None:
+            format = os.path.splitext(path)[1][1:]
+        format = format.lower()
+        format = _FORMAT_ALIASES.get(format, format)
+        if format not in FORMATS:
+            raise ValueError(f'Unsupported export format: {format!r}')
+        if scale <= 0:
+            raise ValueError(f'The export scale must be positive: {scale}')
+        self.path = path
+        self.scale = scale
+        self.quality = quality
+        self.format = format
+
+    def __repr__(self) -> str:
+        return f'ExportTarget({self.path!r}, scale={self.scale}, format={self.format!r})'
+
+
+def encode_image(image: np.ndarray, target: ExportTarget, defaults: Optional[dict] = None) -> bytes:
+    '''
+    Scale and encode a BGRA image for an export target.
+
+    Parameters:
+        image: the flattened BGRA image
+        target: the export target
+        defaults: the default 'png_compression', 'jpeg_quality' and 'webp_quality'
+    Returns:
+        bytes: the encoded file
+    '''
+    defaults = defaults or {}
+    if target.scale != 1.0:
+        size = (max(1, round(image.shape[1] * target.scale)), max(1, round(image.shape[0] * target.scale)))
+        interpolation = cv2.INTER_AREA if target.scale < 1.0 else cv2.INTER_CUBIC
+        image = cv2.resize(image, size, interpolation=interpolation)
+
+    params = []
+    if target.format == 'png':
+        params = [cv2.IMWRITE_PNG_COMPRESSION, _quality(target, defaults, 'png_compression', 3)]
+    elif target.format == 'jpg':
+        # JPEG has no alpha channel. Blend the image on a white background
+        image = flatten_alpha(image)
+        params = [cv2.IMWRITE_JPEG_QUALITY, _quality(target, defaults, 'jpeg_quality', 95)]
+    elif target.format == 'webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, _quality(target, defaults, 'webp_quality', 95)]
+
+    success, encoded = cv2.imencode(FORMATS[target.format], image, params)
+    if not success:
+        raise ValueError(f'Failed to encode the image as {target.format}')
+    return encoded.tobytes()
+
+
+def _quality(target: ExportTarget, defaults: dict, key: str, fallback: int) -> int:
+    if target.quality is not None:
+        return int(target.quality)
+    return int(defaults.get(key, fallback))
+
+
+def flatten_alpha(image: np.ndarray, background: int = 255) -> np.ndarray:
+    '''
+    Blend a BGRA image onto a solid background and return a BGR image.
+    '''
+    if image.ndim != 3 or image.shape[2] != 4:
+        return image
+    alpha = image[:, :, 3:4].astype(np.float32) / 255.0
+    blended = image[:, :, :3] * alpha + background * (1.0 - alpha)
+    return blended.astype(np.uint8)
+
+
+def write_file(path: str, data: bytes) -> None:
+    '''
+    Write the file next to the destination and move it in place so that a failed
+    export never leaves a truncated file behind.
+    '''
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+class ExportJob:
+    '''
+    The exports of one image to several targets.
+    '''
+    def __init__(self, targets: List[ExportTarget]):
+        self.targets = targets
+        self.futures: List[Future] = []
+        self.num_done = 0 # the number of finished targets (successfully or not)
+        self.errors: List[tuple] = [] # (target, error) of the failed targets
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return len(self.targets)
+
+    @property
+    def done(self) -> bool:
+        return all(future.done() for future in self.futures)
+
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        '''
+        Wait for all exports to finish.
+
+        Returns:
+            List[str]: the paths of the exported files
+        Raises:
+            The first error raised by an export
+        '''
+        return [future.result(timeout) for future in self.futures]
+
+    def _finish_one(self, target: ExportTarget, error: Optional[Exception]) -> int:
+        '''
+        Record a finished target. The error is recorded together with the count so that
+        all the errors are known once num_done reaches the total.
+        '''
+        with self._lock:
+            if error is not None:
+                self.errors.append((target, error))
+            self.num_done += 1
+            return self.num_done
+
+
+class Exporter:
+    '''
+    Export images on a pool of worker threads.
+    '''
+    def __init__(self, max_workers: int = 2, defaults: Optional[dict] = None):
+        '''
+        Parameters:
+            max_workers: the number of targets encoded in parallel
+            defaults: the default 'png_compression', 'jpeg_quality' and 'webp_quality'
+        '''
+        self.defaults = defaults or {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='Exporter')
+
+    def export(self,
+               image: np.ndarray,
+               targets: List[ExportTarget],
+               progress_callback: Optional[Callable[[int, int, ExportTarget, Optional[Exception]], None]] = None) -> ExportJob:
+        '''
+        Start exporting an image to every target. The image must not be modified until the
+        job is done (pass a copy if it may change).
+
+        Parameters:
+            image: the flattened BGRA image
+            targets: the files to export
+            progress_callback: called from a worker thread after each target is finished with
+                (number of finished targets, total number of targets, target, error or None)
+        Returns:
+            ExportJob: the job which can be waited on
+        '''
+        job = ExportJob(list(targets))
+        for target in job.targets:
+            job.futures.append(self.executor.submit(self._export_one, image, target, job, progress_callback))
+        return job
+
+    def _export_one(self, image: np.ndarray, target: ExportTarget, job: ExportJob, progress_callback) -> str:
+        error = None
+        try:
+            write_file(target.path, encode_image(image, target, self.defaults))
+            return target.path
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            num_done = job._finish_one(target, error)
+            if progress_callback is not None:
+                progress_callback(num_done, job.total, target, error)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,72 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from typing import List, Optional, Set
+import numpy as np
+from src.Export.Exporter import Exporter, ExportJob, ExportTarget
+
+
+class QtExportJob(QObject):
+    '''
+    Expose the progress of a single export job as Qt signals. The signals are emitted from
+    the worker threads and delivered to the connected slots in the GUI thread. Every job has
+    its own signals so that exports which overlap do not report each other's progress.
+    '''
+
+    # Signals
+    progress = pyqtSignal(int, int) # number of finished targets, total number of targets
+    exported = pyqtSignal(str) # the path of an exported file
+    failed = pyqtSignal(str, str) # the path of the file and the error message
+    finished = pyqtSignal() # all targets of the job are finished
+
+    def __init__(self, targets: List[ExportTarget]):
+        super().__init__()
+        self.targets = targets
+        self.job: Optional[ExportJob] = None # set when the job is started
+
+    @property
+    def errors(self) -> List[tuple]:
+        '''
+        The (path, error message) of the failed targets. All of them are recorded before finished is emitted.
+        '''
+        if self.job is None:
+            return []
+        return [(target.path, str(error)) for target, error in self.job.errors]
+
+    def _on_progress(self, num_done: int, total: int, target: ExportTarget, error: Optional[Exception]) -> None:
+        if error is None:
+            self.exported.emit(target.path)
+        else:
+            self.failed.emit(target.path, str(error))
+        self.progress.emit(num_done, total)
+        if num_done == total:
+            self.finished.emit()
+
+
+class QtExporter:
+    '''
+    Start export jobs whose progress is reported with Qt signals (see QtExportJob).
+    '''
+    def __init__(self, exporter: Exporter):
+        self.exporter = exporter
+        self.jobs: Set[QtExportJob] = set() # the jobs in progress (kept alive until they finish)
+
+    def create_job(self, targets: List[ExportTarget]) -> QtExportJob:
+        '''
+        Create a job for the targets. Connect to its signals before starting it with start
+        so that no signal of a quick export is missed.
+        '''
+        return QtExportJob(list(targets))
+
+    def start(self, job: QtExportJob, image: np.ndarray) -> QtExportJob:
+        '''
+        Start exporting an image to every target of the job in the background.
+        '''
+        self.jobs.add(job)
+        job.finished.connect(lambda: self.jobs.discard(job))
+        job.job = self.exporter.export(image, job.targets, job._on_progress)
+        return job
+
+    def export(self, image: np.ndarray, targets: List[ExportTarget]) -> QtExportJob:
+        '''
+        Create and start a job for the targets.
+        '''
+        return self.start(self.create_job(targets), image)
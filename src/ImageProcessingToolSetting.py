@@ -1,10 +1,18 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QSizePolicy
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QSizePolicy, QStackedWidget
 
 class ImageProcessingToolSetting(QWidget):
+    '''
+    Show the settings of the current tool. The settings widgets are kept in a stack once
+    added, so switching back to a tool only changes which widget is shown.
+    '''
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
+        self.stack = QStackedWidget()
+        self.empty_widget = QWidget() # shown when the tool has no settings
+        self.stack.addWidget(self.empty_widget)
+        self.layout.addWidget(self.stack)
         self.current_settings_widget = None
 
         # GUI settings
@@ -12,13 +20,14 @@ class ImageProcessingToolSetting(QWidget):
         self.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
 
     def set_tool_settings_ui(self, settings_widget:QWidget):
-        # Clear existing settings widget, if any
-        if self.current_settings_widget:
-            self.layout.removeWidget(self.current_settings_widget)
-            self.current_settings_widget.deleteLater()
-            self.current_settings_widget = None
-
-        # Add the new settings widget
-        if settings_widget:
-            self.layout.addWidget(settings_widget)
-            self.current_settings_widget = settings_widget
\ No newline at end of file
+        '''
+        Show the settings widget of a tool. The widget is added to the stack the first time
+        and the previously shown widget is kept (hidden) for the next time its tool is used.
+        '''
+        if settings_widget is None:
+            self.stack.setCurrentWidget(self.empty_widget)
+        else:
+            if self.stack.indexOf(settings_widget) == -1:
+                self.stack.addWidget(settings_widget)
+            self.stack.setCurrentWidget(settings_widget)
+        self.current_settings_widget = settings_widget
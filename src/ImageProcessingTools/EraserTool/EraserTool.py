@@ -1,25 +1,15 @@
 
 from src.ImageProcessingTools.ImageProcessingTool import ImageProcessingTool
-from PyQt5.QtWidgets import QPushButton, QWidget, QVBoxLayout, QHBoxLayout
-from PyQt5.QtCore import QSize, QPoint
-from PyQt5.QtGui import QCursor, QPixmap, QPainter
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout
+from PyQt5.QtGui import QCursor
 from src.utils.image_rendering import *
-from functools import partial
+from src.utils.icon_cache import icon_cache
 
 
 class EraserTool(ImageProcessingTool):
     def __init__(self, image_processor):
         super().__init__(image_processor)
 
-    def create_ui(self):
-        """Create the button for the eraser tool."""
-        self.button = QPushButton()
-        self.button.setIcon(create_svg_icon(f'{self.resources_path}/tool_button.svg'))
-        self.button.setIconSize(QSize(36, 36))
-        self.button.setFixedSize(QSize(36, 36))
-        self.button.clicked.connect(partial(self.set_tool))
-        return self.button
-    
     def create_settings_ui(self):
         settings_widget = QWidget()
         layout = QHBoxLayout()
@@ -58,18 +48,6 @@ class EraserTool(ImageProcessingTool):
         '''
         Set the cursor inside the zoomable widget to an eraser.
         '''
-                # Create a QPixmap to hold the rendered SVG image
-        pixmap = QPixmap(32, 32)  # Specify the size of the pixmap for the cursor
-        pixmap.fill(Qt.transparent)  # Fill it with transparency
-        # Use QSvgRenderer to render the SVG onto the QPixmap
-        renderer = QSvgRenderer(f'{self.resources_path}/cursor_eraser.svg')
-        painter = QPainter(pixmap)
-        renderer.render(painter)
-        painter.end()
-
-        #Set the cursor hotspot to the lower-left corner
-        hotspot = QPoint(0, pixmap.height() - 1)
-
-        # Create the cursor and set it
-        cursor = QCursor(pixmap, hotspot.x(), hotspot.y())
+        # Create the cursor (rasterized once, see icon_cache) with the hotspot at the lower-left corner
+        cursor = icon_cache.cursor(f'{self.resources_path}/cursor_eraser.svg', (32, 32), hotspot=(0, 31))
         self.image_processor.zoomable_widget.setCursor(cursor)
\ No newline at end of file
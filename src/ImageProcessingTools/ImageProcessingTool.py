@@ -1,6 +1,9 @@
 import numpy as np
 from typing import List
+from PyQt5.QtWidgets import QPushButton
+from PyQt5.QtCore import QSize
 from src.DrawableElement import DrawableElement
+from src.utils.image_rendering import create_svg_icon
 
 '''
 ImageProcessingTool is the parent class of all tools.
@@ -19,13 +22,33 @@ class ImageProcessingTool(metaclass=ToolMetaClass):
         self.image_processor = image_processor
         self.drawing_enabled = False
         self.resources_path = f'resources/tools/{self.__class__.__name__}'
+        self.settings_widget = None # created on the first activation (see get_settings_ui)
 
         # Load the part of the config file responsible for the tool
         self.config = self.load_config()
 
-    def create_ui(self):
-        """Create the UI elements for this tool."""
-        raise NotImplementedError("This method should be overridden in subclasses.")
+    def create_ui(self, button: QPushButton = None) -> QPushButton:
+        '''
+        Create the button of the tool shown with the other tools.
+
+        Parameters:
+            button: the button created for the tool before the tool was loaded (see
+                ToolManager.create_tool_button). It is used instead of creating a new one.
+        '''
+        if button is None:
+            button = create_tool_button(f'{self.resources_path}/tool_button.svg')
+            button.clicked.connect(lambda: self.set_tool())
+        self.button = button
+        return self.button
+
+    def get_settings_ui(self):
+        '''
+        Get the settings widget of the tool. It is created with create_settings_ui the first
+        time and reused afterwards so that switching tools does not rebuild it.
+        '''
+        if self.settings_widget is None:
+            self.settings_widget = self.create_settings_ui()
+        return self.settings_widget
 
     def on_mouse_down(self, x: int, y: int):
         """Called when the mouse is pressed."""
@@ -102,4 +125,15 @@ class ImageProcessingTool(metaclass=ToolMetaClass):
         return drawable_element
 
     def draw_drawable_element(self, drawable_element:DrawableElement):
-        raise NotImplementedError("This method should be overridden in subclasses.")
\ No newline at end of file
+        raise NotImplementedError("This method should be overridden in subclasses.")
+
+
+def create_tool_button(icon_path: str) -> QPushButton:
+    '''
+    Create the button of a tool with its icon.
+    '''
+    button = QPushButton()
+    button.setIcon(create_svg_icon(icon_path))
+    button.setIconSize(QSize(36, 36))
+    button.setFixedSize(QSize(36, 36))
+    return button
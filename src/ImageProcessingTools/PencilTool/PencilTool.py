@@ -1,15 +1,14 @@
 from src.ImageProcessingTools.ImageProcessingTool import ImageProcessingTool
 from PyQt5.QtWidgets import QPushButton, QVBoxLayout, QSlider, QLabel, QWidget, QColorDialog
-from PyQt5.QtCore import Qt, QPoint, QSize
-from PyQt5.QtGui import QCursor, QPixmap, QPainter
-from PyQt5.QtSvg import QSvgRenderer
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QCursor
 import cv2
 import numpy as np
-from functools import partial
 import copy
 from typing import List, Tuple
 from src.DrawableElement import DrawableElement
-from src.utils.image_rendering import create_svg_icon
+from src.Rendering.renderers import catmull_rom_spline, draw_pencil
+from src.utils.icon_cache import icon_cache
 
 class PencilTool(ImageProcessingTool):
     def __init__(self, image_processor):
@@ -23,15 +22,6 @@ class PencilTool(ImageProcessingTool):
 
         self.grayscale_mask = None # a cv2 image with 1 channel. 255 => we have drawn here, 0 => we have not drawn here
 
-    def create_ui(self):
-        """Create the button for the pencil tool."""
-        self.button = QPushButton()
-        self.button.setIcon(create_svg_icon(f'{self.resources_path}/tool_button.svg'))
-        self.button.setIconSize(QSize(36, 36))
-        self.button.setFixedSize(QSize(36, 36))
-        self.button.clicked.connect(partial(self.set_tool))
-        return self.button
-
     def enable(self):
         '''
         Overriding the default `ImageProcessingTool.enable()` method to customise the cursor
@@ -138,6 +128,7 @@ class PencilTool(ImageProcessingTool):
             cropped_image = drawable_element_image[min_y:max_y, min_x:max_x]
             self.grayscale_mask = self.grayscale_mask[min_y:max_y, min_x:max_x]
             transformation = np.array([[1, 0, min_x], [0, 1, min_y]], dtype=np.float32) # The affine transformation with offset
+            instructions['origin'] = (int(min_x), int(min_y)) # the position of the cropped image on the canvas
             # Clear the fake layer
             self.image_processor.fake_layer.clear_final_image()
             # Create the new drawable element
@@ -150,77 +141,16 @@ class PencilTool(ImageProcessingTool):
 
     def catmull_rom_spline(self, p0, p1, p2, p3, num_points=100):
         """
-        Calculate Catmull-Rom spline points.
-
-        Parameters:
-            p0, p1, p2, p3 - Tuples (x, y) for the control points
-            num_points - Number of points to generate along the spline
-        Returns:
-            List of interpolated points along the Catmull-Rom spline
+        Calculate Catmull-Rom spline points (see renderers.catmull_rom_spline).
         """
-        p0, p1, p2, p3 = np.array(p0), np.array(p1), np.array(p2), np.array(p3)
-        interpolated_points = []
-        # Calculate each interpolated point
-        for i in range(num_points + 1):
-            t = i / num_points # Parameter t ranges from 0 to 1
-            # Catmull-Rom spline formula
-            point = 0.5 * ((2 * p1) +
-                           (-p0 + p2) * t +
-                           (2*p0 - 5*p1 + 4*p2 - p3) * t**2 +
-                           (-p0 + 3*p1 - 3*p2 + p3) * t**3)
-            interpolated_points.append((int(point[0]), int(point[1])))
-        return interpolated_points
+        return catmull_rom_spline(p0, p1, p2, p3, num_points)
 
     def draw_drawable_element(self, drawable_element:DrawableElement) -> None:
         '''
         Draw the drawable from the instructions.
         Update drawable_element.image using drawable_element.instructions.
-        Note: The pencil first draws white on a cleared image. Then the white areas are 
-        made non transparent and with the right color
         '''
-        # Clear the image before drawing
-        drawable_element.clear_image()
-
-        # Get the instructions for drawing the DrawableElement
-        points = drawable_element.instructions['points']
-        color = drawable_element.instructions['color']
-        thickness = drawable_element.instructions['thickness']
-        alpha_value = drawable_element.instructions['alpha'] * 255
-
-        # Draw the first point
-        if len(points) >= 1:
-            cv2.circle(drawable_element.image,
-                       (points[0]),
-                       radius = 0,
-                       color=(255, 255, 255),
-                       thickness=thickness)
-        # Draw the line between the 1st and 2nd point
-        if len(points) >= 2:
-            cv2.line(drawable_element.image,
-                     points[0],
-                     points[1],
-                     color=(255, 255, 255),
-                     thickness=thickness)
-        # Draw the rest of the interpolated points/lines
-        for i in range(1, len(points) - 3):
-            # draw the between points i and i+1
-            spline_points = self.catmull_rom_spline(*points[i-1: i+3]) # calculate the spline points
-            # Draw lines between the interpolated points
-            for j in range(len(spline_points) - 1):
-                cv2.line(drawable_element.image,
-                         spline_points[j],
-                         spline_points[j + 1],
-                         color=(255, 255, 255),
-                         thickness=thickness)
-        # Create a mask for the white areas
-        mask = cv2.inRange(drawable_element.image[:, :, :3], (255, 255, 255), (255, 255, 255))
-        # Change white areas to the specified color with opacity
-        for c in range(3): # Loop over the RGB channels
-            drawable_element.image[:, :, c] = np.where(mask == 255,
-                                                    color[c],
-                                                    drawable_element.image[:, :, c])
-        # Set the alpha channel for the white areas to the desired opacity
-        drawable_element.image[mask == 255, 3] = alpha_value
+        draw_pencil(drawable_element)
 
     def create_settings_ui(self):
         settings_widget = QWidget()
@@ -271,18 +201,6 @@ class PencilTool(ImageProcessingTool):
         '''
         Set the cursor inside the zoomable widget to a pencil.
         '''
-        # Create a QPixmap to hold the rendered SVG image
-        pixmap = QPixmap(32, 32)  # Specify the size of the pixmap for the cursor
-        pixmap.fill(Qt.transparent)  # Fill it with transparency
-        # Use QSvgRenderer to render the SVG onto the QPixmap
-        renderer = QSvgRenderer('resources/tools/PencilTool/cursor_pencil.svg')
-        painter = QPainter(pixmap)
-        renderer.render(painter)
-        painter.end()
-
-        #Set the cursor hotspot to the lower-left corner
-        hotspot = QPoint(0, pixmap.height() - 1)
-
-        # Create the cursor and set it
-        cursor = QCursor(pixmap, hotspot.x(), hotspot.y())
+        # Create the cursor (rasterized once, see icon_cache) with the hotspot at the lower-left corner
+        cursor = icon_cache.cursor('resources/tools/PencilTool/cursor_pencil.svg', (32, 32), hotspot=(0, 31))
         self.image_processor.zoomable_widget.setCursor(cursor)
\ No newline at end of file
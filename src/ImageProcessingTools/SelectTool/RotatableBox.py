@@ -1,8 +1,7 @@
 from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import QFrame, QWidget
 from PyQt5.QtCore import Qt, QRect, QPoint
-from PyQt5.QtGui import QPainter, QPen, QColor, QCursor, QPixmap, QTransform
-from PyQt5.QtSvg import QSvgRenderer
+from PyQt5.QtGui import QPainter, QPen, QColor, QCursor, QTransform
 import os
 import math
 import numpy as np
@@ -10,6 +9,7 @@ from typing import Tuple, List
 from enum import IntEnum, auto
 from src.DrawableElement import DrawableElement
 from src.utils.Vector import Vector, Vect2d
+from src.utils.icon_cache import icon_cache
 from src.utils.Box import Box
 from src.config import *
 
@@ -415,16 +415,9 @@ class RotatableBox(QWidget):
         '''
         Set the resizing cursor at a given angle. angle = 0 is vertical, the cursor rotates 
         '''
-        # Load the resize cursor if it is not already loaded. TODO: think of refactoring
-        if not hasattr(self, 'resize_cursors_pixmap'):
-            # Create a QPixmap to hold the rendered SVG image
-            self.pixmap = QPixmap(32, 32)  # Specify the size of the pixmap for the cursor
-            self.pixmap.fill(Qt.transparent)  # Fill it with transparency
-            # Use QSvgRenderer to render the SVG onto the QPixmap
-            renderer = QSvgRenderer('resources/tools/SelectTool/cursor_resize.svg')
-            painter = QPainter(self.pixmap)
-            renderer.render(painter)
-            painter.end()
+        # The resize cursor is rasterized once (see icon_cache) and rotated below. The hotspot
+        # of the rotated cursor is in pixels so it is rasterized without a device pixel ratio
+        self.pixmap = icon_cache.pixmap('resources/tools/SelectTool/cursor_resize.svg', (32, 32), device_pixel_ratio=1.0)
 
         # Calculate the angle by which the cursor should be roated
         if zone == zone_areas.top_left or zone == zone_areas.bottom_right:
@@ -1,13 +1,10 @@
 from src.ImageProcessingTools.ImageProcessingTool import ImageProcessingTool
-from PyQt5.QtWidgets import QPushButton, QWidget
-from PyQt5.QtCore import QSize
-from functools import partial
+from PyQt5.QtWidgets import QWidget
 import cv2
 import numpy as np
 from enum import IntEnum, auto
 from src.DrawableElement import DrawableElement
 from src.ImageProcessingTools.SelectTool.RotatableBox import RotatableBox
-from src.utils.image_rendering import create_svg_icon
 
 class SelectTool(ImageProcessingTool):
 
@@ -22,15 +19,6 @@ class SelectTool(ImageProcessingTool):
         super().__init__(image_processor)
         self.selected_element:DrawableElement = None
 
-    def create_ui(self):
-        """Create the button for the move tool."""
-        self.button = QPushButton()
-        self.button.setIcon(create_svg_icon(f'{self.resources_path}/tool_button.svg'))
-        self.button.setIconSize(QSize(36, 36))
-        self.button.setFixedSize(QSize(36, 36))
-        self.button.clicked.connect(lambda: partial(self.set_tool)())
-        return self.button
-
     def create_settings_ui(self):
         return QWidget()
 
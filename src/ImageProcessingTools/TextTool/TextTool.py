@@ -3,13 +3,14 @@ from src.ImageProcessingTools.ImageProcessingTool import ImageProcessingTool
 from PyQt5.QtWidgets import QPushButton, QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, \
     QSlider, QLabel, QColorDialog, QFrame, QGraphicsOpacityEffect
 from PyQt5.QtCore import QSize, Qt
-from PyQt5.QtGui import QTextCursor, QTextBlockFormat, QTextCharFormat, QFont, QPixmap
-from functools import partial
+from PyQt5.QtGui import QTextCursor, QTextBlockFormat, QTextCharFormat, QFont
 from src.utils.image_rendering import *
 from src.components.FontComboBox import FontComboBox
 from src.components.IconsComboBox import IconsComboBox
 from typing import Optional, Tuple
 from src.DrawableElement import DrawableElement
+from src.Rendering.renderers import draw_text
+from src.utils.icon_cache import icon_cache
 
 class TextTool(ImageProcessingTool):
     def __init__(self, image_processor):
@@ -37,15 +38,6 @@ class TextTool(ImageProcessingTool):
         self.is_underline = False
         self.is_strikethrough = False
 
-    def create_ui(self):
-        """Create the button for the text tool."""
-        self.button = QPushButton()
-        self.button.setIcon(create_svg_icon(f'{self.resources_path}/tool_button.svg'))
-        self.button.setIconSize(QSize(36, 36))
-        self.button.setFixedSize(QSize(36, 36))
-        self.button.clicked.connect(partial(self.set_tool))
-        return self.button
-
     def create_settings_ui(self):
         settings_widget = QWidget()
         layout = QHBoxLayout()
@@ -65,7 +57,7 @@ class TextTool(ImageProcessingTool):
         font_size_layout = QHBoxLayout()
         font_size_layout.setAlignment(Qt.AlignLeft)
         font_size_label_icon = QLabel()
-        font_size_icon = QPixmap(f'{self.resources_path}/icon_font_size.svg').scaled(QSize(16, 16), aspectRatioMode=1)
+        font_size_icon = icon_cache.pixmap(f'{self.resources_path}/icon_font_size.svg', (16, 16))
         font_size_label_icon.setPixmap(font_size_icon)
         font_size_label_icon.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
         font_size_label = QLabel()
@@ -158,7 +150,7 @@ class TextTool(ImageProcessingTool):
         opacity_layout = QHBoxLayout()
         opacity_layout.setAlignment(Qt.AlignLeft)
         opacity_label_icon = QLabel()
-        opacity_icon = QPixmap(f'{self.resources_path}/icon_opacity.svg').scaled(QSize(16, 16), aspectRatioMode=1)
+        opacity_icon = icon_cache.pixmap(f'{self.resources_path}/icon_opacity.svg', (16, 16))
         opacity_label_icon.setPixmap(opacity_icon)
         opacity_label_icon.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
         self.opacity_label = QLabel(f"({int(self.text_opacity * 100)}%)")
@@ -359,31 +351,7 @@ class TextTool(ImageProcessingTool):
         Draw the drawable from the instructions.
         Update drawable element.image using drawable_element.instructions.
         '''
-        # Clear the image before drawing
-        drawable_element.clear_image()
-
-        # Create a temporary text widget
-        temp_widget = QTextEdit()
-        instructions = drawable_element.instructions
-        # Html
-        temp_widget.setHtml(instructions['html'])
-        # Style
-        temp_widget.setStyleSheet(f"""
-            QTextEdit {{
-            background: transparent;
-            border: none;
-            color: {hex_to_rgba(instructions['text_color'], instructions['text_opacity'])};
-        }}""")
-        self.resize_text_widget(temp_widget)
-
-        # Render the widget to a cv2 image
-        pixmap = QPixmap(temp_widget.size())
-        pixmap.fill(Qt.transparent)
-        temp_widget.render(pixmap)
-        cv_image = qpixmap_to_cv2(pixmap)
-
-        drawable_element.image = cv_image
-        drawable_element.touch_mask = np.ones(cv_image.shape[:2]) * 255
+        draw_text(drawable_element)
 
     def resize_text_widget(self, text_widget):
         '''
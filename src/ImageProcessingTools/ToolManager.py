@@ -1,8 +1,15 @@
 import importlib
 import os
-import yaml
 from typing import List
 from src.config import config
+from src.utils.tracing import tracer
+
+'''
+The ToolManager keeps the tools of the ImageProcessor. The tools listed in config.json are
+registered at startup from their names and order only. The module of a tool is imported and
+the tool is created the first time it is used, e.g. when its button is clicked or an element
+drawn by it has to be rendered (see get_tool).
+'''
 
 
 class ToolManager:
@@ -31,6 +38,25 @@ class ToolManager:
     def discover_downloadable_tools(self) -> List[dict]:
         pass
 
+    def register_tool(self, name: str, order: int = 5) -> None:
+        '''
+        Register a tool without loading it. It is loaded when it is used for the first time.
+
+        Args:
+            name (str): The name of the tool e.g. 'PencilTool'.
+            order (int): The position of the tool among the other tools.
+        '''
+        if name not in self.tools:
+            self.tools[name] = {
+                'class': None, # set when the tool is loaded
+                'object': None, # set when the tool is loaded
+                'order': order,
+                'button': None # the button created before the tool was loaded (if any)
+            }
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.tools and self.tools[name]['object'] is not None
+
     def load_tool(self, name: str):
         '''
         Load a tool from the ImageProcessingTools directory.
@@ -39,32 +65,60 @@ class ToolManager:
             name (str): The name of the tool to be loaded e.g. 'PencilTool'.
         '''
         # Check that the tool is not already loaded
-        if name in self.tools:
+        if self.is_loaded(name):
             return # Do not load a tool if it is already loaded
 
-        module = importlib.import_module(f'src.ImageProcessingTools.{name}.{name}')
-        tool_class = getattr(module, name)
-        tool_obj = tool_class(self.image_processor)
-        self.tools[name] = {
-            'class': tool_class,
-            'object': tool_obj,
-            'order': 5 # TODO don't leave that hardcoded!!!
-        }
+        self.register_tool(name)
+        with tracer.span('load_tool', 'tools', tool=name):
+            module = importlib.import_module(f'src.ImageProcessingTools.{name}.{name}')
+            tool_class = getattr(module, name)
+            tool_obj = tool_class(self.image_processor)
+            # Give the tool the button which was shown before it was loaded
+            tool_obj.create_ui(self.tools[name]['button'])
+        self.tools[name]['class'] = tool_class
+        self.tools[name]['object'] = tool_obj
+
+    def get_tool(self, name: str):
+        '''
+        Get a registered tool loading it if it is used for the first time.
+
+        Args:
+            name (str): The name of the tool e.g. 'PencilTool'.
+        Returns:
+            ImageProcessingTool: The tool.
+        Raises:
+            KeyError: If the tool is not registered.
+        '''
+        if name not in self.tools:
+            raise KeyError(f'The tool {name} is not registered')
+        self.load_tool(name)
+        return self.tools[name]['object']
 
     def load_tools_from_config(self) -> None:
         '''
-        Load all the tools from the config.json into the ImageProcessor.
+        Register all the tools from the config.json. The tools are loaded on first use.
         '''
         for tool in config['tools']:
-            tool_name = tool['name']
-            module = importlib.import_module(f'src.ImageProcessingTools.{tool_name}.{tool_name}')
-            tool_class = getattr(module, tool_name)
-            tool_obj = tool_class(self.image_processor)
-            self.tools[tool_name] = {
-                'class': tool_class,
-                'object': tool_obj,
-                'order': tool['order']
-            }
+            self.register_tool(tool['name'], tool['order'])
+
+    def create_tool_button(self, name: str):
+        '''
+        Create the button of a registered tool without loading the tool. Clicking the button
+        loads the tool (the first time) and sets it as the current tool.
+
+        Args:
+            name (str): The name of the tool e.g. 'PencilTool'.
+        Returns:
+            QPushButton: The button of the tool.
+        '''
+        from src.ImageProcessingTools.ImageProcessingTool import create_tool_button
+        button = create_tool_button(f'resources/tools/{name}/tool_button.svg')
+        button.setToolTip(name)
+        button.clicked.connect(lambda: self.get_tool(name).set_tool())
+        self.tools[name]['button'] = button
+        if self.is_loaded(name):
+            self.tools[name]['object'].create_ui(button)
+        return button
 
     def read_tool_configuration(self, path: str) -> dict:
         '''
@@ -76,6 +130,7 @@ class ToolManager:
         Returns:
             dict: A dictionary with all the information from the yaml file.
         '''
+        import yaml # only needed to discover tools so it is not imported at startup
         try:
             with open(path, 'r', encoding='utf-8') as file:
                 return yaml.safe_load(file)
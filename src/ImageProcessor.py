@@ -1,6 +1,5 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton
-from PyQt5.QtCore import Qt
-import cv2
+from PyQt5.QtCore import Qt, pyqtSignal
 import numpy as np
 from enum import IntEnum, auto
 import importlib
@@ -13,6 +12,13 @@ from src.Layers.Layer import Layer
 from src.Layers.LayerList import LayerList
 from src.Layers.ElementListEmitter import element_list_emitter
 from src.DrawableElement import DrawableElement
+from src.Project.ProjectFile import ProjectDocument, read_project, write_project
+from src.Project.LazyRaster import materialize
+from src.utils.Box import Box
+from src.utils.image_rendering import to_bgra
+from src.utils.tracing import tracer
+from src.Rendering import compositing
+from src.Rendering.renderers import RENDERERS, render_element
 
 from src.ImageProcessingToolSetting import ImageProcessingToolSetting
 # Import ImageProcessingTools
@@ -21,6 +27,9 @@ from src.ImageProcessingTools.ToolManager import ToolManager
 
 class ImageProcessor(QWidget):
 
+    # Signal that the document was replaced (e.g. by a new image or a loaded project)
+    document_replaced = pyqtSignal()
+
     # The available image processing tools
     class tools(IntEnum):
         move = 0
@@ -40,6 +49,8 @@ class ImageProcessor(QWidget):
 
         self.final_image = None # The final image after adding all the layers together
         self.canvas_shape: Tuple[int, int] = None # The shape of the layers, image, etc. but w/o 3rd term
+        self.document: ProjectDocument = None # The loaded project whose file is memory-mapped
+        self.image_layer: Layer = None # The layer created for the new image (see update_image_regions)
 
         self.image_processing_tool_setting = image_processing_tool_setting
 
@@ -56,10 +67,9 @@ class ImageProcessor(QWidget):
         layout.setSpacing(6)
         layout.setAlignment(Qt.AlignLeft) 
 
-        # Generate the gui for the tools from the
+        # Generate the buttons of the tools. The tools are loaded when they are used first
         for tool_name in sorted(self.tool_manager.tools.keys(), key=lambda k: self.tool_manager.tools[k]['order']):
-            tool_obj = self.tool_manager.tools[tool_name]['object']
-            tool_widget = tool_obj.create_ui()
+            tool_widget = self.tool_manager.create_tool_button(tool_name)
             layout.addWidget(tool_widget)
 
         self.setLayout(layout)
@@ -101,7 +111,8 @@ class ImageProcessor(QWidget):
 
         self.current_tool = tool
 
-        settings_ui = self.current_tool.create_settings_ui()
+        # The settings widget is built once per tool and then only shown again
+        settings_ui = self.current_tool.get_settings_ui()
         self.image_processing_tool_setting.set_tool_settings_ui(settings_ui)
 
         # Reset the mouse to be released (bug fix)
@@ -119,7 +130,8 @@ class ImageProcessor(QWidget):
             x - the x coordinate of the event on the image
             y - the y coordinate of the event on the image
         '''
-        self.current_tool.on_mouse_move(x, y)
+        with tracer.span('mouse_move', 'input'):
+            self.current_tool.on_mouse_move(x, y)
 
     def on_mouse_down(self, x:int, y:int):
         '''
@@ -129,7 +141,10 @@ class ImageProcessor(QWidget):
             x - the x coordinate of the event on the image
             y - the y coordinate of the event on the image
         '''
-        self.current_tool.on_mouse_down(x, y)
+        # The stroke is traced from the press to the release
+        tracer.begin('stroke', 'input', tool=type(self.current_tool).__name__)
+        with tracer.span('mouse_down', 'input'):
+            self.current_tool.on_mouse_down(x, y)
 
     def on_mouse_up(self, x:int, y:int):
         '''
@@ -139,33 +154,141 @@ class ImageProcessor(QWidget):
             x - the x coordinate of the event on the image
             y - the y coordinate of the event on the image
         '''
-        self.current_tool.on_mouse_up(x, y)
+        with tracer.span('mouse_up', 'input'):
+            self.current_tool.on_mouse_up(x, y)
+        tracer.end('stroke', 'input')
 
     def on_new_image(self):
         '''
         Handle signals from the ZoomableLable about a new image
         '''
         self.layer_list.delete_all_layers()
-        image = copy.deepcopy(self.zoomable_label.original_image)
+        self.close_document()
+
+        # Add an alpha channel in case there isn't already one. Images decoded in the background
+        # already have one and are used without copying. The layer copies it for its final image
+        image = to_bgra(self.zoomable_label.original_image)
 
         # Get the new canvas size
         self.canvas_shape = (image.shape[0], image.shape[1])
 
-        # Add an alpha channel in case there isn't already one
-        if image.shape[2] == 3:
-            alpha_channel = np.full((*self.canvas_shape, 1), 255, dtype=np.uint8)
-            image = np.concatenate((image, alpha_channel), axis=2)
-
         # Add a layer with the image and set the active layer index
-        self.layer_list.add_layer(Layer(image))
+        self.image_layer = Layer(image)
+        self.layer_list.add_layer(self.image_layer)
 
         # Initialize the fake layer with a zeroed image)
         empty_image = np.zeros((*self.canvas_shape, 4), dtype=np.uint8)
         self.fake_layer = FakeLayer(image=empty_image)
 
-        # Initialise the final image
-        self.final_image = copy.deepcopy(image)
+        # Initialise the final image. With a single layer it is the final image of the layer
+        self.final_image = self.layer_list[0].final_image
+        self.document_replaced.emit()
+
+
+    def update_image_regions(self, image: np.ndarray, regions: List[Box]) -> bool:
+        '''
+        Replace regions of the starting image of the layer created for the new image, e.g. the
+        tiles which changed when the same part of the screen is captured again. The layer is
+        updated wherever it was moved. Only these regions are copied and marked as dirty.
+        The drawable elements are drawn again only if the layer has any.
+
+        Args:
+            image (np.ndarray): The new image. It must have the size of the canvas.
+            regions (List[Box]): The changed regions.
+        Returns:
+            bool: False if the layer of the image was deleted (nothing is updated)
+        '''
+        layer = self.image_layer
+        if layer is None or not any(other is layer for other in self.layer_list.layer_list):
+            return False
+        layer.image = materialize(layer.image)
+        if np.may_share_memory(layer.image, self.zoomable_label.original_image):
+            # The layer was created without copying the new image (see on_new_image) which
+            # is still shown by the zoomable label and must not be modified
+            layer.image = layer.image.copy()
+        final_image = materialize(layer.final_image)
+        for region in regions:
+            rows = slice(region.top, region.top + region.height)
+            columns = slice(region.left, region.left + region.width)
+            layer.image[rows, columns] = to_bgra(image[rows, columns])
+            layer.mark_image_dirty(region)
+            if not layer.elements:
+                final_image[rows, columns] = layer.image[rows, columns]
+            layer.mark_dirty(region)
+        # Setting the final image notifies the layer list that the cached unions are outdated
+        layer.final_image = compositing.render_layer(layer) if layer.elements else final_image
+        self.render_layers()
+        return True
+
+    ###################
+    # Project methods #
+    ###################
+
+    def save_project(self, path: str) -> None:
+        '''
+        Save the layers and their drawable elements to a project file.
+
+        Args:
+            path (str): The path of the project file.
+        '''
+        write_project(path,
+                      self.layer_list,
+                      self.canvas_shape,
+                      active_layer_idx=self.layer_list.active_layer_idx)
+
+    def load_project(self, path: str) -> None:
+        '''
+        Replace the current layers with the layers from a project file. The pixel data
+        of the layers is memory-mapped and only the parts which are shown get decoded.
+
+        Args:
+            path (str): The path of the project file.
+        '''
+        self.load_document(read_project(path))
+
+    def close_document(self) -> None:
+        '''
+        Close the memory-mapped file of the loaded project once its layers were replaced.
+        '''
+        if self.document is not None:
+            self.document.close()
+            self.document = None
+
+    def load_document(self, document: ProjectDocument) -> None:
+        '''
+        Replace the current layers with the layers of a document (e.g. read from a project
+        file or recovered from the autosave journal).
 
+        Args:
+            document (ProjectDocument): The document to load.
+        '''
+        self.layer_list.delete_all_layers()
+        self.image_layer = None
+        if document is not self.document:
+            self.close_document()
+            self.document = document
+        self.canvas_shape = document.canvas_shape
+
+        for project_layer in document.layers:
+            layer = Layer(project_layer.image, visible=project_layer.visible)
+            layer.final_image = project_layer.final_image
+            for element in project_layer.elements:
+                if element.image is None:
+                    # Elements recovered from their instructions only need to be drawn again
+                    self.render_element(element, redraw=False)
+                layer.add_element(element)
+            self.layer_list.add_layer(layer)
+
+        # Initialize the fake layer with a zeroed image
+        self.fake_layer = FakeLayer(image=np.zeros((*self.canvas_shape, 4), dtype=np.uint8))
+
+        # Show the layers without notifying on_new_image which would rebuild them
+        self.final_image = self.composite_layers()
+        self.zoomable_label.setImage(self.final_image, notify=False)
+
+        if document.active_layer_idx is not None and len(self.layer_list.layer_list) > 0:
+            self.set_active_layer(self.layer_list[document.active_layer_idx])
+        self.document_replaced.emit()
 
     #################
     # Layer methods #
@@ -179,8 +302,8 @@ class ImageProcessor(QWidget):
         '''
         Add a new layer to the top of the layer list.
         '''
-        print('[ImageProcessor] add_layer')
-        self.layer_list.add_layer(self.create_empty_layer())
+        with tracer.span('add_layer', 'layers'):
+            self.layer_list.add_layer(self.create_empty_layer())
 
     def create_empty_layer(self) -> Layer:
         '''
@@ -190,9 +313,9 @@ class ImageProcessor(QWidget):
         return Layer(np.zeros((*self.canvas_shape, 4), dtype=np.uint8))
 
     def set_layer_visibility(self, layer: Layer, is_visible: bool) -> None:
-        print('[ImageProcessor] Set layer visibility')
-        self.layer_list.set_layer_visibility(layer, is_visible)
-        self.render_layers()
+        with tracer.span('set_layer_visibility', 'layers', layer=layer.id, visible=is_visible):
+            self.layer_list.set_layer_visibility(layer, is_visible)
+            self.render_layers()
 
     def set_active_layer(self, layer: Layer) -> None:
         '''
@@ -210,9 +333,9 @@ class ImageProcessor(QWidget):
         Args:
             layer (Layer): The layer to be deleted.
         '''
-        print('[ImageProcessor] delete_layer')
-        self.layer_list.delete_layer(layer)
-        self.render_layers()
+        with tracer.span('delete_layer', 'layers', layer=layer.id):
+            self.layer_list.delete_layer(layer)
+            self.render_layers()
 
     def move_layer_to_top(self, layer: Layer) -> None:
         '''
@@ -221,9 +344,9 @@ class ImageProcessor(QWidget):
         Args:
             layer (Layer): The layer to be moved to the top.
         '''
-        print('[ImageProcessor] move_layer_to_top')
-        self.layer_list.move_layer_to_top(layer)
-        self.render_layers()
+        with tracer.span('move_layer_to_top', 'layers', layer=layer.id):
+            self.layer_list.move_layer_to_top(layer)
+            self.render_layers()
 
     def insert_empty_layer(self, layer: Layer, above: bool) -> None:
         '''
@@ -235,14 +358,14 @@ class ImageProcessor(QWidget):
             above (bool): If True insert the new layer above the layer provided.
                 If False insert the new layer below the layer provided
         '''
-        print('[ImageProcessor] insert_layer_above')
-        # Get the index at which to insert the new layer
-        insert_index = self.layer_list.get_layer_idx(layer)
-        if above:
-            insert_index += 1
+        with tracer.span('insert_empty_layer', 'layers', layer=layer.id, above=above):
+            # Get the index at which to insert the new layer
+            insert_index = self.layer_list.get_layer_idx(layer)
+            if above:
+                insert_index += 1
 
-        # Insert the new layer
-        self.layer_list.insert_empty_layer(insert_index, self.create_empty_layer())
+            # Insert the new layer
+            self.layer_list.insert_empty_layer(insert_index, self.create_empty_layer())
 
     def render_partial_layer(self, layer:Layer, start_index:int, end_index:int) -> np.ndarray:
         '''
@@ -253,12 +376,7 @@ class ImageProcessor(QWidget):
             start_index (int): The index of the first drawable element to draw.
             end_index (int): The index of the last drawable element to draw.
         '''
-        # Create a new image on which we will draw
-        image = np.zeros_like(self.final_image)
-        # Draw the drawable elements on top of the image
-        for i in range(start_index, end_index):
-            self.overlay_element_on_image(image, layer.elements[i])
-        return image
+        return compositing.render_partial_layer(layer, start_index, end_index, self.canvas_shape)
 
     def render_layer(self, layer: Layer) -> None:
         '''
@@ -280,86 +398,68 @@ class ImageProcessor(QWidget):
         '''
         Render all layers and update the zoomable widget.
         '''
-        # Get optimised instructions for overlaying the layers.
-        layers_to_render = tuple(
-            i for i, l in enumerate(self.layer_list) if l.visible
-        )
-        overlay_instructions = self.layer_list.cache.get_overlay_instructions(layers_to_render)
-
-        # Handle special case of rendering only one layer
-        if len(layers_to_render) == 1:
-            self.final_image = self.layer_list[layers_to_render[0]].final_image
+        with tracer.span('render_layers', 'render'):
+            self.final_image = self.composite_layers()
             self.update_zoomable_label()
-            return
 
-        # Execute the instructions overlaying the layers.
-        for instr in overlay_instructions:
-            # Get the images to overlay from the cache or the layers.
-            if len(instr[0]) == 1:
-                img_bottom = self.layer_list[instr[0][0]].final_image
-            else:
-                img_bottom = self.layer_list.cache[instr[0]]
-            if len(instr[1]) == 1:
-                img_top = self.layer_list[instr[1][0]].final_image
-            else:
-                img_top =self.layer_list.cache[instr[1]]
-            # Overlay the two images
-            img = self.overlay_images(img_bottom, img_top)
-            self.layer_list.cache.add_cache((*instr[0], *instr[1]), img)
-
-        self.final_image = self.layer_list.cache[layers_to_render]
-
-        self.update_zoomable_label()
+    def composite_layers(self) -> np.ndarray:
+        '''
+        Overlay all the visible layers using the cached unions of layers where possible.
 
-    def overlay_images(self, image_bottom:np.ndarray, image_top:np.ndarray) -> np.ndarray:
+        Returns:
+            np.ndarray: the image of all the visible layers put together
         '''
-        Overlay two images and return the result
+        return compositing.composite_layers(self.layer_list.layer_list, self.layer_list.cache, self.canvas_shape)
+
+    def flatten(self) -> np.ndarray:
+        '''
+        Get the visible layers put together, without the fake layer, e.g. for exporting.
+        The result is a copy so it can be used while the layers keep being edited.
 
-        Parameters:
-            image_bottom: the image on the bottom. cv2 image with 4 channels
-            image_top: the image on the top. cv2 image with 4 channels
         Returns:
-            cv2 image with 4 channels. The result of placing image_top on top of image_bottom
-        '''
-        bottom_alpha = image_bottom[:, :, 3] / 255.0
-        overlay_rgb = image_top[:, :, :3]
-        overlay_alpha = image_top[:, :, 3] / 255.0
-        image_result = np.zeros_like(image_bottom)
-        for c in range(3): # Loop over the RGB channels
-            image_result[:, :, c] = (overlay_rgb[:, :, c] * overlay_alpha +
-                                   image_bottom[:, :, c] * (1 - overlay_alpha)).astype(np.uint8)
-        # Compute the final alpha channel
-        image_result[:, :, 3] = ((overlay_alpha + bottom_alpha * (1.0 - overlay_alpha)) * 255).astype(np.uint8)
-        return image_result
+            np.ndarray: the flattened BGRA image
+        '''
+        return np.array(self.composite_layers(), copy=True)
+
+    def overlay_images(self, image_bottom:np.ndarray, image_top:np.ndarray) -> np.ndarray:
+        '''
+        Overlay two images and return the result (see compositing.overlay_images)
+        '''
+        return compositing.overlay_images(image_bottom, image_top)
 
     ###################
     # Element methods #
     ###################
 
     def set_element_visibility(self, element: DrawableElement, is_visible: bool) -> None:
-        print('[TOGGLE ELEMENT VISIBILITY]', element)
+        tracer.instant('set_element_visibility', 'elements', element=element.id, visible=is_visible)
         element.visible = is_visible
         # TODO implement rererendering after toggle visibility
 
     def render_element(self, element: DrawableElement, redraw: bool) -> None:
+        if element.tool in RENDERERS:
+            render_element(element, redraw)
+            return
         if (not redraw) and element.image is not None:
             # Do not redraw if the image is already drawn
             return
-        tool_name = element.tool
-        tool_obj = self.tool_manager.tools[tool_name]['object']
+        # Fall back to tools without a registered renderer
+        tool_obj = self.tool_manager.get_tool(element.tool)
         tool_obj.draw_drawable_element(element)
 
     def add_element(self, element:DrawableElement):
-        # Add the element to the current layer
-        self.active_layer.add_element(element)
-        self.render_element(element, redraw=False) # render the drawable element
-        self.active_layer.final_image = self.overlay_element_on_image(self.active_layer.final_image, element)
-        # Add the layers together to get the final image
-        self.render_layers()
+        with tracer.span('add_element', 'elements', element=element.id, tool=element.tool, layer=self.active_layer.id):
+            # Add the element to the current layer
+            self.active_layer.add_element(element)
+            self.render_element(element, redraw=False) # render the drawable element
+            self.active_layer.final_image = self.overlay_element_on_image(materialize(self.active_layer.final_image), element)
+            self.active_layer.mark_dirty(element.get_bounding_box(self.canvas_shape))
+            # Add the layers together to get the final image
+            self.render_layers()
 
     def delete_element(self, element: DrawableElement):
         """Delete an element"""
-        print(f'[ImageProcessr] Delete Element {element}. TODO') #TODO
+        tracer.instant('delete_element', 'elements', element=element.id) #TODO
 
     def apply_element_transformation(self, element:DrawableElement) -> None:
         '''
@@ -386,39 +486,17 @@ class ImageProcessor(QWidget):
         self.active_layer.final_image = self.overlay_images(self.active_layer.final_image, image_below)
         self.overlay_element_on_image(self.active_layer.final_image, element)
         self.active_layer.final_image = self.overlay_images(self.active_layer.final_image, image_above)
+        self.active_layer.mark_dirty()
 
         # Update the final image
         self.render_layers()
 
     def overlay_element_on_image(self, image:np.ndarray, element:DrawableElement):
         '''
-        Modify an image by overlaying a element on top of it. Take into account opacity.
-        The image is modified in place and returned as modified. If the use case requires
-        for the original image to be unchanged you need to deepcopy the image before calling
-        this method, or add an `in_place` parameter to overlay_element_on_image.
-
-        Parameters:
-            image: an opencv image
-            element: A drawable element that has already been rendered.
-                If the drawable element has an affine transformation it will be applied when overlayig it
-        '''
-        # Get the transformation
-        transformation = element.get_transformation()
-        # Apply the affine transformation
-        transformed_element_img = cv2.warpAffine(element.image,
-                                                 transformation,
-                                                 (image.shape[1], image.shape[0]))
-
-        overlay_rgb = transformed_element_img[:, :, :3] # RGB channels of the drawable element
-        overlay_alpha = transformed_element_img[:, :, 3] / 255.0 # The alpha channel of the drawable element
-        image_alpha = 1.0 - overlay_alpha
-        for c in range(3):
-            image[:, :, c] = (overlay_rgb[:, :, c] * overlay_alpha +
-                              image[:, :, c] * image_alpha).astype(np.uint8)
-        # Compute the final alpha channel
-        image[:, :, 3] = ((overlay_alpha + (image[:, :, 3] / 255) * (1.0 - overlay_alpha)) * 255).astype(np.uint8)
-
-        return image
+        Modify an image by overlaying a element on top of it (see compositing.overlay_element_on_image).
+        The image is modified in place and returned as modified.
+        '''
+        return compositing.overlay_element_on_image(image, element)
 
     def get_touch_element(self, x, y, r) -> DrawableElement:
         return self.active_layer.get_touched_element(x, y, r)
\ No newline at end of file
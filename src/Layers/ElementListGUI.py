@@ -1,11 +1,27 @@
-from PyQt5.QtWidgets import QHBoxLayout, QGridLayout, QWidget, QLabel, QMenu, QPushButton, QScrollArea, QSizePolicy
-from PyQt5.QtCore import Qt, pyqtSignal, QSize, QTimer
-from collections import defaultdict
+from PyQt5.QtWidgets import QHBoxLayout, QWidget, QMenu, QListView, QStyledItemDelegate, QStyle
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QTimer, QRect, QEvent, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QPixmap, QPainter, QPen, QColor
+from typing import Any, Dict, List, Tuple
+import cv2
+import numpy as np
 import os
 from src.DrawableElement import DrawableElement
 from src.Layout.LayoutManager import LayoutManager
-from src.utils.image_rendering import cv2_to_qpixmap, create_svg_icon, overlay_pixmap_on_checkerboard
+from src.utils.image_rendering import cv2_to_qpixmap, create_svg_icon, overlay_pixmap_on_checkerboard, to_bgra
 from src.Layers.ElementListEmitter import element_list_emitter
+from src.utils.tracing import tracer
+
+'''
+The list of the elements of the active layer. It is a QListView so that only the rows
+which are shown are painted, and the thumbnails are generated by the model when a row
+is shown for the first time. A Layer creates its ElementListGUI only while it is the
+active layer (see Layer.set_as_active).
+'''
+
+# The size of the thumbnails of the elements
+THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT = 100, 75
+BORDER = 4 # the border around the thumbnails
+EYE_SIZE = 36 # the eye button in the top-right corner of the thumbnails
 
 
 class ElementListGUI(QWidget):
@@ -14,97 +30,69 @@ class ElementListGUI(QWidget):
     element_selected = pyqtSignal(DrawableElement)
     element_visibility_toggled = pyqtSignal(DrawableElement, bool)
 
-    def __init__(self):
+    def __init__(self, elements: List[DrawableElement] = ()):
+        '''
+        Parameters:
+            elements: the elements of the layer from the bottom to the top
+        '''
         super().__init__()
 
         self.resource_path = '/home/anton-genchev/projects/Screenshot-utility/resources/layerlist'
 
-        # Mapping element ids to dictionary of gui elements
-        self.gui_mapping = defaultdict(lambda: defaultdict(lambda: None), {})
+        self.model = ElementListModel(elements, self)
 
         self.initGUI()
 
     def initGUI(self):
         '''
-        Initialise the gui for the layer list.
+        Initialise the gui for the element list.
         '''
         layout = QHBoxLayout()
         layout.setSpacing(10)
 
-        # Scroll Area
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setFixedSize(500, 140)
-        self.scroll_container = QWidget()
-        self.scroll_layout = QHBoxLayout(self.scroll_container)
-
-        self.scroll_layout.setAlignment(Qt.AlignLeft | Qt.AlignTop)
-        self.scroll_layout.setSpacing(10)
-        self.scroll_area.setWidget(self.scroll_container)
-        self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-
-        layout.addWidget(self.scroll_area)
-        self.setLayout(layout)
-
         self.icon_eye_enable = create_svg_icon(os.path.join(self.resource_path, 'eye_enable.svg'))
         self.icon_eye_disable = create_svg_icon(os.path.join(self.resource_path, 'eye_disable.svg'))
 
+        # A single row of thumbnails scrolled horizontally
+        self.view = QListView()
+        self.view.setFlow(QListView.LeftToRight)
+        self.view.setWrapping(False)
+        self.view.setUniformItemSizes(True) # the rows are laid out without asking for their data
+        self.view.setSpacing(5)
+        self.view.setSelectionMode(QListView.NoSelection)
+        self.view.setMouseTracking(True) # for the hover of the eye buttons
+        self.view.setFixedSize(500, 140)
+        self.view.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.show_context_menu)
+        self.view.setItemDelegate(ElementDelegate(self))
+        self.view.setModel(self.model)
+
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
     def add_element_in_gui(self, element: DrawableElement, *, index=0) -> None:
         '''
-        Add an element in the gui.
+        Add an element in the gui. Its thumbnail is generated when it is shown.
+
+        Parameters:
+            index: the position of the element in the list. -1 adds it at the end
         '''
-        # Get the qpixmap image representing the element
-        qpixmap = cv2_to_qpixmap(element.image).scaled(100, 75, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        qpixmap = overlay_pixmap_on_checkerboard(qpixmap, 100, 75)
-
-        item_widget = QWidget()
-        item_widget.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-
-        item_layout = QGridLayout(item_widget)
-        item_layout.setContentsMargins(0, 0, 0, 0)
-
-        # Clickable Image Label
-        image_label = ClickableElementLabel(element_list_gui=self, element=element)
-        image_label.setPixmap(qpixmap)
-        image_label.setStyleSheet("border: 4px solid #ccc; border-radius: 3px;")
-        image_label.clicked.connect(lambda: self.on_image_clicked(element))
-
-        # Button for toggling visibility
-        button_eye = QPushButton()
-        button_eye.setIcon(self.icon_eye_enable)
-        button_eye.setIconSize(QSize(24, 24))
-        button_eye.setFixedSize(QSize(36, 36))
-        button_eye.clicked.connect(lambda: self.on_eye_clicked(button_eye, element))
-        button_layout = QHBoxLayout()
-        button_layout.addStretch()
-        button_eye.setStyleSheet("""
-            QPushButton {
-                background: transparent;
-                border: none;
-            }
-            QPushButton::hover {
-                background: rgba(255, 255, 255, 30);
-                border-radius: 18px;
-            }
-        """)
-        button_layout.addWidget(button_eye)
-        button_layout.setContentsMargins(0, 0, 0, 0)
-
-        # Add items to layout
-        item_layout.addWidget(image_label, 0, 0, Qt.AlignTop | Qt.AlignRight)  # Add image below
-        item_layout.addLayout(button_layout, 0, 0, Qt.AlignTop | Qt.AlignRight)  # Add button at top
-        item_widget.setLayout(item_layout)
-
-        # Add to scroll layout
-        self.scroll_layout.insertWidget(index, item_widget)
+        self.model.insert_element(element, len(self.model.elements) if index == -1 else index)
         self.scroll_to_the_rightmost_element()
 
+    def thumbnail_pixmaps(self) -> list:
+        """Get the pixmaps generated for the elements (e.g. for the memory accounting)."""
+        return [thumbnail for _, thumbnail in self.model.thumbnails.values()]
+
     def scroll_to_the_rightmost_element(self):
-        # Delay scrolling until after the layout is updated
-        QTimer.singleShot(50, lambda: self.scroll_area.horizontalScrollBar().setValue(
-            self.scroll_area.horizontalScrollBar().maximum()
-        ))
+        # Delay scrolling until after the layout is updated. A bound method is not called
+        # if the gui is deleted in the meantime (e.g. because its layer became inactive)
+        QTimer.singleShot(50, self.scroll_to_the_end)
+
+    def scroll_to_the_end(self):
+        self.view.horizontalScrollBar().setValue(self.view.horizontalScrollBar().maximum())
 
     def set_as_active(self):
         """Show the GUI for this layer and hide the previous if such is shown."""
@@ -117,50 +105,138 @@ class ElementListGUI(QWidget):
         container_layout.removeWidget(self)
         self.hide()
 
+    def show_context_menu(self, position):
+        """Show a custom menu on right-click on an element."""
+        index = self.view.indexAt(position)
+        if not index.isValid():
+            return
+        menu = QMenu(self)
+
+        # Show the menu at the cursor position
+        menu.exec_(self.view.viewport().mapToGlobal(position))
+
     def on_image_clicked(self, element):
         """Handles clicks on the element image in the element list gui"""
         self.element_selected.emit(element)
 
-    def on_eye_clicked(self, button_eye: QPushButton, element: DrawableElement) -> None:
+    def on_eye_clicked(self, index: QModelIndex, element: DrawableElement) -> None:
         '''
         Handles clicks on the eye button. Toggles the visiblity of the element.
 
         Args:
-            button_eye (QPushButton): The button with the eye. The icon of this button
-                will be updated.
+            index (QModelIndex): The row of the element. It is repainted with the new eye icon.
             element (DrawableElement): The element corresponding to the eye button clicked
         '''
-        print('[GUI] on_eye_clicked')
         new_visibility_state = not element.visible
-        print(new_visibility_state, element)
-        if new_visibility_state:
-            button_eye.setIcon(self.icon_eye_enable)
-        else:
-            button_eye.setIcon(self.icon_eye_disable)
+        tracer.instant('element_eye_clicked', 'input', element=element.id, visible=new_visibility_state)
         # Emit a signal with the new visibility state of the layer.
         element_list_emitter.toggle_visibility(element, new_visibility_state)
+        self.model.dataChanged.emit(index, index, [Qt.DecorationRole])
 
 
-class ClickableElementLabel(QLabel):
-    """Custom QLabel that emits a signal when clicked"""
-    clicked = pyqtSignal()
-
-    def __init__(self, parent=None, element_list_gui: ElementListGUI=None, element: DrawableElement=None):
-        '''
-        Pass the element_list_gui and element so that actions on the element can be triggered.
-        '''
+class ElementListModel(QAbstractListModel):
+    '''
+    The elements of a layer as rows. The thumbnail of an element is generated the first
+    time the view asks for it and generated again only if the image of the element changed.
+    '''
+    def __init__(self, elements: List[DrawableElement] = (), parent=None):
         super().__init__(parent)
+        self.elements: List[DrawableElement] = list(elements)
+        self.thumbnails: Dict[int, Tuple[Any, QPixmap]] = {} # element id -> (its image, the thumbnail of the image)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.elements)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        element = self.elements[index.row()]
+        if role == Qt.DecorationRole:
+            return self.thumbnail(element)
+        if role == Qt.UserRole:
+            return element
+        if role == Qt.ToolTipRole:
+            return f'{element.tool} {element.id}'
+        return None
+
+    def insert_element(self, element: DrawableElement, row: int) -> None:
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.elements.insert(row, element)
+        self.endInsertRows()
+
+    def thumbnail(self, element: DrawableElement) -> QPixmap:
+        cached = self.thumbnails.get(element.id)
+        if cached is not None and cached[0] is element.image:
+            return cached[1]
+        thumbnail = create_thumbnail(element.image)
+        self.thumbnails[element.id] = (element.image, thumbnail)
+        return thumbnail
+
+
+class ElementDelegate(QStyledItemDelegate):
+    '''
+    Paint the thumbnail of an element with its eye button and handle the clicks on them.
+    '''
+    def __init__(self, element_list_gui: ElementListGUI):
+        super().__init__(element_list_gui)
         self.element_list_gui = element_list_gui
-        self.element = element
-
-    def mousePressEvent(self, event):
-        self.clicked.emit()  # Emit signal when clicked
-
-    def contextMenuEvent(self, event):
-        """
-        Override the context menu event to show a custom menu on right-click.
-        """
-        menu = QMenu(self)
-
-        # Show the menu at the cursor position
-        menu.exec_(event.globalPos())
\ No newline at end of file
+        self.hovered_eye_row = None # the row whose eye button is under the mouse
+
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(THUMBNAIL_WIDTH + 2 * BORDER, THUMBNAIL_HEIGHT + 2 * BORDER)
+
+    def eye_rect(self, rect: QRect) -> QRect:
+        return QRect(rect.right() - EYE_SIZE + 1, rect.top(), EYE_SIZE, EYE_SIZE)
+
+    def paint(self, painter: QPainter, option, index: QModelIndex) -> None:
+        element = index.data(Qt.UserRole)
+        rect = option.rect
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.drawPixmap(rect.left() + BORDER, rect.top() + BORDER, index.data(Qt.DecorationRole))
+        painter.setPen(QPen(QColor('#ccc'), BORDER))
+        painter.drawRoundedRect(rect.adjusted(BORDER // 2, BORDER // 2, -BORDER // 2, -BORDER // 2), 3, 3)
+
+        eye_rect = self.eye_rect(rect)
+        if option.state & QStyle.State_MouseOver and self.hovered_eye_row == index.row():
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(255, 255, 255, 30))
+            painter.drawEllipse(eye_rect)
+        icon = self.element_list_gui.icon_eye_enable if element.visible else self.element_list_gui.icon_eye_disable
+        icon.paint(painter, eye_rect.adjusted(6, 6, -6, -6))
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index: QModelIndex) -> bool:
+        if event.type() == QEvent.MouseMove:
+            hovered_eye_row = index.row() if self.eye_rect(option.rect).contains(event.pos()) else None
+            if hovered_eye_row != self.hovered_eye_row:
+                self.hovered_eye_row = hovered_eye_row
+                self.element_list_gui.view.viewport().update()
+            return False
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            element = index.data(Qt.UserRole)
+            if self.eye_rect(option.rect).contains(event.pos()):
+                self.element_list_gui.on_eye_clicked(index, element)
+            else:
+                self.element_list_gui.on_image_clicked(element)
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+def create_thumbnail(image, width: int = THUMBNAIL_WIDTH, height: int = THUMBNAIL_HEIGHT) -> QPixmap:
+    '''
+    Scale the raster of an element to fit in width x height and show it on a checkerboard.
+
+    Parameters:
+        image: the BGR(A) raster of the element (np.ndarray or LazyRaster) or None
+    '''
+    if image is None:
+        return overlay_pixmap_on_checkerboard(QPixmap(), width, height)
+    image = to_bgra(np.asarray(image))
+    image_height, image_width = image.shape[:2]
+    scale = min(width / image_width, height / image_height)
+    size = (max(1, round(image_width * scale)), max(1, round(image_height * scale)))
+    # Scaled with numpy so that only the small thumbnail is converted to a QPixmap
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return overlay_pixmap_on_checkerboard(cv2_to_qpixmap(cv2.resize(image, size, interpolation=interpolation)),
+                                          width, height)
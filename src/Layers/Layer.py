@@ -3,7 +3,9 @@ import numpy as np
 from typing import List, Union
 import copy
 from src.DrawableElement import DrawableElement
+from src.utils.Box import Box
 from src.Layers.ElementListGUI import ElementListGUI
+from src.config import WITHGUI
 
 class Layer(QObject):
 
@@ -19,12 +21,14 @@ class Layer(QObject):
         self.visible = visible # Is the layer visible
         self.drawing_enabled = False
         self.elements:List[DrawableElement] = []
+        self.dirty_regions:List[Box] = [] # Regions of final_image changed since last taken (e.g. by the autosave)
+        self.image_dirty_regions:List[Box] = [] # Regions of the starting image changed since last taken
 
         # Assign a unqiue id to the layer
         self.id = Layer._id_counter
         Layer._id_counter += 1
 
-        self.gui = ElementListGUI()
+        self.gui = None # the ElementListGUI, created only while the layer is active
 
     @property
     def final_image(self) -> np.ndarray:
@@ -37,17 +41,57 @@ class Layer(QObject):
         # Send a signal notifying that the image has been changed
         self.layer_image_updated.emit()
 
+    def mark_dirty(self, region: Box = None) -> None:
+        '''
+        Record that a region of the final image has changed.
+
+        Args:
+            region (Box): The changed region. If None the whole final image is marked.
+        '''
+        if region is None:
+            region = Box(0, 0, self._final_image.shape[1], self._final_image.shape[0])
+        self.dirty_regions.append(region)
+
+    def take_dirty_regions(self) -> List[Box]:
+        '''
+        Get the regions marked as changed since the last call and clear them.
+        '''
+        regions = self.dirty_regions
+        self.dirty_regions = []
+        return regions
+
+    def mark_image_dirty(self, region: Box) -> None:
+        '''
+        Record that a region of the starting image has changed (e.g. it was captured again).
+        '''
+        self.image_dirty_regions.append(region)
+
+    def take_image_dirty_regions(self) -> List[Box]:
+        '''
+        Get the regions of the starting image marked as changed since the last call and clear them.
+        '''
+        regions = self.image_dirty_regions
+        self.image_dirty_regions = []
+        return regions
+
     def set_as_active(self) -> None:
         """
         There is one active layer, i.e. the layer that we are
         currently working on. This method sets the Layer as the active
-        layer and tries to shows its ElementListGUI.
+        layer and tries to shows its ElementListGUI. The ElementListGUI is created
+        here so that layers which are never active (e.g. the FakeLayer) have none.
         """
-        self.gui.set_as_active()
+        if WITHGUI and self.gui is None:
+            self.gui = ElementListGUI(self.elements)
+        if self.gui is not None:
+            self.gui.set_as_active()
 
     def set_as_inactive(self) -> None:
-        """Set the layer as inactive and try ot hide its ElementListGUI."""
-        self.gui.set_as_inactive()
+        """Set the layer as inactive and delete its ElementListGUI if it has one."""
+        if self.gui is not None:
+            self.gui.set_as_inactive()
+            self.gui.deleteLater()
+            self.gui = None
 
     def toggle_visibility(self):
         self.visible = not self.visible
@@ -63,7 +107,8 @@ class Layer(QObject):
         self.elements.append(element) # add the drawable element
 
         # Inform the GUI about the added element
-        self.gui.add_element_in_gui(element, index=-1)
+        if self.gui is not None:
+            self.gui.add_element_in_gui(element, index=-1)
 
     def remove_element(self, index:int) -> None:
         if 0 <= index < len(self.elements):
@@ -1,6 +1,7 @@
 from src.Layers.Layer import Layer
 from src.Layers.LayersCache import LayersCache
 from src.Layers.LayerListGUI import LayerListGUI
+from src.config import WITHGUI
 
 
 class LayerList:
@@ -13,7 +14,9 @@ class LayerList:
 
         self.cache = LayersCache()
 
-        self.gui = LayerListGUI()
+        self.gui = None
+        if WITHGUI:
+            self.gui = LayerListGUI()
 
     def __iter__(self):
         return iter(self.layer_list)
@@ -55,8 +58,14 @@ class LayerList:
         '''
         Delete all the layers.
         '''
+        for layer in self.layer_list:
+            if self.gui is not None:
+                self.gui.delete_layer_in_gui(layer)
+            layer.set_as_inactive() # deletes the element list of the active layer
         self.layer_list = []
         self.active_layer_idx = None
+        # The cached unions refer to layers by index so they are no longer valid
+        self.cache.clear()
 
     def add_layer(self, layer: Layer, set_active: bool = False) -> None:
         '''
@@ -67,16 +76,28 @@ class LayerList:
             set_active (bool): Whether to set the new layer as the currently active layer.
         '''
         self.layer_list.append(layer)
+        layer.layer_image_updated.connect(lambda: self.on_layer_image_updated(layer))
 
         if set_active or self.active_layer_idx is None:
             # Set the new layer to be the active layer
             self.active_layer_idx = len(self.layer_list) - 1
 
         # Inform the GUI about the added layer
-        self.gui.add_layer_in_gui(layer)
+        if self.gui is not None:
+            self.gui.add_layer_in_gui(layer)
+
+    def on_layer_image_updated(self, layer: Layer) -> None:
+        '''
+        Drop the cached unions containing a layer whose final image changed.
+
+        Args:
+            layer (Layer): The updated layer.
+        '''
+        idx = next((i for i, l in enumerate(self.layer_list) if l is layer), None)
+        if idx is not None:
+            self.cache.invalidate(idx)
 
     def set_layer_visibility(self, layer: Layer, is_visible: bool):
-        print('[LayerList] Set layer visibility')
         layer.visible = is_visible
 
     def set_active_layer(self, layer: Layer):
@@ -90,7 +111,8 @@ class LayerList:
         self.active_layer_idx = self.get_layer_idx(layer)
 
         # Set the active layer in the GUI
-        self.gui.set_active_layer_in_gui(layer, previously_active_layer)
+        if self.gui is not None:
+            self.gui.set_active_layer_in_gui(layer, previously_active_layer)
 
         # Notify the previous active layer that it is no longer active
         previously_active_layer.set_as_inactive()
@@ -103,7 +125,6 @@ class LayerList:
         Args:
             layer (Layer): The layer to be deleted.
         '''
-        print('[LayerList] delete_layer')
         idx_to_delete = self.get_layer_idx(layer)
         # Handle special case: deleting the currently active layer
         if idx_to_delete == self.active_layer_idx:
@@ -112,6 +133,7 @@ class LayerList:
             elif len(self.layer_list) > 1: # Otherwise get the top layer
                 self.set_active_layer(self.layer_list[-1])
             else: # Handle the case of having zero layers left
+                layer.set_as_inactive()
                 self.active_layer_idx = None
 
         # If the active index is after idx_do_delete we need to adjust it
@@ -119,9 +141,12 @@ class LayerList:
             self.active_layer_idx -= 1
 
         # Delete the layer from the gui
-        self.gui.delete_layer_in_gui(layer)
+        if self.gui is not None:
+            self.gui.delete_layer_in_gui(layer)
         # Delete the layer from the layerlist
         del self.layer_list[idx_to_delete]
+        # The indices of the layers above the deleted one changed
+        self.cache.clear()
 
     def move_layer_to_top(self, layer: Layer) -> None:
         '''
@@ -130,12 +155,12 @@ class LayerList:
         Args:
             layer (Layer): The layer to be moved to the top.
         '''
-        print('[ImageProcessor] move_layer_to_top')
         idx_to_move = self.get_layer_idx(layer) # The original position of the layer
 
         # Move the layer to the top
         self.layer_list.pop(idx_to_move)
         self.layer_list.append(layer)
+        self.cache.clear() # the indices of the layers changed
 
         # Update the active layer index
         if self.active_layer_idx == idx_to_move:
@@ -144,7 +169,8 @@ class LayerList:
             self.active_layer_idx -= 1
 
         # Update the gui
-        self.gui.move_layer_to_top_in_gui(layer)
+        if self.gui is not None:
+            self.gui.move_layer_to_top_in_gui(layer)
 
     def insert_empty_layer(self, insert: int, layer: Layer) -> None:
         '''
@@ -155,11 +181,12 @@ class LayerList:
             insert (int): The index at which to insert hte new layer.
             layer (Layer): The empty layer that will be inserted.
         '''
-        print('[LayerList] insert_layer_above')
-
         # Insert the new layer.
         self.layer_list.insert(insert, layer)
-        self.gui.insert_layer(insert, layer)
+        layer.layer_image_updated.connect(lambda: self.on_layer_image_updated(layer))
+        self.cache.clear() # the indices of the layers above the new one changed
+        if self.gui is not None:
+            self.gui.insert_layer(insert, layer)
 
         # Set the new layer as the active layer.
         if insert <= self.active_layer_idx:
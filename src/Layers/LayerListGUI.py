@@ -6,6 +6,8 @@ from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import Qt, pyqtSignal, QSize
 from src.Layers.Layer import Layer
 from src.utils.image_rendering import cv2_to_qpixmap, create_svg_icon
+from src.Project.LazyRaster import preview_image
+from src.utils.tracing import tracer
 from collections import defaultdict
 from typing import Optional
 import cv2
@@ -86,7 +88,7 @@ class LayerListGUI(QWidget):
             layer (Layer): The layer to be added in the gui.
         '''
         # Get the qpixmap image representing the layer
-        qpixmap = cv2_to_qpixmap(layer.final_image).scaled(100, 75, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        qpixmap = cv2_to_qpixmap(preview_image(layer.final_image)).scaled(100, 75, Qt.KeepAspectRatio, Qt.SmoothTransformation)
 
         item_widget = QWidget()
         item_layout = QGridLayout(item_widget)
@@ -140,14 +142,14 @@ class LayerListGUI(QWidget):
         """Update the image representing the layer when its image is changed."""
         if layer.id in self.gui_mapping:
             image_label = self.gui_mapping[layer.id]['image_label']
-            qpixmap = cv2_to_qpixmap(layer.final_image).scaled(100, 75, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            qpixmap = cv2_to_qpixmap(preview_image(layer.final_image)).scaled(100, 75, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             image_label.setPixmap(qpixmap)
 
     def set_active_layer_in_gui(self, new_active_layer: Layer, previous_active_layer: Layer):
         '''
         Highlight the active layer in the gui.
         '''
-        print('[LayerListGUI] Set active layer')
+        tracer.instant('set_active_layer', 'layers', layer=new_active_layer.id)
         self.gui_mapping[previous_active_layer.id]['image_label'] .setStyleSheet("border: 4px solid #ccc; border-radius: 3px;")
         self.gui_mapping[new_active_layer.id]['image_label'] .setStyleSheet("border: 4px solid #aaa; border-radius: 5px;")
 
@@ -171,7 +173,7 @@ class LayerListGUI(QWidget):
         '''
         Handles clicks on the layer image in the layer list gui.
         '''
-        print('[GUI] on_image_clicked')
+        tracer.instant('layer_clicked', 'input', layer=layer.id)
         self.layer_selected.emit(layer)
 
     def on_eye_clicked(self, button_eye: QPushButton, layer: Layer) -> None:
@@ -183,7 +185,7 @@ class LayerListGUI(QWidget):
                 will be updated.
             layer (Layer): The layer corresponding to the eye button clicked
         '''
-        print('[GUI] on_eye_clicked')
+        tracer.instant('layer_eye_clicked', 'input', layer=layer.id)
         new_visibility_state = not layer.visible
         if new_visibility_state:
             button_eye.setIcon(self.icon_eye_enable)
@@ -199,7 +201,6 @@ class LayerListGUI(QWidget):
         Args:
             layer (Layer): The layer that was moved.
         '''
-        print('[GUI] move_layer_to_top_in_gui')
         # Retrieve the widget for this layer from the gui_mapping
         item_widget = self.gui_mapping[layer.id]['item_widget']
 
@@ -217,7 +218,6 @@ class LayerListGUI(QWidget):
             index (int): The place in which to insert the new layer widget.
             layer (Layer): The actual layer.
         '''
-        print('[GUI] insert_layer')
         self.add_layer_in_gui(layer, index=index)
 
 class ClickableLabel(QLabel):
@@ -28,6 +28,22 @@ class LayersCache:
             'last_used': None # None if not used at all. Otherwise a timestamp. 
         }
 
+    def invalidate(self, layer: int) -> None:
+        '''
+        Remove all the cached unions containing the layer, e.g. after the layer was changed.
+
+        Args:
+            layer (int): The layer which was changed.
+        '''
+        for layers_tuple in list(self.get_intersection(layer)):
+            del self.cache[layers_tuple]
+
+    def clear(self) -> None:
+        '''
+        Remove all the cached unions, e.g. after the indices of the layers changed.
+        '''
+        self.cache = {}
+
     def get_intersection(self, layer: int) -> Generator[Tuple[int], None, None]:
         '''
         Get all the layer tuples in the cache that contain the layer provided.
@@ -0,0 +1,54 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+import threading
+import cv2
+from src.utils.image_rendering import to_bgra
+
+
+class ImageLoader(QObject):
+    '''
+    Decode images on a background thread so that large images do not block the GUI.
+    Every load gets a generation number. Only the result of the latest load is current,
+    so that an image which finishes loading after another one was requested is ignored.
+    '''
+
+    # Signal with the generation of the load and the decoded image (None if decoding failed)
+    image_loaded = pyqtSignal(int, object)
+
+    def __init__(self):
+        super().__init__()
+        self.generation = 0 # the generation of the latest load
+
+    def load_async(self, file_path: str, flags: int = cv2.IMREAD_UNCHANGED) -> int:
+        '''
+        Start decoding an image on a background thread. image_loaded is emitted when it is done.
+
+        Parameters:
+            file_path: the path of the image
+            flags: the cv2.imread flags
+        Returns:
+            int: the generation of the load
+        '''
+        self.generation += 1
+        thread = threading.Thread(target=self._load,
+                                  args=(self.generation, file_path, flags),
+                                  name='ImageLoader',
+                                  daemon=True)
+        thread.start()
+        return self.generation
+
+    def cancel(self) -> None:
+        '''
+        Ignore the result of the loads which are in progress (e.g. because a newer image was loaded synchronously)
+        '''
+        self.generation += 1
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self.generation
+
+    def _load(self, generation: int, file_path: str, flags: int) -> None:
+        image = cv2.imread(file_path, flags)
+        if image is not None:
+            # Add the alpha channel here rather than on the GUI thread
+            image = to_bgra(image)
+        self.image_loaded.emit(generation, image)
+
@@ -1,19 +1,43 @@
 from PyQt5.QtWidgets import QFileDialog
 from src.MenuBar.MenuBarGUI import MenuBarGUI
-from src.config import WITHGUI
+from src.MenuBar.ImageLoader import ImageLoader
+from src.config import WITHGUI, config
+from src.utils.tracing import tracer
 from typing import Callable
+import os
 import cv2
 
+# The reductions for which cv2 can decode a proxy of an image (e.g. JPEG) cheaply
+PROXY_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2,
+               4: cv2.IMREAD_REDUCED_COLOR_4,
+               8: cv2.IMREAD_REDUCED_COLOR_8}
+
 
 class MenuBar:
 
     # Callbacks that have to be provided
     callback_update_image: Callable = lambda image: None
+    callback_show_proxy_image: Callable = lambda image: None
+    callback_hide_proxy_image: Callable = lambda: None
+    callback_open_project: Callable = lambda path: None
+    callback_save_project: Callable = lambda path: None
+    callback_recover_autosave: Callable = lambda: None
+    callback_export_image: Callable = lambda path: None
+    callback_toggle_hud: Callable = lambda: None
+    callback_show_memory_panel: Callable = lambda: None
+    callback_start_input_recording: Callable = lambda: None
+    callback_stop_input_recording: Callable = lambda: None
 
 
     ####################################
 
     def __init__(self):
+        self.recording_input = False
+        self.showing_proxy = False # whether the proxy of an image which is still loading is shown
+
+        # Decodes large images in the background
+        self.image_loader = ImageLoader()
+        self.image_loader.image_loaded.connect(self.on_image_loaded)
 
         if WITHGUI:
             self.gui = MenuBarGUI()
@@ -24,7 +48,15 @@ class MenuBar:
         Connect the signals from the MenuBarGUI
         '''
         self.gui.load_image_signal.connect(self.load_image)
-        # self.gui.save_image_signal.connect()
+        self.gui.save_image_signal.connect(self.save_image)
+        self.gui.open_project_signal.connect(self.open_project)
+        self.gui.save_project_signal.connect(self.save_project)
+        self.gui.recover_autosave_signal.connect(self.recover_autosave)
+        self.gui.toggle_hud_signal.connect(lambda: self.callback_toggle_hud())
+        self.gui.export_trace_signal.connect(self.export_trace)
+        self.gui.clear_trace_signal.connect(tracer.clear)
+        self.gui.memory_panel_signal.connect(lambda: self.callback_show_memory_panel())
+        self.gui.record_input_signal.connect(self.toggle_input_recording)
         # self.gui.manage_plugins_signal.connect()
 
     def load_image(self):
@@ -37,11 +69,155 @@ class MenuBar:
 
         if not file_path:
             return # User canceled file selection
-        
+
+        if self.is_large_image(file_path):
+            self.load_large_image(file_path)
+            return
+        self.image_loader.cancel() # a large image which is still loading must not replace this one
+        self.showing_proxy = False
+
         # Load the image using OpenCV
         image = cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
 
         if image is None:
             return
         
-        self.callback_update_image(image)
\ No newline at end of file
+        self.callback_update_image(image)
+
+    def save_image(self):
+        """
+        Opens a file dialog to choose where to export the edited image and exports it.
+        The format is chosen from the file extension (PNG if there is none).
+        """
+        file_path, _ = QFileDialog.getSaveFileName(None, "Save Image", "",
+                                                   "Images (*.png *.jpg *.jpeg *.webp *.tif *.tiff)")
+
+        if not file_path:
+            return # User canceled file selection
+
+        if not os.path.splitext(file_path)[1]:
+            file_path += '.png'
+
+        self.callback_export_image(file_path)
+
+    def is_large_image(self, file_path: str) -> bool:
+        """
+        Check if an image file is large enough to be decoded in the background.
+        """
+        return os.path.isfile(file_path) and \
+            os.path.getsize(file_path) >= config['image_import']['background_min_file_bytes']
+
+    def load_large_image(self, file_path: str):
+        """
+        Show a reduced-resolution proxy of the image immediately (for formats which can decode
+        it cheaply, e.g. JPEG) and decode the full resolution image in the background.
+        The proxy is only shown. The document is replaced by the full resolution image
+        once it is decoded.
+        """
+        generation = self.image_loader.load_async(file_path)
+
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension in config['image_import']['proxy_extensions']:
+            proxy = cv2.imread(file_path, PROXY_FLAGS[self.proxy_reduction()])
+            if proxy is not None and self.image_loader.is_current(generation):
+                self.showing_proxy = True
+                self.callback_show_proxy_image(proxy)
+
+    def proxy_reduction(self) -> int:
+        """
+        Get the configured proxy reduction rounded down to one which cv2 supports (at least 2).
+        """
+        reduction = config['image_import']['proxy_reduction']
+        return max((supported for supported in PROXY_FLAGS if supported <= reduction), default=min(PROXY_FLAGS))
+
+    def on_image_loaded(self, generation: int, image):
+        """
+        Show a full resolution image decoded in the background unless a newer image was requested.
+        """
+        if not self.image_loader.is_current(generation):
+            return
+        showing_proxy, self.showing_proxy = self.showing_proxy, False
+        if image is not None:
+            self.callback_update_image(image)
+        elif showing_proxy:
+            self.callback_hide_proxy_image()
+
+    def open_project(self):
+        """
+        Opens a file dialog to choose a project file and loads it.
+        """
+        file_path, _ = QFileDialog.getOpenFileName(None, "Open Project", "",
+                                                   "PyPainter Projects (*.pypaint)")
+
+        if not file_path:
+            return # User canceled file selection
+
+        self.callback_open_project(file_path)
+
+    def save_project(self):
+        """
+        Opens a file dialog to choose where to save the project and saves it.
+        """
+        file_path, _ = QFileDialog.getSaveFileName(None, "Save Project", "",
+                                                   "PyPainter Projects (*.pypaint)")
+
+        if not file_path:
+            return # User canceled file selection
+
+        if not file_path.endswith('.pypaint'):
+            file_path += '.pypaint'
+
+        self.callback_save_project(file_path)
+
+    def recover_autosave(self):
+        """
+        Loads the document from the autosave journal of the previous session.
+        """
+        self.callback_recover_autosave()
+
+    def export_trace(self):
+        """
+        Opens a file dialog to choose where to export the trace of the session and exports it
+        in the Chrome trace event format (open it in chrome://tracing or ui.perfetto.dev).
+        """
+        file_path, _ = QFileDialog.getSaveFileName(None, "Export Trace", "trace.json",
+                                                   "Chrome Trace (*.json)")
+
+        if not file_path:
+            return # User canceled file selection
+
+        if not file_path.endswith('.json'):
+            file_path += '.json'
+
+        num_events = tracer.export_chrome_trace(file_path)
+        print(f'[MenuBar] Exported {num_events} trace events to {file_path}')
+
+    def toggle_input_recording(self):
+        """
+        Start recording the input of the canvas or stop recording it and save the trace to a
+        file chosen by the user. The trace can be replayed with replay_input.py.
+        """
+        if not self.recording_input:
+            self.callback_start_input_recording()
+            self.recording_input = True
+            if WITHGUI:
+                self.gui.set_input_recording(True)
+            return
+
+        trace = self.callback_stop_input_recording()
+        self.recording_input = False
+        if WITHGUI:
+            self.gui.set_input_recording(False)
+        if trace is None or len(trace) == 0:
+            return # Nothing was drawn
+
+        file_path, _ = QFileDialog.getSaveFileName(None, "Save Input Trace", "input_trace.json",
+                                                   "Input Traces (*.json)")
+
+        if not file_path:
+            return # User canceled file selection
+
+        if not file_path.endswith('.json'):
+            file_path += '.json'
+
+        trace.save(file_path)
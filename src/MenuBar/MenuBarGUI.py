@@ -5,14 +5,22 @@ from PyQt5.QtCore import pyqtSignal
 class MenuBarGUI(QMenuBar):
     load_image_signal = pyqtSignal()  # Signal emitted when "Load Image" is clicked
     save_image_signal = pyqtSignal()  # Signal emitted when "Save Image" is clicked
+    open_project_signal = pyqtSignal()  # Signal emitted when "Open Project" is clicked
+    save_project_signal = pyqtSignal()  # Signal emitted when "Save Project" is clicked
+    recover_autosave_signal = pyqtSignal()  # Signal emitted when "Recover Autosave" is clicked
     manage_plugins_signal = pyqtSignal()  # Signal emitted when "Manage Plugins" is clicked
+    toggle_hud_signal = pyqtSignal()  # Signal emitted when "Frame Timing HUD" is clicked
+    export_trace_signal = pyqtSignal()  # Signal emitted when "Export Trace" is clicked
+    clear_trace_signal = pyqtSignal()  # Signal emitted when "Clear Trace" is clicked
+    memory_panel_signal = pyqtSignal()  # Signal emitted when "Memory Usage" is clicked
+    record_input_signal = pyqtSignal()  # Signal emitted when "Record Input" / "Stop Recording Input" is clicked
 
     def __init__(self):
         super().__init__()
         self.initUI()
 
     def initUI(self):
-        """Initialize the menu bar with File and Plugins menus"""
+        """Initialize the menu bar with File, Plugins and Diagnostics menus"""
 
         # **File Menu**
         file_menu = QMenu("File", self)
@@ -26,6 +34,20 @@ class MenuBarGUI(QMenuBar):
         action_save.triggered.connect(self.save_image_signal.emit)
         file_menu.addAction(action_save)
 
+        file_menu.addSeparator()
+
+        action_open_project = QAction("Open Project", self)
+        action_open_project.triggered.connect(self.open_project_signal.emit)
+        file_menu.addAction(action_open_project)
+
+        action_save_project = QAction("Save Project", self)
+        action_save_project.triggered.connect(self.save_project_signal.emit)
+        file_menu.addAction(action_save_project)
+
+        action_recover_autosave = QAction("Recover Autosave", self)
+        action_recover_autosave.triggered.connect(self.recover_autosave_signal.emit)
+        file_menu.addAction(action_recover_autosave)
+
         # **Plugins Menu**
         plugins_menu = QMenu("Plugins", self)
         self.addMenu(plugins_menu)
@@ -33,3 +55,35 @@ class MenuBarGUI(QMenuBar):
         action_manage_plugins = QAction("Manage Plugins", self)
         action_manage_plugins.triggered.connect(self.manage_plugins_signal.emit)
         plugins_menu.addAction(action_manage_plugins)
+
+        # **Diagnostics Menu**
+        diagnostics_menu = QMenu("Diagnostics", self)
+        self.addMenu(diagnostics_menu)
+
+        action_toggle_hud = QAction("Frame Timing HUD", self)
+        action_toggle_hud.triggered.connect(self.toggle_hud_signal.emit)
+        diagnostics_menu.addAction(action_toggle_hud)
+
+        diagnostics_menu.addSeparator()
+
+        action_export_trace = QAction("Export Trace...", self)
+        action_export_trace.triggered.connect(self.export_trace_signal.emit)
+        diagnostics_menu.addAction(action_export_trace)
+
+        action_clear_trace = QAction("Clear Trace", self)
+        action_clear_trace.triggered.connect(self.clear_trace_signal.emit)
+        diagnostics_menu.addAction(action_clear_trace)
+
+        action_memory_panel = QAction("Memory Usage...", self)
+        action_memory_panel.triggered.connect(self.memory_panel_signal.emit)
+        diagnostics_menu.addAction(action_memory_panel)
+
+        diagnostics_menu.addSeparator()
+
+        self.action_record_input = QAction("Record Input", self)
+        self.action_record_input.triggered.connect(self.record_input_signal.emit)
+        diagnostics_menu.addAction(self.action_record_input)
+
+    def set_input_recording(self, recording: bool):
+        """Show whether the input is being recorded"""
+        self.action_record_input.setText("Stop Recording Input..." if recording else "Record Input")
@@ -3,4 +3,14 @@ from src.MenuBar.MenuBar import MenuBar
 def MenuBarMediator(PyPainter) -> MenuBar:
     menu_bar = MenuBar()
     menu_bar.callback_update_image = PyPainter.update_image
+    menu_bar.callback_show_proxy_image = PyPainter.show_proxy_image
+    menu_bar.callback_hide_proxy_image = PyPainter.hide_proxy_image
+    menu_bar.callback_open_project = PyPainter.open_project
+    menu_bar.callback_save_project = PyPainter.save_project
+    menu_bar.callback_recover_autosave = PyPainter.recover_autosave
+    menu_bar.callback_export_image = PyPainter.export_image
+    menu_bar.callback_toggle_hud = PyPainter.zoomable_widget.toggle_hud
+    menu_bar.callback_show_memory_panel = PyPainter.show_memory_panel
+    menu_bar.callback_start_input_recording = PyPainter.input_recorder.start
+    menu_bar.callback_stop_input_recording = PyPainter.input_recorder.stop
     return menu_bar
\ No newline at end of file
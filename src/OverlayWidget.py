@@ -1,7 +1,8 @@
 from PyQt5.QtCore import Qt, QRect
-from PyQt5.QtGui import QPainter, QPen
+from PyQt5.QtGui import QPainter, QPen, QRegion
 from PyQt5.QtWidgets import QWidget
 from src.config import *
+from src.utils.repaint import border_region
 
 class OverlayWidget(QWidget):
     def __init__(self, parent=None):
@@ -15,6 +16,26 @@ class OverlayWidget(QWidget):
         self.is_drawing = False
         self.setMouseTracking(True) # Enable mouse tracking
 
+    def selection_rect(self) -> QRect:
+        '''
+        The rectangle drawn for the selection (adjusted for the width of the pen) or None
+        '''
+        if not (self.start_pos and self.end_pos):
+            return None
+        inner_rect = QRect(self.start_pos, self.end_pos).normalized() # the inner_rect is the actual selection
+        # Adjust the rectangle dimensions to account for the width of the rectangle
+        return QRect(inner_rect.left() - self.border // 2, inner_rect.top() - self.border // 2,
+                     inner_rect.width() + self.border - 1, inner_rect.height() + self.border - 1)
+
+    def selection_region(self) -> QRegion:
+        '''
+        The region which has to be repainted when the drawn selection changes: its border only
+        '''
+        rect = self.selection_rect()
+        if rect is None:
+            return QRegion()
+        return border_region(rect, self.border + 1)
+
     def paintEvent(self, event):
         '''
         Paint a rectangle when the user is creating a new Draggable Box
@@ -23,9 +44,5 @@ class OverlayWidget(QWidget):
             painter = QPainter(self)
             pen = QPen(Qt.blue, self.border, Qt.SolidLine)
             painter.setPen(pen)
-            inner_rect = QRect(self.start_pos, self.end_pos).normalized() # the inner_rect is the actual selection
             painter.setRenderHint(QPainter.Antialiasing, False)
-            # Adjust the rectangle dimensions to account for the width of the rectangle
-            outer_rect = QRect(inner_rect.left() - self.border // 2, inner_rect.top() - self.border // 2,
-                               inner_rect.width() + self.border - 1, inner_rect.height() + self.border - 1)
-            painter.drawRect(outer_rect)
\ No newline at end of file
+            painter.drawRect(self.selection_rect())
\ No newline at end of file
@@ -0,0 +1,465 @@
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from src.DrawableElement import DrawableElement
+from src.Project.ProjectFile import ProjectDocument, ProjectLayer, _json_default
+from src.utils.Box import Box
+
+'''
+The autosave journal is an append-only file of records:
+
+    header:  JOURNAL_MAGIC (8 bytes)
+    records: tag (4 bytes) | crc32 of the payload (uint32) | payload length (uint32) | payload
+
+CANV   (json) the canvas shape and tile size. Everything journaled before it is obsolete
+LAYR   (json) the ids and visibility of the layers and the ids of their elements in order
+TILE   (binary) one tile of the image or the final image of a layer
+ELEM   (json) the instructions and transformation of a drawable element
+CHKP   (json) the end of a checkpoint. Replaying stops at the last complete checkpoint
+
+A checkpoint appends only the tiles inside the regions marked dirty on the layers
+(see Layer.mark_dirty) and the elements which are new or were transformed. The
+tiles are copied on the GUI thread. Hashing, compressing and writing happen on a
+background thread. Tiles whose content did not change since they were last
+journaled are skipped. When the journal grows too large it is compacted by
+rewriting it with only the latest record of every tile and element.
+'''
+
+JOURNAL_MAGIC = b'PYPAJRN\x00'
+
+TAG_CANVAS = b'CANV'
+TAG_LAYERS = b'LAYR'
+TAG_TILE = b'TILE'
+TAG_ELEMENT = b'ELEM'
+TAG_CHECKPOINT = b'CHKP'
+
+# Which raster of a layer a tile belongs to
+RASTER_IMAGE = 0
+RASTER_FINAL_IMAGE = 1
+
+# Queued by take_error to make the background thread start a new journal after a failure
+_RESTART = 'restart'
+
+_RECORD_HEADER = struct.Struct('<4sII')
+_TILE_HEADER = struct.Struct('<QBIIBIII') # layer id, raster, tile row, tile col, compressed, h, w, channels
+
+
+class AutosaveJournal:
+    '''
+    Journal the changes of the layers to a file so that the document can be recovered after a crash.
+    '''
+    def __init__(self,
+                 path: str,
+                 tile_size: int,
+                 compression_level: int,
+                 compact_bytes: int):
+        '''
+        Parameters:
+            path: the path of the journal file. An existing journal is overwritten
+            tile_size: the side of the square tiles in pixels
+            compression_level: the zlib compression level of the tiles
+            compact_bytes: the size of the journal in bytes above which it is compacted
+        '''
+        self.path = path
+        self.tile_size = tile_size
+        self.compression_level = compression_level
+        self.compact_bytes = compact_bytes
+        self.error: Optional[Exception] = None # the error which stopped the background thread from writing
+        self.checkpoints_written = 0 # the number of checkpoints written successfully
+        self._restart_pending = False # a new journal is started after an error (see take_error)
+
+        # State used by the GUI thread
+        self._canvas_shape: Optional[Tuple[int, int]] = None
+        self._layers_meta: Optional[list] = None # the last journaled LAYR record
+        self._known_layers: Set[int] = set() # ids of layers whose rasters were journaled
+        self._elements: Dict[int, tuple] = {} # element id -> the state it was journaled in
+
+        # State used by the background thread
+        self._file = None
+        self._file_created = False # the journal of a previous session is overwritten only once
+        self._tile_crcs: Dict[Tuple[int, int, int, int], int] = {} # tile key -> crc32 of the journaled tile
+        self._compacted_size = 0 # the size of the journal after the last compaction
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='AutosaveJournal', daemon=True)
+        self._thread.start()
+
+    ###############
+    # GUI thread  #
+    ###############
+
+    def checkpoint(self, layers: Iterable[Any], canvas_shape: Tuple[int, int]) -> int:
+        '''
+        Queue the changes of the layers since the last checkpoint to be written to the journal.
+        The work done here is proportional to the size of the dirty regions, not of the document.
+
+        Parameters:
+            layers: objects with `id`, `image`, `final_image`, `visible`, `elements`,
+                `take_dirty_regions()` and `take_image_dirty_regions()` (e.g. Layer)
+            canvas_shape: (height, width) of the canvas
+        Returns:
+            int: the number of records queued
+        '''
+        records = []
+        canvas_shape = tuple(canvas_shape)
+        if canvas_shape != self._canvas_shape:
+            # A new canvas makes everything journaled so far obsolete
+            self._canvas_shape = canvas_shape
+            self._layers_meta = None
+            self._known_layers = set()
+            self._elements = {}
+            records.append((TAG_CANVAS, {'canvas_shape': list(canvas_shape), 'tile_size': self.tile_size}))
+
+        layers = list(layers)
+        layers_meta = [{'id': layer.id,
+                        'visible': bool(layer.visible),
+                        'elements': [element.id for element in layer.elements]} for layer in layers]
+        if layers_meta != self._layers_meta:
+            self._layers_meta = layers_meta
+            records.append((TAG_LAYERS, {'layers': layers_meta}))
+
+        for layer in layers:
+            regions = layer.take_dirty_regions()
+            image_regions = layer.take_image_dirty_regions()
+            if layer.id not in self._known_layers:
+                # Journal the whole layer the first time it is seen
+                self._known_layers.add(layer.id)
+                regions = image_regions = None
+            if image_regions is None or len(image_regions) > 0:
+                records.extend(self._tile_records(layer.id, RASTER_IMAGE, layer.image, image_regions))
+            if regions is None or len(regions) > 0:
+                records.extend(self._tile_records(layer.id, RASTER_FINAL_IMAGE, layer.final_image, regions))
+
+            for element in layer.elements:
+                state = (element.visible, element.get_transformation().tobytes())
+                if self._elements.get(element.id) != state:
+                    self._elements[element.id] = state
+                    records.append((TAG_ELEMENT, element_to_record(element)))
+
+        if records:
+            records.append((TAG_CHECKPOINT, {'time': time.time()}))
+            self._queue.put(records)
+        return len(records)
+
+    def _tile_records(self, layer_id: int, raster: int, image: Any, regions: Optional[List[Box]]) -> List[tuple]:
+        '''
+        Copy the tiles of an image which intersect the regions. If regions is None copy all tiles.
+        '''
+        if image is None:
+            return []
+        height, width = image.shape[:2]
+        ts = self.tile_size
+        if regions is None:
+            regions = [Box(0, 0, width, height)]
+        tiles = set()
+        for region in regions:
+            left, top = max(0, region.left), max(0, region.top)
+            right, bottom = min(width, region.left + region.width), min(height, region.top + region.height)
+            if right <= left or bottom <= top:
+                continue
+            for tile_row in range(top // ts, (bottom - 1) // ts + 1):
+                for tile_col in range(left // ts, (right - 1) // ts + 1):
+                    tiles.add((tile_row, tile_col))
+
+        records = []
+        for tile_row, tile_col in sorted(tiles):
+            # Copy the tile since the image may be modified in place before it is written
+            pixels = np.array(image[tile_row * ts:(tile_row + 1) * ts, tile_col * ts:(tile_col + 1) * ts])
+            records.append((TAG_TILE, (layer_id, raster, tile_row, tile_col, pixels)))
+        return records
+
+    def take_error(self) -> Optional[Exception]:
+        '''
+        Get the error of a failed write once. The checkpoints queued after the failure are
+        dropped because they only contain changes which cannot be replayed without the lost
+        ones. So after an error the next checkpoint journals the whole document again in a
+        new journal, i.e. the write is retried.
+
+        Returns:
+            Optional[Exception]: the error or None if the journal is written fine
+        '''
+        error = self.error
+        if error is None or self._restart_pending:
+            return None
+        self._restart_pending = True
+        self._queue.put(_RESTART)
+        self._canvas_shape = None # journal everything again with the next checkpoint
+        return error
+
+    def flush(self) -> None:
+        '''
+        Wait until all queued checkpoints are written.
+        '''
+        self._queue.join()
+
+    def close(self) -> None:
+        '''
+        Write the queued checkpoints and stop the background thread.
+        '''
+        self._queue.put(None)
+        self._thread.join()
+
+    #####################
+    # Background thread #
+    #####################
+
+    def _run(self) -> None:
+        while True:
+            records = self._queue.get()
+            try:
+                if records is None:
+                    if self._file is not None:
+                        self._file.close()
+                    return
+                if records is _RESTART:
+                    self._restart()
+                elif self.error is None:
+                    self._write(records)
+                    self.checkpoints_written += 1
+                # else: the changes cannot be replayed after the failed write so they are dropped
+            except Exception as e:
+                self.error = e
+                print(f'[AutosaveJournal] Failed to write the journal: {e}')
+            finally:
+                self._queue.task_done()
+
+    def _restart(self) -> None:
+        '''
+        Start a new journal after a failed write. The next checkpoint rewrites the whole document.
+        '''
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        self._file_created = False
+        self._tile_crcs = {}
+        self.error = None
+        self._restart_pending = False
+
+    def _write(self, records: List[tuple]) -> None:
+        if self._file is None:
+            if self._file_created:
+                self._file = open(self.path, 'ab')
+            else:
+                self._file = open(self.path, 'wb')
+                self._file.write(JOURNAL_MAGIC)
+                self._file_created = True
+
+        for tag, content in records:
+            if tag == TAG_TILE:
+                payload = self._encode_tile(*content)
+                if payload is None:
+                    continue
+            else:
+                if tag == TAG_CANVAS:
+                    self._tile_crcs = {}
+                payload = json.dumps(content, default=_json_default).encode('utf-8')
+            self._file.write(_RECORD_HEADER.pack(tag, zlib.crc32(payload), len(payload)))
+            self._file.write(payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        # Compact once the journal has doubled since the last compaction and is above the threshold
+        size = self._file.tell()
+        if size > self.compact_bytes and size > 2 * self._compacted_size:
+            self._compact()
+
+    def _encode_tile(self, layer_id: int, raster: int, tile_row: int, tile_col: int, pixels: np.ndarray) -> Optional[bytes]:
+        '''
+        Encode a tile record. Return None if the tile is the same as when it was last journaled.
+        '''
+        key = (layer_id, raster, tile_row, tile_col)
+        pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+        crc = zlib.crc32(pixels)
+        if key in self._tile_crcs:
+            if self._tile_crcs[key] == crc:
+                return None
+        elif not pixels.any():
+            # Missing tiles are replayed as zeros so empty tiles of new layers need no record
+            self._tile_crcs[key] = crc
+            return None
+        self._tile_crcs[key] = crc
+
+        data = pixels.tobytes()
+        compressed = zlib.compress(data, self.compression_level) if self.compression_level > 0 else data
+        is_compressed = len(compressed) < len(data)
+        channels = pixels.shape[2] if pixels.ndim == 3 else 0
+        header = _TILE_HEADER.pack(layer_id, raster, tile_row, tile_col, is_compressed,
+                                   pixels.shape[0], pixels.shape[1], channels)
+        return header + (compressed if is_compressed else data)
+
+    def _compact(self) -> None:
+        '''
+        Rewrite the journal keeping only the latest record of every tile and element.
+        '''
+        self._file.close()
+        self._file = None
+        canvas, layers, tiles, elements = _latest_records(iter_records(self.path))
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(JOURNAL_MAGIC)
+            for tag, payload in _compacted_records(canvas, layers, tiles, elements):
+                file.write(_RECORD_HEADER.pack(tag, zlib.crc32(payload), len(payload)))
+                file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._file = open(self.path, 'ab')
+        self._compacted_size = self._file.tell()
+
+
+def element_to_record(element: DrawableElement) -> dict:
+    '''
+    Describe a drawable element for an ELEM record. The rasters of the element are not
+    journaled since they can be drawn again from the instructions.
+    '''
+    return {
+        'id': element.id,
+        'tool': element.tool,
+        'instructions': element.instructions,
+        'transformation': element.get_transformation().tolist(),
+        'visible': element.visible,
+        'size': list(element.size) if element.size is not None else None,
+        'offset': list(element.offset),
+    }
+
+
+def element_from_record(record: dict) -> DrawableElement:
+    element = DrawableElement(record['tool'],
+                              record['instructions'],
+                              size=tuple(record['size']) if record['size'] is not None else None,
+                              transformation=np.array(record['transformation'], dtype=np.float32))
+    element.visible = record['visible']
+    element.offset = tuple(record['offset'])
+    return element
+
+
+def iter_records(path: str) -> Iterator[Tuple[bytes, bytes]]:
+    '''
+    Iterate over the (tag, payload) records of a journal up to the last complete checkpoint.
+    A torn or corrupted tail (e.g. after a crash during a write) is ignored.
+    '''
+    with open(path, 'rb') as file:
+        if file.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+            raise ValueError(f'Not a PyPainter autosave journal: {path}')
+        pending = []
+        while True:
+            header = file.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                return
+            tag, crc, length = _RECORD_HEADER.unpack(header)
+            payload = file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            pending.append((tag, payload))
+            if tag == TAG_CHECKPOINT:
+                yield from pending
+                pending = []
+
+
+def decode_tile(payload: bytes) -> Tuple[Tuple[int, int, int, int], np.ndarray]:
+    '''
+    Decode a TILE record.
+
+    Returns:
+        ((layer id, raster, tile row, tile col), pixels)
+    '''
+    layer_id, raster, tile_row, tile_col, is_compressed, height, width, channels = \
+        _TILE_HEADER.unpack_from(payload)
+    data = payload[_TILE_HEADER.size:]
+    if is_compressed:
+        data = zlib.decompress(data)
+    shape = (height, width, channels) if channels else (height, width)
+    return (layer_id, raster, tile_row, tile_col), np.frombuffer(data, dtype=np.uint8).reshape(shape)
+
+
+def _latest_records(records: Iterable[Tuple[bytes, bytes]]):
+    '''
+    Helper function. Reduce the records to the latest state.
+
+    Returns:
+        (canvas, layers, tiles, elements) where canvas and layers are the latest CANV and LAYR
+        records, tiles maps a tile key to its latest payload and elements maps an element id to
+        its latest record.
+    '''
+    canvas, layers, tiles, elements = None, None, {}, {}
+    for tag, payload in records:
+        if tag == TAG_CANVAS:
+            canvas, layers, tiles, elements = json.loads(payload), None, {}, {}
+        elif tag == TAG_LAYERS:
+            layers = json.loads(payload)['layers']
+        elif tag == TAG_TILE:
+            tiles[_TILE_HEADER.unpack_from(payload)[:4]] = payload
+        elif tag == TAG_ELEMENT:
+            record = json.loads(payload)
+            elements[record['id']] = record
+    return canvas, layers, tiles, elements
+
+
+def _compacted_records(canvas, layers, tiles, elements) -> Iterator[Tuple[bytes, bytes]]:
+    '''
+    Helper function. Yield the records of a compacted journal. Records of deleted layers and
+    elements are dropped.
+    '''
+    if canvas is None:
+        return
+    yield TAG_CANVAS, json.dumps(canvas).encode('utf-8')
+    layers = layers or []
+    yield TAG_LAYERS, json.dumps({'layers': layers}).encode('utf-8')
+    layer_ids = {layer['id'] for layer in layers}
+    element_ids = {element_id for layer in layers for element_id in layer['elements']}
+    for key, payload in tiles.items():
+        if key[0] in layer_ids:
+            yield TAG_TILE, payload
+    for element_id, record in elements.items():
+        if element_id in element_ids:
+            yield TAG_ELEMENT, json.dumps(record, default=_json_default).encode('utf-8')
+    yield TAG_CHECKPOINT, json.dumps({'time': time.time()}).encode('utf-8')
+
+
+def read_journal(path: str) -> Optional[ProjectDocument]:
+    '''
+    Recover the document from an autosave journal. The elements have no image and need to
+    be drawn again from their instructions.
+
+    Returns:
+        ProjectDocument: the document at the last complete checkpoint or None if the journal is empty
+    '''
+    canvas, layers, tiles, elements = _latest_records(iter_records(path))
+    if canvas is None or layers is None:
+        return None
+    height, width = canvas['canvas_shape']
+    ts = canvas['tile_size']
+
+    rasters: Dict[Tuple[int, int], np.ndarray] = {}
+    for layer in layers:
+        for raster in (RASTER_IMAGE, RASTER_FINAL_IMAGE):
+            rasters[(layer['id'], raster)] = np.zeros((height, width, 4), dtype=np.uint8)
+    for payload in tiles.values():
+        (layer_id, raster, tile_row, tile_col), pixels = decode_tile(payload)
+        if (layer_id, raster) in rasters:
+            image = rasters[(layer_id, raster)]
+            image[tile_row * ts:tile_row * ts + pixels.shape[0],
+                  tile_col * ts:tile_col * ts + pixels.shape[1]] = pixels.reshape(
+                      pixels.shape[0], pixels.shape[1], -1)
+
+    project_layers = []
+    for layer in layers:
+        project_layers.append(ProjectLayer(
+            image=rasters[(layer['id'], RASTER_IMAGE)],
+            final_image=rasters[(layer['id'], RASTER_FINAL_IMAGE)],
+            visible=layer['visible'],
+            elements=[element_from_record(elements[i]) for i in layer['elements'] if i in elements]))
+    return ProjectDocument(canvas_shape=(height, width),
+                           layers=project_layers,
+                           active_layer_idx=len(project_layers) - 1 if project_layers else None)
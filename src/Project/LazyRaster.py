@@ -0,0 +1,215 @@
+import zlib
+import numpy as np
+from typing import Any, Dict, List, Tuple, Union
+
+'''
+A LazyRaster is a read-only image stored as tiles inside a buffer (usually a
+memory-mapped project file). Tiles are decoded only when a region containing
+them is requested, so opening a large project does not touch the pixel data
+and viewing it decodes only the visible tiles.
+'''
+
+# Tile codecs
+CODEC_ZERO = 'zero' # the tile is all zeros and no data is stored
+CODEC_RAW = 'raw' # the tile is stored uncompressed and read directly from the buffer
+CODEC_ZLIB = 'zlib' # the tile is compressed with zlib
+
+
+class LazyRaster:
+
+    def __init__(self,
+                 buffer: Any,
+                 shape: Tuple[int, ...],
+                 dtype: Union[str, np.dtype],
+                 tile_size: int,
+                 tiles: List[Tuple[int, int, str]],
+                 preview: np.ndarray = None):
+        '''
+        Parameters:
+            buffer: an object supporting the buffer protocol (e.g. mmap) containing the tiles
+            shape: the shape of the full image (h, w) or (h, w, c)
+            dtype: the numpy dtype of the image
+            tile_size: the side of the square tiles in pixels. Tiles at the edges may be smaller
+            tiles: (offset, length, codec) for each tile in row-major order
+            preview: an optional small version of the image (e.g. for thumbnails)
+        '''
+        self.buffer = buffer
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.tile_size = tile_size
+        self.tiles = tiles
+        self.preview = preview
+        self.tile_rows = -(-self.shape[0] // tile_size)
+        self.tile_cols = -(-self.shape[1] // tile_size)
+        self._decoded: Dict[Tuple[int, int], np.ndarray] = {} # (tile_row, tile_col) -> decoded tile
+        self._array: np.ndarray = None # the fully decoded image once it is requested
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    @property
+    def decoded_nbytes(self) -> int:
+        '''The number of bytes held by decoded tiles and the fully decoded image.'''
+        if self._array is not None:
+            return self._array.nbytes
+        return sum(tile.nbytes for tile in self._decoded.values())
+
+    def tile_shape(self, tile_row: int, tile_col: int) -> Tuple[int, ...]:
+        '''
+        Get the shape of a tile. Tiles on the bottom and right edges may be cropped.
+        '''
+        height = min(self.tile_size, self.shape[0] - tile_row * self.tile_size)
+        width = min(self.tile_size, self.shape[1] - tile_col * self.tile_size)
+        return (height, width, *self.shape[2:])
+
+    def get_tile(self, tile_row: int, tile_col: int) -> np.ndarray:
+        '''
+        Decode a single tile. Decoded tiles are kept so that each tile is decoded at most once.
+
+        Returns:
+            np.ndarray: a read-only array with the pixels of the tile
+        '''
+        key = (tile_row, tile_col)
+        if key in self._decoded:
+            return self._decoded[key]
+
+        offset, length, codec = self.tiles[tile_row * self.tile_cols + tile_col]
+        shape = self.tile_shape(tile_row, tile_col)
+        count = int(np.prod(shape))
+        if self.buffer is None and codec != CODEC_ZERO:
+            raise ValueError('The buffer of the raster was released')
+        if codec == CODEC_ZERO:
+            tile = np.zeros(shape, dtype=self.dtype)
+        elif codec == CODEC_RAW:
+            # Zero-copy view into the (memory-mapped) buffer
+            tile = np.frombuffer(self.buffer, dtype=self.dtype, count=count, offset=offset).reshape(shape)
+        elif codec == CODEC_ZLIB:
+            data = zlib.decompress(memoryview(self.buffer)[offset:offset + length])
+            tile = np.frombuffer(data, dtype=self.dtype, count=count).reshape(shape)
+        else:
+            raise ValueError(f'Unknown tile codec: {codec}')
+        tile.flags.writeable = False
+        self._decoded[key] = tile
+        return tile
+
+    def read_region(self, top: int, left: int, bottom: int, right: int) -> np.ndarray:
+        '''
+        Decode a rectangular region of the image. Only the tiles intersecting the region are decoded.
+
+        Returns:
+            np.ndarray: a new array with shape (bottom - top, right - left, ...)
+        '''
+        if self._array is not None:
+            return self._array[top:bottom, left:right].copy()
+        top, left = max(0, top), max(0, left)
+        bottom, right = min(self.shape[0], bottom), min(self.shape[1], right)
+        region = np.empty((max(0, bottom - top), max(0, right - left), *self.shape[2:]), dtype=self.dtype)
+        if region.size == 0:
+            return region
+        ts = self.tile_size
+        for tile_row in range(top // ts, (bottom - 1) // ts + 1):
+            for tile_col in range(left // ts, (right - 1) // ts + 1):
+                tile = self.get_tile(tile_row, tile_col)
+                # The intersection of the tile and the region in image coordinates
+                y0, y1 = max(top, tile_row * ts), min(bottom, tile_row * ts + tile.shape[0])
+                x0, x1 = max(left, tile_col * ts), min(right, tile_col * ts + tile.shape[1])
+                region[y0 - top:y1 - top, x0 - left:x1 - left] = \
+                    tile[y0 - tile_row * ts:y1 - tile_row * ts, x0 - tile_col * ts:x1 - tile_col * ts]
+        return region
+
+    def release(self) -> None:
+        '''
+        Drop the decoded tiles (raw tiles are views of the buffer) and the buffer itself so
+        that the buffer can be closed. Only a fully decoded raster can be read afterwards.
+        '''
+        self._decoded = {}
+        self.buffer = None
+
+    def to_array(self) -> np.ndarray:
+        '''
+        Decode the whole image. The result is kept so that it is decoded only once.
+        Do not modify the returned array in place - use `materialize` instead.
+        '''
+        if self._array is None:
+            self._array = self.read_region(0, 0, self.shape[0], self.shape[1])
+            self._decoded = {} # the tiles are no longer needed
+        return self._array
+
+    def __getitem__(self, key) -> np.ndarray:
+        '''
+        Support numpy-style indexing. Only the rows and columns selected by the first two
+        indices are decoded. E.g. raster[100:200, 50:80] decodes just the tiles touching it.
+        '''
+        if not isinstance(key, tuple):
+            key = (key,)
+        rows = key[0] if len(key) > 0 else slice(None)
+        cols = key[1] if len(key) > 1 else slice(None)
+        top, bottom, rows_key = _index_bounds(rows, self.shape[0])
+        left, right, cols_key = _index_bounds(cols, self.shape[1])
+        if top is None or left is None:
+            # Unsupported index (e.g. fancy indexing) - fall back to decoding everything
+            return self.to_array()[key]
+        region = self.read_region(top, left, bottom, right)
+        return region[(rows_key, cols_key, *key[2:])]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self.to_array()
+        if dtype is not None and np.dtype(dtype) != self.dtype:
+            return array.astype(dtype)
+        return array.copy() if copy else array
+
+    def __deepcopy__(self, memo) -> 'LazyRaster':
+        # The tiles are immutable so a copy can share the buffer. It has its own decoded tiles.
+        return LazyRaster(self.buffer, self.shape, self.dtype, self.tile_size, self.tiles, self.preview)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+
+def _index_bounds(index, size: int):
+    '''
+    Helper function. Convert an index along one axis to the bounds of the region that
+    needs to be decoded and to the index relative to that region.
+
+    Returns:
+        (start, stop, relative_index) or (None, None, None) if the index is not supported.
+    '''
+    if isinstance(index, (int, np.integer)):
+        index = int(index)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError(f'index {index} is out of bounds for axis with size {size}')
+        return index, index + 1, 0
+    if isinstance(index, slice):
+        start, stop, step = index.indices(size)
+        if step != 1:
+            return None, None, None
+        stop = max(start, stop)
+        return start, stop, slice(None)
+    return None, None, None
+
+
+def materialize(image: Union[np.ndarray, LazyRaster, None]) -> Union[np.ndarray, None]:
+    '''
+    Get a writable numpy array for an image which may be a LazyRaster. Numpy arrays are returned
+    as they are, so this is cheap to call on images that are already decoded.
+    '''
+    if isinstance(image, LazyRaster):
+        return image.to_array().copy()
+    return image
+
+
+def preview_image(image: Union[np.ndarray, LazyRaster]) -> np.ndarray:
+    '''
+    Get an image suitable for making a thumbnail. For a LazyRaster with a stored preview
+    return the preview so that no tiles need to be decoded.
+    '''
+    if isinstance(image, LazyRaster):
+        return image.preview if image.preview is not None else image.to_array()
+    return image
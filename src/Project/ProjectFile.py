@@ -0,0 +1,294 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+import cv2
+import numpy as np
+from typing import Any, BinaryIO, Iterable, List, Optional, Tuple, Union
+from src.DrawableElement import DrawableElement
+from src.Project.LazyRaster import LazyRaster, CODEC_ZERO, CODEC_RAW, CODEC_ZLIB
+from src.config import config
+
+'''
+The native project format (.pypaint) is a chunked binary container:
+
+    header:  MAGIC (8 bytes) | version (uint32) | reserved (uint32)
+    chunks:  tag (4 bytes) | payload length (uint64) | payload (padded to 16 bytes)
+    footer:  FOOTER_MAGIC (8 bytes) | offset of the META chunk (uint64)
+
+Every raster (the image and the final image of each layer, the image and the
+touch mask of each element) is split into square tiles. Each tile is stored in
+its own TILE chunk either raw, zlib-compressed or not at all if it is empty.
+The META chunk is written last and contains JSON describing the layers, the
+element instructions and transformations, and where the tiles of every raster
+are in the file. Reading a project parses only the META chunk and memory-maps
+the file. The pixel data is decoded lazily per tile (see LazyRaster).
+'''
+
+MAGIC = b'PYPAINT\x00'
+FOOTER_MAGIC = b'PYPAIDX\x00'
+VERSION = 1
+ALIGNMENT = 16
+
+_HEADER = struct.Struct('<8sII')
+_CHUNK_HEADER = struct.Struct('<4sQ')
+_FOOTER = struct.Struct('<8sQ')
+
+
+class ProjectLayer:
+    '''
+    A layer read from a project file. The images are LazyRaster objects.
+    '''
+    def __init__(self,
+                 image: LazyRaster,
+                 final_image: LazyRaster,
+                 visible: bool,
+                 elements: List[DrawableElement]):
+        self.image = image
+        self.final_image = final_image
+        self.visible = visible
+        self.elements = elements
+
+
+class ProjectDocument:
+    '''
+    The contents of a project file.
+    '''
+    def __init__(self,
+                 canvas_shape: Tuple[int, int],
+                 layers: List[ProjectLayer],
+                 active_layer_idx: Optional[int],
+                 buffer: Optional[mmap.mmap] = None):
+        self.canvas_shape = canvas_shape
+        self.layers = layers
+        self.active_layer_idx = active_layer_idx
+        self.buffer = buffer # the memory-mapped project file the rasters are read from
+
+    def close(self) -> None:
+        '''
+        Release the rasters of the document and close the memory-mapped file. Call it when
+        the document is replaced; its rasters cannot be decoded any more afterwards.
+        '''
+        if self.buffer is None:
+            return
+        for layer in self.layers:
+            rasters = [layer.image, layer.final_image]
+            for element in layer.elements:
+                rasters.extend((element.image, element.touch_mask))
+            for raster in rasters:
+                if isinstance(raster, LazyRaster) and raster.buffer is self.buffer:
+                    raster.release()
+        try:
+            self.buffer.close()
+        except BufferError:
+            pass # a view of a raw tile is still referenced. The map is closed when it is collected
+        self.buffer = None
+
+
+class ProjectWriter:
+    '''
+    Write a project file chunk by chunk.
+    '''
+    def __init__(self, file: BinaryIO, tile_size: int, compression_level: int):
+        self.file = file
+        self.tile_size = tile_size
+        self.compression_level = compression_level
+        self.file.write(_HEADER.pack(MAGIC, VERSION, 0))
+
+    def write_chunk(self, tag: bytes, payload: Union[bytes, memoryview]) -> int:
+        '''
+        Write a chunk and return the offset of its payload in the file.
+        '''
+        self.file.write(_CHUNK_HEADER.pack(tag, len(payload)))
+        offset = self.file.tell()
+        self.file.write(payload)
+        padding = -self.file.tell() % ALIGNMENT
+        if padding:
+            self.file.write(b'\x00' * padding)
+        return offset
+
+    def write_raster(self, image: Optional[np.ndarray]) -> Optional[dict]:
+        '''
+        Write the tiles of an image and return the description of the raster for the META chunk.
+        '''
+        if image is None:
+            return None
+        image = np.asarray(image)
+        tiles = []
+        ts = self.tile_size
+        for top in range(0, image.shape[0], ts):
+            for left in range(0, image.shape[1], ts):
+                tile = np.ascontiguousarray(image[top:top + ts, left:left + ts])
+                if not tile.any():
+                    tiles.append((0, 0, CODEC_ZERO))
+                    continue
+                raw = memoryview(tile).cast('B')
+                compressed = zlib.compress(raw, self.compression_level) if self.compression_level > 0 else None
+                if compressed is not None and len(compressed) < 0.9 * len(raw):
+                    tiles.append((self.write_chunk(b'TILE', compressed), len(compressed), CODEC_ZLIB))
+                else:
+                    tiles.append((self.write_chunk(b'TILE', raw), len(raw), CODEC_RAW))
+        return {
+            'shape': list(image.shape),
+            'dtype': image.dtype.str,
+            'tile_size': ts,
+            'tiles': tiles,
+        }
+
+    def finish(self, meta: dict) -> None:
+        '''
+        Write the META chunk and the footer pointing to it.
+        '''
+        payload = json.dumps(meta, default=_json_default).encode('utf-8')
+        meta_offset = self.write_chunk(b'META', payload)
+        self.file.write(_FOOTER.pack(FOOTER_MAGIC, meta_offset - _CHUNK_HEADER.size))
+
+
+def write_project(path: str,
+                  layers: Iterable[Any],
+                  canvas_shape: Tuple[int, int],
+                  active_layer_idx: Optional[int] = None) -> None:
+    '''
+    Save the layers to a project file. The file is written next to the destination
+    and then moved in place so that an existing project is never left half-written.
+
+    Parameters:
+        path: the destination of the project file
+        layers: objects with `image`, `final_image`, `visible` and `elements` (e.g. Layer)
+        canvas_shape: (height, width) of the canvas
+        active_layer_idx: the index of the active layer
+    '''
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'wb') as file:
+            writer = ProjectWriter(file,
+                                   tile_size=config['project']['tile_size'],
+                                   compression_level=config['project']['compression_level'])
+            layers_meta = []
+            for layer in layers:
+                layers_meta.append({
+                    'visible': bool(layer.visible),
+                    'image': writer.write_raster(layer.image),
+                    'final_image': writer.write_raster(layer.final_image),
+                    'preview': writer.write_raster(make_preview(layer.final_image)),
+                    'elements': [write_element(writer, element) for element in layer.elements],
+                })
+            writer.finish({
+                'version': VERSION,
+                'canvas_shape': list(canvas_shape),
+                'active_layer_idx': active_layer_idx,
+                'layers': layers_meta,
+            })
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Do not leave the partially written file behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_element(writer: ProjectWriter, element: DrawableElement) -> dict:
+    '''
+    Write the rasters of a drawable element and return its description for the META chunk.
+    '''
+    return {
+        'tool': element.tool,
+        'instructions': element.instructions,
+        'transformation': element.get_transformation().tolist(),
+        'visible': element.visible,
+        'is_procedural': element.is_procedural,
+        'size': list(element.size) if element.size is not None else None,
+        'offset': list(element.offset),
+        'image': writer.write_raster(element.image),
+        'touch_mask': writer.write_raster(element.touch_mask),
+    }
+
+
+def read_project(path: str) -> ProjectDocument:
+    '''
+    Open a project file. Only the META chunk is parsed. The rasters are memory-mapped
+    and decoded lazily when they are accessed.
+    '''
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        magic, version, _ = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f'Not a PyPainter project file: {path}')
+        if version > VERSION:
+            raise ValueError(f'Unsupported project file version: {version}')
+        footer_magic, meta_offset = _FOOTER.unpack_from(buffer, len(buffer) - _FOOTER.size)
+        if footer_magic != FOOTER_MAGIC:
+            raise ValueError(f'The project file is incomplete or corrupted: {path}')
+        tag, length = _CHUNK_HEADER.unpack_from(buffer, meta_offset)
+        if tag != b'META':
+            raise ValueError(f'The project file is incomplete or corrupted: {path}')
+        payload_offset = meta_offset + _CHUNK_HEADER.size
+        meta = json.loads(bytes(buffer[payload_offset:payload_offset + length]))
+
+        layers = []
+        for layer_meta in meta['layers']:
+            preview = read_raster(buffer, layer_meta.get('preview'))
+            final_image = read_raster(buffer, layer_meta['final_image'])
+            final_image.preview = preview.to_array() if preview is not None else None
+            layers.append(ProjectLayer(image=read_raster(buffer, layer_meta['image']),
+                                       final_image=final_image,
+                                       visible=layer_meta['visible'],
+                                       elements=[read_element(buffer, e) for e in layer_meta['elements']]))
+    except Exception:
+        buffer.close()
+        raise
+    return ProjectDocument(canvas_shape=tuple(meta['canvas_shape']),
+                           layers=layers,
+                           active_layer_idx=meta['active_layer_idx'],
+                           buffer=buffer)
+
+
+def read_raster(buffer: mmap.mmap, raster_meta: Optional[dict]) -> Optional[LazyRaster]:
+    if raster_meta is None:
+        return None
+    return LazyRaster(buffer,
+                      shape=raster_meta['shape'],
+                      dtype=raster_meta['dtype'],
+                      tile_size=raster_meta['tile_size'],
+                      tiles=[tuple(tile) for tile in raster_meta['tiles']])
+
+
+def read_element(buffer: mmap.mmap, element_meta: dict) -> DrawableElement:
+    element = DrawableElement(element_meta['tool'],
+                              element_meta['instructions'],
+                              image=read_raster(buffer, element_meta['image']),
+                              size=tuple(element_meta['size']) if element_meta['size'] is not None else None,
+                              touch_mask=read_raster(buffer, element_meta['touch_mask']),
+                              transformation=np.array(element_meta['transformation'], dtype=np.float32))
+    element.visible = element_meta['visible']
+    element.is_procedural = element_meta['is_procedural']
+    element.offset = tuple(element_meta['offset'])
+    return element
+
+
+def make_preview(image: Optional[np.ndarray], max_side: int = 128) -> Optional[np.ndarray]:
+    '''
+    Create a small version of an image used for thumbnails of lazily loaded layers.
+    '''
+    if image is None:
+        return None
+    image = np.asarray(image)
+    scale = max_side / max(image.shape[0], image.shape[1])
+    if scale >= 1:
+        return image
+    size = (max(1, int(image.shape[1] * scale)), max(1, int(image.shape[0] * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def _json_default(obj: Any) -> Any:
+    '''
+    Helper function. Convert numpy values found in element instructions to JSON types.
+    '''
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
@@ -1,14 +1,22 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QProgressDialog, QMessageBox
+from PyQt5.QtCore import pyqtSignal, QTimer
 from src.ZoomableWidget import ZoomableWidget
 from src.ImageProcessor import ImageProcessor
 from src.ImageProcessingToolSetting import ImageProcessingToolSetting
 from src.Screenshooter.mediator import ScreenshooterMediator
 from src.MenuBar.mediator import MenuBarMediator
 from src.Layout.LayoutManager import LayoutManager
-from mss import mss
-import cv2
+from src.Project.AutosaveJournal import AutosaveJournal, read_journal
+from src.Export.Exporter import Exporter, ExportTarget
+from src.Export.QtExporter import QtExporter
+from src.utils.tracing import tracer
+from src.utils.icon_cache import icon_cache
+from src.Replay.InputTrace import InputRecorder
+from src.Diagnostics.MemoryAccounting import MemoryNode, account_image_processor
+from src.Diagnostics.MemoryPanel import MemoryPanel
 import numpy as np
+import os
+import struct
 from src.config import *
 
 class PyPainter(QWidget):
@@ -18,10 +26,16 @@ class PyPainter(QWidget):
 
     def __init__(self):
         super().__init__()
+        tracer.set_enabled(config['tracing']['enabled'])
+        tracer.set_buffer_size(config['tracing']['buffer_size'])
+        if config['icon_cache']['persist']:
+            icon_cache.set_directory(config['icon_cache']['directory'])
+
         self.zoomable_widget = ZoomableWidget(self)
         self.tool_settings_widget = ImageProcessingToolSetting()
         self.image_processor = ImageProcessor(self.zoomable_widget, self.tool_settings_widget)
         self.screenshooter = ScreenshooterMediator(self)
+        self.input_recorder = InputRecorder(self.zoomable_widget.zoomable_label, self.image_processor)
         self.menu_bar = MenuBarMediator(self)
 
         self.zoomable_widget.zoomable_label.draw_signal.connect(self.image_processor.on_mouse_move)
@@ -29,8 +43,16 @@ class PyPainter(QWidget):
         self.zoomable_widget.zoomable_label.stop_draw_signal.connect(self.image_processor.on_mouse_up)
         self.zoomable_widget.zoomable_label.new_image_signal.connect(self.image_processor.on_new_image)
 
+        self.exporter = QtExporter(Exporter(max_workers=config['export']['max_workers'],
+                                            defaults=config['export']))
+        self.memory_panel = None # created when it is shown for the first time
+
         self.initGUI()
 
+        self.autosave_journal = None
+        if config['autosave']['enabled']:
+            self.start_autosave()
+
     def initGUI(self):
         '''
         Initialise the GUI
@@ -70,18 +92,52 @@ class PyPainter(QWidget):
         self.setLayout(self.layout)
 
     def on_save(self):
+        '''
+        Export the edited image to a file chosen by the user
+        '''
+        self.menu_bar.save_image()
+
+    def export_image(self, path: str, scales: list = None):
+        '''
+        Export the edited image in the background. The layers are flattened here and the
+        encoding and writing happen on the exporter threads so that the GUI stays responsive.
+
+        Parameters:
+            path: the destination file. The format is chosen from the extension
+            scales: optional scales at which to export. The scale is added to the file name
+                of every scale other than 1 (e.g. image@0.5x.png)
+        '''
+        if self.image_processor.canvas_shape is None:
+            return
+        root, extension = os.path.splitext(path)
         try:
-            with mss() as sct:
-                screenshot = sct.grab({'left':self.transparent_window.draggable_widget.selection.left,
-                                       'top':self.transparent_window.draggable_widget.selection.top,
-                                       'width':self.transparent_window.draggable_widget.selection.width,
-                                       'height':self.transparent_window.draggable_widget.selection.height})
-                screenshot = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-                cv2.imwrite(config['paths']['screenshot_background'], screenshot)
-        except Exception as e:
-            print(e)
+            targets = [ExportTarget(path if scale == 1.0 else f'{root}@{scale:g}x{extension}', scale=scale)
+                       for scale in scales or [1.0]]
+        except ValueError as e:
+            self.show_error('Export', f'Cannot export {path}: {e}')
+            return
+
+        # Every export has its own progress dialog and job so that overlapping exports do not mix up
+        job = self.exporter.create_job(targets)
+        progress_dialog = QProgressDialog('Exporting...', None, 0, len(targets), self)
+        progress_dialog.setMinimumDuration(500) # shown only if the export takes a while
+        job.progress.connect(progress_dialog.setValue)
+        job.finished.connect(lambda: self.on_export_finished(job, progress_dialog))
+        self.exporter.start(job, self.image_processor.flatten())
+
+    def on_export_finished(self, job, progress_dialog: QProgressDialog):
+        '''
+        Close the progress dialog of a finished export and report the targets which failed
+        '''
+        progress_dialog.close()
+        progress_dialog.deleteLater()
+        if job.errors:
+            self.show_error('Export', 'Failed to export:\n' +
+                            '\n'.join(f'{path}: {error}' for path, error in job.errors))
 
     def closeEvent(self, event):
+        self.stop_autosave()
+        self.exporter.exporter.shutdown() # finish the exports in progress
         self.close_application_signal.emit()
         event.accept()
 
@@ -89,7 +145,150 @@ class PyPainter(QWidget):
         '''
         Update the image in the zoomable_widget
         '''
+        self.zoomable_widget.zoomable_label.editing_blocked = False
         self.zoomable_widget.zoomable_label.setImage(image)
 
         # Set the active layer as the only layer in the layer_list
-        self.image_processor.set_active_layer(self.image_processor.layer_list.layer_list[0])
\ No newline at end of file
+        self.image_processor.set_active_layer(self.image_processor.layer_list.layer_list[0])
+
+    def update_image_regions(self, image: np.ndarray, regions: list):
+        '''
+        Update only the changed regions of the image. If the size of the image changed or the
+        layer of the image was deleted it is loaded as a new image instead
+        '''
+        canvas_shape = self.image_processor.canvas_shape
+        if canvas_shape is None or image.shape[:2] != tuple(canvas_shape) or \
+                not self.image_processor.update_image_regions(image, regions):
+            self.update_image(image)
+
+    def preview_image(self, image: np.ndarray):
+        '''
+        Show an image in the zoomable_widget without replacing the document. Used for
+        live previews, e.g. of the screenshot selection while it is being dragged
+        '''
+        self.zoomable_widget.zoomable_label.setImage(image, notify=False)
+
+    def show_proxy_image(self, image: np.ndarray):
+        '''
+        Show the reduced-resolution proxy of an image which is still loading. The document is not
+        replaced and it cannot be edited until the full image replaces the proxy (see update_image)
+        '''
+        self.zoomable_widget.zoomable_label.editing_blocked = True
+        self.zoomable_widget.zoomable_label.setImage(image, notify=False)
+
+    def hide_proxy_image(self):
+        '''
+        Show the document again after the image of a shown proxy failed to load
+        '''
+        self.zoomable_widget.zoomable_label.editing_blocked = False
+        if self.image_processor.final_image is not None:
+            self.zoomable_widget.zoomable_label.setImage(self.image_processor.final_image, notify=False)
+        else:
+            self.zoomable_widget.zoomable_label.original_image = None
+            self.zoomable_widget.zoomable_label.update()
+
+    def memory_report(self) -> MemoryNode:
+        '''
+        Account for the memory held by the document, its thumbnails and the capture history
+        '''
+        return account_image_processor(self.image_processor, self.screenshooter.history)
+
+    def show_memory_panel(self):
+        '''
+        Show the window with the memory accounting which refreshes itself while it is open
+        '''
+        if self.memory_panel is None:
+            self.memory_panel = MemoryPanel(self.memory_report, self)
+        self.memory_panel.show()
+        self.memory_panel.raise_()
+
+    def open_project(self, path: str):
+        '''
+        Load a project file replacing the current image and layers
+        '''
+        try:
+            self.image_processor.load_project(path)
+        except (OSError, ValueError, struct.error) as e:
+            self.show_error('Open Project', f'Cannot open {path}: {e}')
+
+    def save_project(self, path: str):
+        '''
+        Save the current image and layers to a project file
+        '''
+        try:
+            self.image_processor.save_project(path)
+        except (OSError, ValueError) as e:
+            self.show_error('Save Project', f'Cannot save {path}: {e}')
+
+    def start_autosave(self):
+        '''
+        Start journaling the changes of the document periodically. The journal of the
+        previous session is kept as <path>.previous so that it can be recovered.
+        '''
+        path = config['autosave']['path']
+        if os.path.exists(path):
+            os.replace(path, f'{path}.previous')
+        self.autosave_journal = AutosaveJournal(path,
+                                                tile_size=config['autosave']['tile_size'],
+                                                compression_level=config['autosave']['compression_level'],
+                                                compact_bytes=config['autosave']['compact_bytes'])
+        self.autosave_failed_at = None # the number of checkpoints written when the journal failed
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.autosave)
+        self.autosave_timer.start(config['autosave']['interval_ms'])
+
+    def stop_autosave(self):
+        '''
+        Write a last checkpoint and stop the autosave journal.
+        '''
+        if self.autosave_journal is None:
+            return
+        self.autosave_timer.stop()
+        self.autosave()
+        self.autosave_journal.close()
+        self.autosave_journal = None
+
+    def autosave(self):
+        '''
+        Journal the changes since the last autosave. Only the changed tiles are copied here.
+        They are compressed and written on a background thread.
+        '''
+        if self.autosave_journal is None or self.image_processor.canvas_shape is None:
+            return
+        self.autosave_journal.checkpoint(self.image_processor.layer_list, self.image_processor.canvas_shape)
+        error = self.autosave_journal.take_error()
+        if error is None:
+            return
+        if self.autosave_failed_at == self.autosave_journal.checkpoints_written:
+            # The retry failed too (nothing was written since the last failure)
+            self.autosave_timer.stop()
+            self.show_error('Autosave', f'Autosave failed again and was turned off: {error}')
+            return
+        # The next checkpoint journals the whole document again
+        self.autosave_failed_at = self.autosave_journal.checkpoints_written
+        self.show_error('Autosave', f'Autosave failed: {error}\nIt will be retried with the next autosave.')
+
+    def show_error(self, title: str, message: str):
+        '''
+        Tell the user about an error which does not stop the application
+        '''
+        print(f'[PyPainter] {title}: {message}')
+        QMessageBox.warning(self, title, message)
+
+    def recover_autosave(self):
+        '''
+        Load the document from the autosave journal of the previous session
+        '''
+        path = f"{config['autosave']['path']}.previous"
+        if not os.path.exists(path):
+            self.show_error('Recover Autosave', f'There is no autosave to recover at {path}')
+            return
+        try:
+            document = read_journal(path)
+        except (OSError, ValueError, struct.error) as e:
+            self.show_error('Recover Autosave', f'Cannot recover the autosave at {path}: {e}')
+            return
+        if document is None:
+            self.show_error('Recover Autosave', f'The autosave at {path} is empty')
+            return
+        self.image_processor.load_document(document)
@@ -0,0 +1,103 @@
+import numpy as np
+from typing import Any, Iterable, List, Optional, Tuple
+from src.DrawableElement import DrawableElement
+from src.Layers.LayersCache import LayersCache
+from src.Rendering import compositing
+from src.Rendering.renderers import render_element
+
+
+class DocumentLayer:
+    '''
+    A layer without any Qt or GUI state. It can be pickled and sent to worker processes.
+    '''
+
+    _id_counter = 0 # Class variable to ensure unique IDs.
+
+    def __init__(self, image: np.ndarray, visible: bool = True):
+        self.image = image # The starting image on which we draw
+        self.final_image = np.array(image, copy=True) # The image with all the elements drawn
+        self.visible = visible
+        self.elements: List[DrawableElement] = []
+
+        # Assign a unqiue id to the layer
+        self.id = DocumentLayer._id_counter
+        DocumentLayer._id_counter += 1
+
+
+class Document:
+    '''
+    A headless document: layers of drawable elements and the cache of their unions.
+    Rendering only needs NumPy and cv2 (and a QGuiApplication for text), so a Document
+    can be rendered in tests, batch jobs and process pools without a display.
+    '''
+    def __init__(self, canvas_shape: Tuple[int, int]):
+        self.canvas_shape = tuple(canvas_shape) # (height, width)
+        self.layers: List[DocumentLayer] = []
+        self.cache = LayersCache()
+
+    @classmethod
+    def from_image(cls, image: np.ndarray) -> 'Document':
+        '''
+        Create a document with a single layer containing the image.
+        '''
+        if image.shape[2] == 3:
+            alpha_channel = np.full((*image.shape[:2], 1), 255, dtype=np.uint8)
+            image = np.concatenate((image, alpha_channel), axis=2)
+        document = cls(image.shape[:2])
+        document.add_layer(image)
+        return document
+
+    @classmethod
+    def from_layers(cls, layers: Iterable[Any], canvas_shape: Tuple[int, int]) -> 'Document':
+        '''
+        Take a snapshot of layers with `image`, `final_image`, `visible` and `elements` (e.g. the
+        Layer objects of the GUI). The images are shared, not copied. Lazily loaded images are decoded.
+        '''
+        document = cls(canvas_shape)
+        for layer in layers:
+            document_layer = document.add_layer(np.asarray(layer.image), visible=layer.visible)
+            document_layer.final_image = np.asarray(layer.final_image)
+            document_layer.elements = list(layer.elements)
+        return document
+
+    def add_layer(self, image: Optional[np.ndarray] = None, visible: bool = True) -> DocumentLayer:
+        '''
+        Add a layer on top. If no image is given the layer is empty (transparent).
+        '''
+        if image is None:
+            image = np.zeros((*self.canvas_shape, 4), dtype=np.uint8)
+        layer = DocumentLayer(image, visible=visible)
+        self.layers.append(layer)
+        return layer
+
+    def add_element(self, element: DrawableElement, layer_idx: int = -1) -> None:
+        '''
+        Draw an element from its instructions (if it has no image yet) and add it on top of a layer.
+        '''
+        render_element(element)
+        layer = self.layers[layer_idx]
+        layer.elements.append(element)
+        compositing.overlay_element_on_image(layer.final_image, element)
+        self.cache.invalidate(layer_idx % len(self.layers))
+
+    def set_visibility(self, layer_idx: int, visible: bool) -> None:
+        self.layers[layer_idx].visible = visible
+
+    def render_layer(self, layer_idx: int) -> None:
+        '''
+        Redraw the final image of a layer from its starting image and its elements.
+        '''
+        layer = self.layers[layer_idx]
+        for element in layer.elements:
+            render_element(element)
+        layer.final_image = compositing.render_layer(layer)
+        self.cache.invalidate(layer_idx % len(self.layers))
+
+    def render(self) -> np.ndarray:
+        '''
+        Composite the visible layers.
+
+        Returns:
+            np.ndarray: the BGRA image of the visible layers put together
+        '''
+        return compositing.composite_layers(self.layers, self.cache, self.canvas_shape)
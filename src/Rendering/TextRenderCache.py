@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import numpy as np
+
+'''
+A cache of the drawn text elements. Laying out rich text with a QTextDocument is by far
+the slowest part of drawing a text element, and the same text is drawn again and again:
+when a layer is rendered again, when an element is undone and redone and when a batch
+job puts the same annotation on every image.
+'''
+
+# (html, text color, text opacity, font size, width, height)
+Key = Tuple[str, str, float, int, int, int]
+
+
+class TextRenderCache:
+    '''
+    The images and touch masks of the most recently drawn texts. The least recently used
+    entries are dropped when there are more than max_entries or they take more than max_bytes.
+    The cached arrays are read-only because they are shared by all the elements with the
+    same instructions.
+    '''
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024):
+        '''
+        Parameters:
+            max_entries: the maximum number of drawn texts
+            max_bytes: the maximum memory for the images and touch masks. The newest entry is always kept
+        '''
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Key, Tuple[np.ndarray, np.ndarray]]' = OrderedDict() # from the oldest to the newest
+        self._lock = threading.Lock() # elements are drawn from the threads of the RenderServer too
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(instructions: dict) -> Key:
+        '''
+        Get the key of the instructions of a text element. Everything which changes the
+        drawn pixels is part of it.
+        '''
+        return (instructions['html'], instructions['text_color'], float(instructions['text_opacity']),
+                int(instructions.get('font_size', 0)), int(instructions['width']), int(instructions['height']))
+
+    def get(self, key: Key) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        '''
+        Get the (image, touch_mask) drawn for a key or None if it is not cached.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Key, image: np.ndarray, touch_mask: np.ndarray) -> None:
+        '''
+        Cache a drawn text. The arrays are made read-only.
+        '''
+        image.flags.writeable = False
+        touch_mask.flags.writeable = False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[0].nbytes + previous[1].nbytes
+            self._entries[key] = (image, touch_mask)
+            self.nbytes += image.nbytes + touch_mask.nbytes
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def entries(self):
+        '''
+        The (key, (image, touch_mask)) pairs from the newest to the oldest.
+        '''
+        with self._lock:
+            return list(reversed(self._entries.items()))
+
+    def _evict(self) -> None:
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            _, (image, touch_mask) = self._entries.popitem(last=False)
+            self.nbytes -= image.nbytes + touch_mask.nbytes
+
+
+# The texts drawn by draw_text
+text_render_cache = TextRenderCache()
@@ -0,0 +1,178 @@
+import cv2
+import numpy as np
+from typing import Any, Sequence, Tuple
+from src.DrawableElement import DrawableElement
+from src.Layers.LayersCache import LayersCache
+from src.Project.LazyRaster import LazyRaster
+from src.utils.frame_timing import frame_timer
+
+'''
+Pure NumPy compositing of layers and drawable elements. Nothing here depends on Qt,
+so it can run in tests, batch jobs and worker processes. A layer is any object with
+`image`, `final_image`, `visible` and `elements` (e.g. Layer or DocumentLayer).
+'''
+
+
+def overlay_images(image_bottom: np.ndarray, image_top: np.ndarray) -> np.ndarray:
+    '''
+    Overlay two images and return the result
+
+    Parameters:
+        image_bottom: the image on the bottom. cv2 image with 4 channels
+        image_top: the image on the top. cv2 image with 4 channels
+    Returns:
+        cv2 image with 4 channels. The result of placing image_top on top of image_bottom
+    '''
+    with frame_timer.stage('composite'):
+        bottom_alpha = image_bottom[:, :, 3] / 255.0
+        overlay_rgb = image_top[:, :, :3]
+        overlay_alpha = image_top[:, :, 3] / 255.0
+        image_result = np.zeros_like(image_bottom)
+        for c in range(3): # Loop over the RGB channels
+            image_result[:, :, c] = (overlay_rgb[:, :, c] * overlay_alpha +
+                                     image_bottom[:, :, c] * (1 - overlay_alpha)).astype(np.uint8)
+        # Compute the final alpha channel
+        image_result[:, :, 3] = ((overlay_alpha + bottom_alpha * (1.0 - overlay_alpha)) * 255).astype(np.uint8)
+    return image_result
+
+
+def overlay_element_on_image(image: np.ndarray, element: DrawableElement) -> np.ndarray:
+    '''
+    Modify an image by overlaying a element on top of it. Take into account opacity.
+    The image is modified in place and returned as modified. If the use case requires
+    for the original image to be unchanged you need to copy the image before calling
+    this function.
+
+    Parameters:
+        image: an opencv image
+        element: A drawable element that has already been rendered.
+            If the drawable element has an affine transformation it will be applied when overlayig it
+    '''
+    with frame_timer.stage('warp'):
+        # Get the transformation
+        transformation = element.get_transformation()
+        # Apply the affine transformation
+        transformed_element_img = cv2.warpAffine(np.asarray(element.image),
+                                                 transformation,
+                                                 (image.shape[1], image.shape[0]))
+
+    with frame_timer.stage('composite'):
+        overlay_rgb = transformed_element_img[:, :, :3] # RGB channels of the drawable element
+        overlay_alpha = transformed_element_img[:, :, 3] / 255.0 # The alpha channel of the drawable element
+        image_alpha = 1.0 - overlay_alpha
+        for c in range(3):
+            image[:, :, c] = (overlay_rgb[:, :, c] * overlay_alpha +
+                              image[:, :, c] * image_alpha).astype(np.uint8)
+        # Compute the final alpha channel
+        image[:, :, 3] = ((overlay_alpha + (image[:, :, 3] / 255) * (1.0 - overlay_alpha)) * 255).astype(np.uint8)
+
+    return image
+
+
+def render_partial_layer(layer: Any, start_index: int, end_index: int, canvas_shape: Tuple[int, int]) -> np.ndarray:
+    '''
+    Render part of a layer by adding the drawable elements together on a transparent image.
+
+    Parameters:
+        layer: the layer which will be partially rendered
+        start_index: the index of the first drawable element to draw
+        end_index: the index after the last drawable element to draw
+        canvas_shape: (height, width) of the canvas
+    '''
+    image = np.zeros((*canvas_shape, 4), dtype=np.uint8)
+    for i in range(start_index, end_index):
+        overlay_element_on_image(image, layer.elements[i])
+    return image
+
+
+def render_layer(layer: Any) -> np.ndarray:
+    '''
+    Render a layer from scratch: its starting image with all its drawable elements on top.
+    The drawable elements must already be drawn (see renderers.render_element).
+
+    Returns:
+        np.ndarray: the new final image of the layer
+    '''
+    image = np.array(layer.image, copy=True)
+    for element in layer.elements:
+        overlay_element_on_image(image, element)
+    return image
+
+
+class LazyComposite(LazyRaster):
+    '''
+    The union of images of which some are LazyRasters (e.g. the layers of a project which
+    was just opened). It is composited tile by tile when a region is requested, so only
+    the tiles of the layers under the requested region get decoded.
+    '''
+    def __init__(self, images: Sequence[Any], tile_size: int):
+        '''
+        Parameters:
+            images: the BGRA final images of the layers from the bottom to the top (at least 2)
+            tile_size: the side of the composited tiles. Use the tile size of the lazy images
+        '''
+        super().__init__(None, images[0].shape, np.uint8, tile_size, [])
+        self.images = list(images)
+
+    def get_tile(self, tile_row: int, tile_col: int) -> np.ndarray:
+        key = (tile_row, tile_col)
+        if key in self._decoded:
+            return self._decoded[key]
+        height, width = self.tile_shape(tile_row, tile_col)[:2]
+        top, left = tile_row * self.tile_size, tile_col * self.tile_size
+        tile = np.asarray(self.images[0][top:top + height, left:left + width])
+        for image in self.images[1:]:
+            tile = overlay_images(tile, np.asarray(image[top:top + height, left:left + width]))
+        tile.flags.writeable = False
+        self._decoded[key] = tile
+        return tile
+
+    def __deepcopy__(self, memo) -> 'LazyComposite':
+        return LazyComposite(self.images, self.tile_size)
+
+
+def composite_layers(layers: Sequence[Any], cache: LayersCache, canvas_shape: Tuple[int, int]) -> np.ndarray:
+    '''
+    Overlay all the visible layers using the cached unions of layers where possible.
+
+    Parameters:
+        layers: the layers from the bottom to the top
+        cache: the cache of unions of layers. The keys are tuples of indices in `layers`
+        canvas_shape: (height, width) of the canvas
+    Returns:
+        np.ndarray: the image of all the visible layers put together. A LazyComposite if
+            some of the layers are not decoded yet (see LazyRaster)
+    '''
+    # Get optimised instructions for overlaying the layers.
+    layers_to_render = tuple(i for i, l in enumerate(layers) if l.visible)
+
+    # Handle special cases of rendering zero or one layers
+    if len(layers_to_render) == 0:
+        return np.zeros((*canvas_shape, 4), dtype=np.uint8)
+    if len(layers_to_render) == 1:
+        return layers[layers_to_render[0]].final_image
+
+    # Composite the regions which are requested instead of decoding the lazy layers
+    lazy_images = [layers[i].final_image for i in layers_to_render if isinstance(layers[i].final_image, LazyRaster)]
+    if lazy_images:
+        return LazyComposite([layers[i].final_image for i in layers_to_render], lazy_images[0].tile_size)
+
+    with frame_timer.stage('plan'):
+        overlay_instructions = cache.get_overlay_instructions(layers_to_render)
+
+    # Execute the instructions overlaying the layers.
+    for instr in overlay_instructions:
+        # Get the images to overlay from the cache or the layers.
+        if len(instr[0]) == 1:
+            img_bottom = np.asarray(layers[instr[0][0]].final_image)
+        else:
+            img_bottom = cache[instr[0]]
+        if len(instr[1]) == 1:
+            img_top = np.asarray(layers[instr[1][0]].final_image)
+        else:
+            img_top = cache[instr[1]]
+        # Overlay the two images
+        img = overlay_images(img_bottom, img_top)
+        cache.add_cache((*instr[0], *instr[1]), img)
+
+    return cache[layers_to_render]
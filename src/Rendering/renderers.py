@@ -0,0 +1,167 @@
+import os
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Tuple
+from src.DrawableElement import DrawableElement
+from src.Rendering.TextRenderCache import TextRenderCache, text_render_cache
+
+'''
+Renderers draw a drawable element from its instructions. They are registered per
+tool name so that elements can be drawn without the tool objects (which are Qt
+widgets), e.g. in batch jobs and worker processes. The tools delegate their
+draw_drawable_element to the renderer registered for them.
+'''
+
+# tool name -> function drawing the element (it sets element.image and element.touch_mask)
+RENDERERS: Dict[str, Callable[[DrawableElement], None]] = {}
+
+_gui_application = None # the QGuiApplication created for rendering without a GUI
+
+
+def register_renderer(tool_name: str) -> Callable:
+    '''
+    Decorator registering a function as the renderer of the elements of a tool.
+    '''
+    def decorator(function: Callable[[DrawableElement], None]) -> Callable[[DrawableElement], None]:
+        RENDERERS[tool_name] = function
+        return function
+    return decorator
+
+
+def render_element(element: DrawableElement, redraw: bool = False) -> None:
+    '''
+    Draw an element from its instructions.
+
+    Parameters:
+        element: the drawable element
+        redraw: if False elements which already have an image are not drawn again
+    Raises:
+        KeyError: if no renderer is registered for the tool of the element
+    '''
+    if (not redraw) and element.image is not None:
+        return
+    RENDERERS[element.tool](element)
+
+
+def catmull_rom_spline(p0, p1, p2, p3, num_points: int = 100) -> List[Tuple[int, int]]:
+    """
+    Calculate Catmull-Rom spline points.
+
+    Parameters:
+        p0, p1, p2, p3 - Tuples (x, y) for the control points
+        num_points - Number of points to generate along the spline
+    Returns:
+        List of interpolated points along the Catmull-Rom spline
+    """
+    p0, p1, p2, p3 = np.array(p0), np.array(p1), np.array(p2), np.array(p3)
+    interpolated_points = []
+    # Calculate each interpolated point
+    for i in range(num_points + 1):
+        t = i / num_points # Parameter t ranges from 0 to 1
+        # Catmull-Rom spline formula
+        point = 0.5 * ((2 * p1) +
+                       (-p0 + p2) * t +
+                       (2*p0 - 5*p1 + 4*p2 - p3) * t**2 +
+                       (-p0 + 3*p1 - 3*p2 + p3) * t**3)
+        interpolated_points.append((int(point[0]), int(point[1])))
+    return interpolated_points
+
+
+@register_renderer('PencilTool')
+def draw_pencil(drawable_element: DrawableElement) -> None:
+    '''
+    Draw a pencil line. The pencil first draws the line on a mask. Then the masked areas of
+    the cleared image are made non transparent and with the right color. The points are in
+    canvas coordinates and `origin` is the position of the element image on the canvas.
+    '''
+    # Clear the image before drawing
+    drawable_element.clear_image()
+
+    # Get the instructions for drawing the DrawableElement
+    instructions = drawable_element.instructions
+    origin_x, origin_y = instructions.get('origin', (0, 0))
+    points = [(int(x) - origin_x, int(y) - origin_y) for x, y in instructions['points']]
+    color = instructions['color']
+    thickness = instructions['thickness']
+    alpha_value = instructions['alpha'] # already scaled to 0-255
+
+    mask = np.zeros(drawable_element.size, dtype=np.uint8)
+    # Draw the first point
+    if len(points) >= 1:
+        cv2.circle(mask, points[0], radius=0, color=255, thickness=thickness)
+    # Draw the line between the 1st and 2nd point
+    if len(points) >= 2:
+        cv2.line(mask, points[0], points[1], color=255, thickness=thickness)
+    # Draw the rest of the interpolated points/lines
+    for i in range(1, len(points) - 2):
+        # draw the between points i and i+1
+        spline_points = catmull_rom_spline(*points[i-1: i+3]) # calculate the spline points
+        # Draw lines between the interpolated points
+        for j in range(len(spline_points) - 1):
+            cv2.line(mask, spline_points[j], spline_points[j + 1], color=255, thickness=thickness)
+
+    # Change the drawn areas to the specified color with opacity
+    drawable_element.image[mask == 255] = (*color[:3], alpha_value)
+    drawable_element.touch_mask = mask
+
+
+@register_renderer('TextTool')
+def draw_text(drawable_element: DrawableElement) -> None:
+    '''
+    Draw rich text with a QTextDocument. This needs a QGuiApplication but no widgets,
+    so it also works without a display (see ensure_gui_application). Texts drawn with
+    the same instructions before are taken from text_render_cache without a new layout.
+    '''
+    instructions = drawable_element.instructions
+    width, height = int(instructions['width']), int(instructions['height'])
+    key = TextRenderCache.key(instructions)
+    cached = text_render_cache.get(key)
+    if cached is None:
+        cached = (layout_text(instructions, width, height), np.full((height, width), 255, dtype=np.uint8))
+        text_render_cache.put(key, *cached)
+
+    drawable_element.size = (height, width)
+    drawable_element.image, drawable_element.touch_mask = cached
+
+
+def layout_text(instructions: dict, width: int, height: int) -> np.ndarray:
+    '''
+    Lay out and paint the html of text instructions on a transparent BGRA image.
+    '''
+    from PyQt5.QtCore import QSizeF
+    from PyQt5.QtGui import QColor, QImage, QPainter, QPalette, QTextDocument, QAbstractTextDocumentLayout
+    ensure_gui_application()
+
+    document = QTextDocument()
+    document.setHtml(instructions['html'])
+    document.setPageSize(QSizeF(width, height))
+
+    # QImage.Format_ARGB32 is stored as BGRA on little-endian machines, i.e. the cv2 layout.
+    # Pass a pointer so that the QImage paints directly into the numpy array (a buffer is copied)
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    qimage = QImage(image.ctypes.data, width, height, image.strides[0], QImage.Format_ARGB32)
+    painter = QPainter(qimage)
+    painter.setRenderHint(QPainter.TextAntialiasing)
+    context = QAbstractTextDocumentLayout.PaintContext()
+    color = QColor(instructions['text_color'])
+    color.setAlphaF(instructions['text_opacity'])
+    context.palette.setColor(QPalette.Text, color)
+    document.documentLayout().draw(painter, context)
+    painter.end()
+
+    # QImage uses premultiplied alpha only for the _Premultiplied formats so the pixels are straight
+    return image
+
+
+def ensure_gui_application() -> None:
+    '''
+    Create a QGuiApplication if there is no Qt application yet. Without a display
+    the offscreen platform is used, e.g. in worker processes and tests.
+    '''
+    global _gui_application
+    from PyQt5.QtGui import QGuiApplication
+    if QGuiApplication.instance() is not None:
+        return
+    if not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    _gui_application = QGuiApplication([])
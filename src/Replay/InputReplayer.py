@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
+from src.Replay.InputTrace import InputTrace, EVENT_KINDS, DOWN, MOVE, UP
+from src.utils.frame_timing import percentiles
+
+'''
+Replay recorded input traces (see InputTrace) on an ImageProcessor without showing any
+window and measure the latency of every event: the time the ImageProcessor and the tool
+take to handle it and, optionally, to paint the canvas afterwards. Used to reproduce
+performance problems of real strokes and drags and as regression benchmarks.
+'''
+
+
+class ReplayResult:
+    '''
+    The latencies in seconds of the replayed events per kind of event.
+    '''
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {kind: [] for kind in EVENT_KINDS}
+        self.elapsed = 0.0 # seconds for the whole replay
+
+    def add(self, kind: str, latency: float) -> None:
+        self.latencies[kind].append(latency)
+
+    def summary(self) -> dict:
+        '''
+        Get the latency distribution per kind of event and of all the events.
+
+        Returns:
+            dict: kind -> {'count', 'mean', 'p50', 'p90', 'p99', 'max'} in seconds plus
+                'all' for all the events and 'elapsed' for the whole replay
+        '''
+        summary = {}
+        all_latencies = [latency for latencies in self.latencies.values() for latency in latencies]
+        for kind, latencies in list(self.latencies.items()) + [('all', all_latencies)]:
+            stats = percentiles(latencies)
+            del stats['last']
+            stats['count'] = len(latencies)
+            stats['mean'] = float(np.mean(latencies)) if latencies else 0.0
+            stats['max'] = max(latencies) if latencies else 0.0
+            summary[kind] = stats
+        summary['elapsed'] = self.elapsed
+        return summary
+
+
+class InputReplayer:
+    '''
+    Feed input traces to an ImageProcessor like the signals of the ZoomableLabel would.
+    '''
+    def __init__(self, image_processor, include_paint: bool = True):
+        '''
+        Parameters:
+            image_processor: the ImageProcessor receiving the events
+            include_paint: if True the canvas is painted after every event (offscreen) and
+                the painting is part of the latency
+        '''
+        self.image_processor = image_processor
+        self.zoomable_label = image_processor.zoomable_label
+        self.include_paint = include_paint
+
+    @classmethod
+    def create_headless(cls, include_paint: bool = True) -> 'InputReplayer':
+        '''
+        Create an ImageProcessor with its widgets without showing them. A QApplication is
+        created if there is none (using the offscreen platform when there is no display).
+        '''
+        from PyQt5.QtWidgets import QApplication
+        if QApplication.instance() is None:
+            if not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+                os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            cls._application = QApplication([])
+        from src.ZoomableWidget import ZoomableWidget
+        from src.ImageProcessor import ImageProcessor
+        from src.ImageProcessingToolSetting import ImageProcessingToolSetting
+        zoomable_widget = ZoomableWidget()
+        zoomable_widget.resize(1280, 720)
+        image_processor = ImageProcessor(zoomable_widget, ImageProcessingToolSetting())
+        return cls(image_processor, include_paint=include_paint)
+
+    def load_image(self, image: np.ndarray) -> None:
+        '''
+        Start from a new canvas with the image (like loading an image in the application).
+        '''
+        self.zoomable_label.setImage(image, notify=False)
+        self.image_processor.on_new_image()
+        self.image_processor.set_active_layer(self.image_processor.layer_list.layer_list[0])
+
+    def replay(self, trace: InputTrace, image: Optional[np.ndarray] = None, realtime: bool = False) -> ReplayResult:
+        '''
+        Replay a trace and measure the latency of every event.
+
+        Parameters:
+            trace: the recorded events
+            image: the image to draw on. A white canvas of the size of the trace by default
+            realtime: if True wait between the events as long as when they were recorded.
+                Otherwise the events are replayed as fast as possible
+        '''
+        if image is None:
+            image = np.full((*trace.canvas_shape, 3), 255, dtype=np.uint8)
+        self.load_image(image)
+        tools = self.image_processor.tool_manager.tools
+        handlers = {DOWN: self.image_processor.on_mouse_down,
+                    MOVE: self.image_processor.on_mouse_move,
+                    UP: self.image_processor.on_mouse_up}
+
+        result = ReplayResult()
+        current_tool = None
+        start = time.perf_counter()
+        for event in trace.events:
+            if event.tool != current_tool:
+                if event.tool not in tools:
+                    raise KeyError(f'The tool {event.tool} of the trace is not registered')
+                self.image_processor.tool_manager.get_tool(event.tool).set_tool()
+                current_tool = event.tool
+            if realtime:
+                delay = start + event.time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            event_start = time.perf_counter()
+            handlers[event.kind](event.x, event.y)
+            if self.include_paint:
+                self.zoomable_label.grab() # paints the label synchronously
+            result.add(event.kind, time.perf_counter() - event_start)
+        result.elapsed = time.perf_counter() - start
+        return result
+
+
+def format_summary(summary: dict) -> str:
+    lines = [f'{"event":<6} {"count":>6} {"mean":>9} {"p50":>9} {"p90":>9} {"p99":>9} {"max":>9}']
+    for kind in (*EVENT_KINDS, 'all'):
+        stats = summary[kind]
+        lines.append(f'{kind:<6} {stats["count"]:>6} ' + ' '.join(
+            f'{stats[key] * 1000:>6.2f} ms' for key in ('mean', 'p50', 'p90', 'p99', 'max')))
+    lines.append(f'replayed in {summary["elapsed"]:.2f}s')
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay recorded input traces and report the latency of the events.')
+    parser.add_argument('traces', nargs='+', help='input trace files recorded with Diagnostics > Record Input')
+    parser.add_argument('-i', '--image', default=None, help='image to draw on (default: a white canvas)')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='number of times to replay every trace')
+    parser.add_argument('-o', '--output', default=None, help='write the latency summaries to this JSON file')
+    parser.add_argument('--realtime', action='store_true', help='keep the recorded timing between the events')
+    parser.add_argument('--no-paint', action='store_true', help='do not paint the canvas after every event')
+    args = parser.parse_args(argv)
+
+    image = None
+    if args.image is not None:
+        image = cv2.imread(args.image, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            print(f'[replay_input] Failed to read {args.image}', file=sys.stderr)
+            return 1
+
+    replayer = InputReplayer.create_headless(include_paint=not args.no_paint)
+    summaries = {}
+    for path in args.traces:
+        trace = InputTrace.load(path)
+        for i in range(args.repeat):
+            result = replayer.replay(trace, image=image, realtime=args.realtime)
+            summary = result.summary()
+            summaries[f'{path}#{i}' if args.repeat > 1 else path] = summary
+            print(f'[replay_input] {path} ({len(trace)} events, run {i + 1}/{args.repeat})')
+            print(format_summary(summary))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(summaries, file, indent=4)
+    return 0
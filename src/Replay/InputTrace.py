@@ -0,0 +1,129 @@
+import json
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+'''
+Recording of the mouse input of the canvas. The ZoomableLabel emits start_draw_signal,
+draw_signal and stop_draw_signal with image coordinates while a tool is drawing. The
+recorder stores these events with the active tool and the time so that the same strokes
+and drags can be replayed later (see InputReplayer).
+'''
+
+TRACE_VERSION = 1
+
+# The kinds of the events and the signals of the ZoomableLabel they come from
+DOWN = 'down' # start_draw_signal
+MOVE = 'move' # draw_signal
+UP = 'up' # stop_draw_signal
+EVENT_KINDS = (DOWN, MOVE, UP)
+
+
+class InputEvent(NamedTuple):
+    time: float # seconds since the start of the recording
+    kind: str # DOWN, MOVE or UP
+    x: int # the coordinates in the image
+    y: int
+    tool: str # the name of the active tool e.g. 'PencilTool'
+
+
+class InputTrace:
+    '''
+    A recorded sequence of input events on a canvas of a given size.
+    '''
+    def __init__(self, canvas_shape: Tuple[int, int], events: Optional[List[InputEvent]] = None):
+        self.canvas_shape = tuple(canvas_shape) # (height, width)
+        self.events: List[InputEvent] = events if events is not None else []
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    @property
+    def duration(self) -> float:
+        return self.events[-1].time if self.events else 0.0
+
+    def tools(self) -> List[str]:
+        '''
+        The tools used in the trace in the order of their first use.
+        '''
+        return list(dict.fromkeys(event.tool for event in self.events))
+
+    def save(self, path: str) -> None:
+        '''
+        Write the trace to a JSON file. The events are stored as compact lists.
+        '''
+        with open(path, 'w') as file:
+            json.dump({
+                'version': TRACE_VERSION,
+                'canvas_shape': list(self.canvas_shape),
+                'events': [[round(event.time, 6), event.kind, event.x, event.y, event.tool] for event in self.events],
+            }, file, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str) -> 'InputTrace':
+        '''
+        Read a trace written by save().
+
+        Raises:
+            ValueError: if the file is not a trace of a supported version
+        '''
+        with open(path, 'r') as file:
+            data = json.load(file)
+        if data.get('version') != TRACE_VERSION:
+            raise ValueError(f'Unsupported input trace version {data.get("version")} in {path}')
+        events = [InputEvent(float(t), kind, int(x), int(y), tool) for t, kind, x, y, tool in data['events']]
+        for event in events:
+            if event.kind not in EVENT_KINDS:
+                raise ValueError(f'Unknown input event kind {event.kind} in {path}')
+        return cls(data['canvas_shape'], events)
+
+
+class InputRecorder:
+    '''
+    Record the drawing signals of a ZoomableLabel together with the active tool of an ImageProcessor.
+    '''
+    def __init__(self, zoomable_label, image_processor):
+        self.zoomable_label = zoomable_label
+        self.image_processor = image_processor
+        self.trace: Optional[InputTrace] = None
+        self.start_time = None
+
+    def is_recording(self) -> bool:
+        return self.start_time is not None
+
+    def start(self) -> None:
+        '''
+        Start a new recording on the current canvas.
+        '''
+        if self.is_recording():
+            return
+        self.trace = InputTrace(self.image_processor.canvas_shape or (0, 0))
+        self.start_time = time.perf_counter()
+        self.zoomable_label.start_draw_signal.connect(self.on_mouse_down)
+        self.zoomable_label.draw_signal.connect(self.on_mouse_move)
+        self.zoomable_label.stop_draw_signal.connect(self.on_mouse_up)
+
+    def stop(self) -> Optional[InputTrace]:
+        '''
+        Stop recording and return the trace.
+        '''
+        if not self.is_recording():
+            return self.trace
+        self.zoomable_label.start_draw_signal.disconnect(self.on_mouse_down)
+        self.zoomable_label.draw_signal.disconnect(self.on_mouse_move)
+        self.zoomable_label.stop_draw_signal.disconnect(self.on_mouse_up)
+        self.start_time = None
+        return self.trace
+
+    def on_mouse_down(self, x: int, y: int) -> None:
+        self.record(DOWN, x, y)
+
+    def on_mouse_move(self, x: int, y: int) -> None:
+        self.record(MOVE, x, y)
+
+    def on_mouse_up(self, x: int, y: int) -> None:
+        self.record(UP, x, y)
+
+    def record(self, kind: str, x: int, y: int) -> None:
+        tool = self.image_processor.current_tool
+        self.trace.events.append(InputEvent(time.perf_counter() - self.start_time, kind, int(x), int(y),
+                                            type(tool).__name__ if tool is not None else ''))
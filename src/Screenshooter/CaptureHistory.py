@@ -0,0 +1,195 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import cv2
+import numpy as np
+from src.utils.Box import Box
+
+
+class CaptureEntry:
+    '''
+    A screenshot in the capture history. The pixels are compressed with zlib on a
+    background thread. Until then the uncompressed image is kept.
+    '''
+    _id_counter = 0 # Class variable to ensure unique IDs.
+
+    def __init__(self, image: np.ndarray, thumbnail: np.ndarray, checksum: int, dhash: int,
+                 region: Optional[Box], geometry: Optional[Box]):
+        self.id = CaptureEntry._id_counter
+        CaptureEntry._id_counter += 1
+        self.timestamp = time.time()
+        self.shape = image.shape
+        self.dtype = image.dtype
+        self.region = region # the captured part of the screen in physical pixels
+        self.geometry = geometry # the same part of the screen in logical pixels
+        self.checksum = checksum # crc32 of the pixels (exact duplicates)
+        self.dhash = dhash # difference hash of the thumbnail (similar screenshots)
+        self.thumbnail = thumbnail # a small BGRA image shown in the screenshooter panel
+        self.image: Optional[np.ndarray] = image # the uncompressed pixels until they are compressed
+        self.data: Optional[bytes] = None # the compressed pixels
+
+    @property
+    def nbytes(self) -> int:
+        '''
+        The memory held by the entry.
+        '''
+        size = self.thumbnail.nbytes
+        size += len(self.data) if self.data is not None else self.image.nbytes
+        return size
+
+    def to_array(self) -> np.ndarray:
+        image = self.image
+        if image is not None:
+            return image
+        return np.frombuffer(zlib.decompress(self.data), dtype=self.dtype).reshape(self.shape)
+
+
+class CaptureHistory:
+    '''
+    The last screenshots in a ring buffer with a byte budget. The oldest screenshots are
+    dropped when there are more than max_entries or they take more than max_bytes.
+    Taking the same screenshot again moves the existing entry to the front instead of
+    storing it twice.
+    '''
+    def __init__(self,
+                 max_entries: int = 20,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 compression_level: int = 1,
+                 thumbnail_size: int = 96,
+                 perceptual_distance: int = 0):
+        '''
+        Parameters:
+            max_entries: the maximum number of screenshots
+            max_bytes: the maximum memory for the compressed screenshots. The newest one is always kept
+            compression_level: the zlib compression level (0-9)
+            thumbnail_size: the longest side of the thumbnails in pixels
+            perceptual_distance: screenshots whose difference hashes differ in at most this many
+                bits are duplicates. 0 keeps all the screenshots which are not exactly the same
+        '''
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self.thumbnail_size = thumbnail_size
+        self.perceptual_distance = perceptual_distance
+        self._entries: 'OrderedDict[int, CaptureEntry]' = OrderedDict() # from the oldest to the newest
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='CaptureHistory')
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def entries(self) -> List[CaptureEntry]:
+        '''
+        The entries from the newest to the oldest.
+        '''
+        with self._lock:
+            return list(reversed(self._entries.values()))
+
+    def get(self, entry_id: int) -> Optional[np.ndarray]:
+        '''
+        Return the screenshot of an entry or None if it is no longer in the history.
+        '''
+        with self._lock:
+            entry = self._entries.get(entry_id)
+        return entry.to_array() if entry is not None else None
+
+    def add(self, image: np.ndarray, region: Box = None, geometry: Box = None) -> CaptureEntry:
+        '''
+        Add a screenshot. The image must not be modified afterwards.
+
+        Returns:
+            CaptureEntry: the new entry or the existing entry if the screenshot is a duplicate
+        '''
+        image = np.ascontiguousarray(image)
+        checksum = zlib.crc32(image)
+        thumbnail = self.make_thumbnail(image)
+        dhash = difference_hash(thumbnail)
+
+        with self._lock:
+            duplicate = self._find_duplicate(image, checksum, dhash)
+            if duplicate is not None:
+                duplicate.timestamp = time.time()
+                self._entries.move_to_end(duplicate.id)
+                return duplicate
+            entry = CaptureEntry(image, thumbnail, checksum, dhash, region, geometry)
+            self._entries[entry.id] = entry
+            self._evict()
+        self._executor.submit(self._compress, entry)
+        return entry
+
+    def remove(self, entry_id: int) -> None:
+        with self._lock:
+            self._entries.pop(entry_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def wait(self) -> None:
+        '''
+        Wait for the pending compressions, e.g. in tests.
+        '''
+        self._executor.submit(lambda: None).result()
+
+    def make_thumbnail(self, image: np.ndarray) -> np.ndarray:
+        '''
+        Make a small copy of an image quickly: subsample it first and then average the pixels.
+        '''
+        height, width = image.shape[:2]
+        scale = self.thumbnail_size / max(height, width)
+        if scale >= 1:
+            return image.copy()
+        step = max(1, int(1 / scale) // 4) # keep ~4 pixels per pixel of the thumbnail to average
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return cv2.resize(np.ascontiguousarray(image[::step, ::step]), size, interpolation=cv2.INTER_AREA)
+
+    def _find_duplicate(self, image: np.ndarray, checksum: int, dhash: int) -> Optional[CaptureEntry]:
+        for entry in self._entries.values():
+            if entry.shape != image.shape:
+                continue
+            if entry.checksum == checksum and np.array_equal(entry.to_array(), image):
+                return entry
+            if self.perceptual_distance > 0 and bin(entry.dhash ^ dhash).count('1') <= self.perceptual_distance:
+                return entry
+        return None
+
+    def _evict(self) -> None:
+        '''
+        Drop the oldest entries while there are too many or they take too much memory.
+        '''
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or
+                                          sum(entry.nbytes for entry in self._entries.values()) > self.max_bytes):
+            self._entries.popitem(last=False)
+
+    def _compress(self, entry: CaptureEntry) -> None:
+        with self._lock:
+            if entry.id not in self._entries:
+                return # evicted before it was compressed
+        data = zlib.compress(entry.image, self.compression_level)
+        with self._lock:
+            entry.data = data
+            entry.image = None
+
+
+def difference_hash(image: np.ndarray) -> int:
+    '''
+    A 64 bit perceptual hash: whether the brightness increases between neighbouring
+    pixels of an 9x8 grayscale copy of the image.
+    '''
+    if image.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        image = cv2.cvtColor(image, code)
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
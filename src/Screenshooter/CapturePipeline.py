@@ -0,0 +1,393 @@
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+from src.utils.Box import Box
+from src.Screenshooter.ScreenCapture import ScreenCapture
+from src.Screenshooter.TileChangeDetector import TileChangeDetector
+
+'''
+Record a region of the screen as a sequence of frames.
+
+A capture thread grabs frames from a frame source at a fixed rate and puts them in a
+bounded queue. Encoder workers take the frames from the queue and pass them to an
+encoder. When the encoders fall behind and the queue is full new frames are dropped
+(and counted) instead of delaying the capture.
+'''
+
+
+class Frame:
+    '''
+    A captured frame.
+    '''
+    def __init__(self, index: int, timestamp: float, image: np.ndarray, changed: Optional[List[Box]] = None):
+        self.index = index # the position of the frame in the recording
+        self.timestamp = timestamp # seconds since the start of the recording
+        self.image = image # BGRA (always the whole frame)
+        # The regions which changed since the previous captured frame. None if unknown
+        # (everything may have changed) and empty if the frame is the same as the previous one
+        self.changed = changed
+
+
+##########
+# Sources
+##########
+
+class FrameSource:
+    '''
+    Base class of the sources of frames.
+    '''
+    def grab(self) -> np.ndarray:
+        '''
+        Return the next frame as a BGRA image. The image must not be modified afterwards.
+        '''
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ScreenFrameSource(FrameSource):
+    '''
+    Capture a region of the screen. Every grab returns a new buffer so nothing is copied.
+    The frames are grabbed with the session of the capture thread which is closed with the source.
+    '''
+    def __init__(self, capture: ScreenCapture, region: Box):
+        self.capture = capture
+        self.region = region
+        self.session = None # the capture session of the thread which grabs the frames
+
+    def grab(self) -> np.ndarray:
+        if self.session is None:
+            self.session = self.capture.session
+        return self.capture.grab(self.region)
+
+    def close(self) -> None:
+        if self.session is not None:
+            self.capture.close_session(self.session)
+            self.session = None
+
+
+class SyntheticFrameSource(FrameSource):
+    '''
+    Generate frames without a screen: a gradient with a moving square. Used for tests
+    and benchmarks of the pipeline.
+    '''
+    def __init__(self, shape: Tuple[int, int] = (720, 1280), square_size: int = 64):
+        self.shape = tuple(shape) # (height, width)
+        self.square_size = square_size
+        self.num_frames = 0
+        height, width = self.shape
+        self.background = np.zeros((height, width, 4), dtype=np.uint8)
+        self.background[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+        self.background[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+        self.background[..., 3] = 255
+
+    def grab(self) -> np.ndarray:
+        height, width = self.shape
+        image = self.background.copy()
+        size = min(self.square_size, height, width)
+        left = (self.num_frames * 8) % max(1, width - size)
+        top = (self.num_frames * 4) % max(1, height - size)
+        image[top:top + size, left:left + size, :3] = (0, 0, 255)
+        self.num_frames += 1
+        return image
+
+
+###########
+# Encoders
+###########
+
+class FrameEncoder:
+    '''
+    Base class of the encoders. encode is called from several worker threads.
+    '''
+    def encode(self, frame: Frame) -> None:
+        raise NotImplementedError
+
+    def skip(self, index: int) -> None:
+        '''
+        Called for the frames which were dropped or failed to encode.
+        '''
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ImageSequenceEncoder(FrameEncoder):
+    '''
+    Write every frame to its own image file in a directory, e.g. for time-lapses.
+    '''
+    def __init__(self, directory: str, format: str = 'png'):
+        self.directory = directory
+        self.format = format.lower().lstrip('.')
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.directory, f'frame_{index:06d}.{self.format}')
+
+    def encode(self, frame: Frame) -> None:
+        if frame.changed is not None and len(frame.changed) == 0:
+            return # do not write the same image again
+        image = frame.image
+        if self.format in ('jpg', 'jpeg'):
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        if not cv2.imwrite(self.path(frame.index), image):
+            raise IOError(f'Failed to write {self.path(frame.index)}')
+
+
+class VideoEncoder(FrameEncoder):
+    '''
+    Write the frames to a video file. The workers may finish frames out of order so the
+    frames are buffered until all the previous frames have been written.
+    Dropped frames are skipped. When the changed regions of a frame are known and the
+    previous frame was written only these regions are converted.
+    '''
+    def __init__(self, path: str, fps: float, fourcc: str = 'mp4v'):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.writer: Optional[cv2.VideoWriter] = None
+        self.next_index = 0 # the index of the next frame to write
+        self.pending: Dict[int, np.ndarray] = {} # frames waiting for the previous frames
+        self.skipped = set() # indices of frames which will never arrive (dropped)
+        self.num_written = 0
+        self.last_image: Optional[np.ndarray] = None # the last written BGR image
+        self.last_index = None # the index of the last written frame
+        self._lock = threading.Lock()
+
+    def encode(self, frame: Frame) -> None:
+        if frame.changed is None:
+            pending = cv2.cvtColor(frame.image, cv2.COLOR_BGRA2BGR) # convert on the worker thread
+        else:
+            pending = frame # only the changed regions are converted when it is written
+        with self._lock:
+            self.pending[frame.index] = pending
+            self._write_ready()
+
+    def _to_bgr(self, index: int, pending) -> np.ndarray:
+        '''
+        Helper function. Get the BGR image of a pending frame.
+        '''
+        if not isinstance(pending, Frame):
+            return pending
+        if self.last_image is None or self.last_index != index - 1:
+            # The changes are relative to a frame which was not written
+            return cv2.cvtColor(pending.image, cv2.COLOR_BGRA2BGR)
+        # The last image has been written so it can be updated in place
+        for region in pending.changed:
+            rows = slice(region.top, region.top + region.height)
+            columns = slice(region.left, region.left + region.width)
+            self.last_image[rows, columns] = pending.image[rows, columns, :3]
+        return self.last_image
+
+    def skip(self, index: int) -> None:
+        '''
+        Do not wait for a frame which has been dropped.
+        '''
+        with self._lock:
+            self.skipped.add(index)
+            self._write_ready()
+
+    def _write_ready(self) -> None:
+        while True:
+            if self.next_index in self.skipped:
+                self.skipped.discard(self.next_index)
+            elif self.next_index in self.pending:
+                image = self._to_bgr(self.next_index, self.pending.pop(self.next_index))
+                if self.writer is None:
+                    height, width = image.shape[:2]
+                    self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                                  self.fps, (width, height))
+                self.writer.write(image)
+                self.last_image, self.last_index = image, self.next_index
+                self.num_written += 1
+            else:
+                return
+            self.next_index += 1
+
+    def close(self) -> None:
+        with self._lock:
+            # Write what is left in order
+            while self.pending:
+                self.next_index = min(self.pending)
+                self._write_ready()
+            if self.writer is not None:
+                self.writer.release()
+                self.writer = None
+
+
+###########
+# Pipeline
+###########
+
+class CaptureStats:
+    '''
+    The counters of a recording.
+    '''
+    def __init__(self):
+        self.captured = 0 # frames grabbed from the source
+        self.encoded = 0 # frames passed to the encoder
+        self.dropped = 0 # frames dropped because the queue was full
+        self.missed = 0 # capture ticks missed because grabbing was slower than the frame rate
+        self.failed = 0 # frames the encoder failed to encode
+        self.unchanged = 0 # frames which were the same as the previous frame
+        self.elapsed = 0.0 # seconds since the start of the recording
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class CapturePipeline:
+    '''
+    Capture frames from a source at a fixed rate and encode them on worker threads.
+    '''
+    def __init__(self,
+                 source: FrameSource,
+                 encoder: FrameEncoder,
+                 fps: float,
+                 max_queue: int = 8,
+                 workers: int = 2,
+                 max_frames: Optional[int] = None,
+                 duration: Optional[float] = None,
+                 change_detector: Optional[TileChangeDetector] = None,
+                 on_finished: Optional[Callable[[], None]] = None):
+        '''
+        Parameters:
+            source: where the frames come from
+            encoder: what the frames are passed to
+            fps: the number of frames captured per second (below 1 for time-lapses)
+            max_queue: the number of frames which can wait for an encoder
+            workers: the number of encoder threads
+            max_frames: stop after this many frames (dropped frames included)
+            duration: stop after this many seconds
+            change_detector: if given the changed regions of every frame are found so that
+                the encoders can skip the unchanged parts
+            on_finished: called from the capture thread when the capture ends, also when it ends
+                by itself (see max_frames and duration). Call wait or stop afterwards to
+                finish encoding and close the source and the encoder
+        '''
+        self.source = source
+        self.encoder = encoder
+        self.interval = 1 / fps
+        self.workers = workers
+        self.max_frames = max_frames
+        self.duration = duration
+        self.change_detector = change_detector
+        self.on_finished = on_finished
+        self.frames: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.stats = CaptureStats()
+        self.errors: List[Exception] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._capture_thread: Optional[threading.Thread] = None
+        self._worker_threads: List[threading.Thread] = []
+        self._start_time = None
+
+    def start(self) -> None:
+        self._start_time = time.perf_counter()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._encode_frames, name=f'CaptureEncoder-{i}', daemon=True)
+            thread.start()
+            self._worker_threads.append(thread)
+        self._capture_thread = threading.Thread(target=self._capture_frames, name='CaptureThread', daemon=True)
+        self._capture_thread.start()
+
+    def stop(self) -> CaptureStats:
+        '''
+        Stop capturing, wait for the queued frames to be encoded and close the source and the encoder.
+        '''
+        self._stop_event.set()
+        return self.wait()
+
+    def wait(self) -> CaptureStats:
+        '''
+        Wait until the recording ends (see max_frames and duration) and the frames are encoded.
+        '''
+        if self._capture_thread is not None:
+            self._capture_thread.join()
+            for thread in self._worker_threads:
+                thread.join()
+            self._capture_thread = None
+            self._worker_threads = []
+            self.source.close()
+            self.encoder.close()
+        return self.stats
+
+    def is_running(self) -> bool:
+        return self._capture_thread is not None and self._capture_thread.is_alive()
+
+    def _capture_frames(self) -> None:
+        index = 0
+        next_tick = self._start_time
+        try:
+            while not self._stop_event.is_set():
+                now = time.perf_counter()
+                if self.duration is not None and now - self._start_time >= self.duration:
+                    break
+                if self.max_frames is not None and index >= self.max_frames:
+                    break
+                if now < next_tick:
+                    self._stop_event.wait(next_tick - now)
+                    continue
+                # Skip the ticks which passed while grabbing the previous frame
+                missed = int((now - next_tick) / self.interval)
+                next_tick += (missed + 1) * self.interval
+
+                frame = self._grab_frame(index, now - self._start_time)
+                with self._lock:
+                    self.stats.captured += 1
+                    self.stats.missed += missed
+                    self.stats.unchanged += frame.changed is not None and len(frame.changed) == 0
+                try:
+                    self.frames.put_nowait(frame)
+                except queue.Full:
+                    with self._lock:
+                        self.stats.dropped += 1
+                    self.encoder.skip(index)
+                index += 1
+        except Exception as e:
+            print(f'[CapturePipeline] Capturing failed: {e}')
+            self.errors.append(e)
+        finally:
+            with self._lock:
+                self.stats.elapsed = time.perf_counter() - self._start_time
+            for _ in self._worker_threads:
+                self.frames.put(None) # stop the workers once the queue is empty
+            if self.on_finished is not None:
+                self.on_finished()
+
+    def _grab_frame(self, index: int, timestamp: float) -> Frame:
+        '''
+        Helper function. Grab a frame and find what changed since the previous frame.
+        '''
+        image = self.source.grab()
+        if self.change_detector is None:
+            return Frame(index, timestamp, image)
+        previous = self.change_detector.previous
+        changed = self.change_detector.changed_regions(image)
+        if previous is not None and len(changed) == 0:
+            # Keep the previous buffer so that the new one can be freed
+            image = previous
+            self.change_detector.reset(previous)
+        return Frame(index, timestamp, image, changed)
+
+    def _encode_frames(self) -> None:
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                return
+            try:
+                self.encoder.encode(frame)
+                with self._lock:
+                    self.stats.encoded += 1
+            except Exception as e:
+                print(f'[CapturePipeline] Failed to encode frame {frame.index}: {e}')
+                with self._lock:
+                    self.stats.failed += 1
+                    self.errors.append(e)
+                self.encoder.skip(frame.index)
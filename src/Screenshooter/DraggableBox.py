@@ -1,10 +1,11 @@
 from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import QFrame
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QCursor
+from PyQt5.QtGui import QCursor, QRegion
 import os
 from enum import IntEnum, auto
 from src.utils.Box import Box
+from src.utils.repaint import FrameThrottle
 from src.config import *
 
 class zone_areas(IntEnum):
@@ -42,6 +43,8 @@ class DraggableBox(QFrame):
                              100)
         else:
             self.selection = selection
+        # Apply the drag and resize moves at most once per frame
+        self.move_throttle = FrameThrottle(self.apply_mouse_move)
         self.initGUI()
 
     def initGUI(self):
@@ -79,18 +82,38 @@ class DraggableBox(QFrame):
         '''
         When dragging move the box
         '''
+        if self.dragging or self.resizing:
+            self.move_throttle.post(event.globalPos())
+        else:
+            self.update_cursor(self.get_zone(event.pos()))
+
+    def apply_mouse_move(self, global_pos):
+        '''
+        Move or resize the box following the mouse
+        '''
+        pos = self.mapFromGlobal(global_pos)
         if self.dragging:
-            new_position = self.mapToParent(event.pos() - self.offset)
+            new_position = self.mapToParent(pos - self.offset)
             self.move(new_position)
             # Update the selection
             self.update_selection()
         elif self.resizing:
-            self.resize_box(event.pos())
-        else:
-            self.update_cursor(self.get_zone(event.pos()))
+            self.resize_box(pos)
+
+    def resizeEvent(self, event):
+        '''
+        Mask the box to its border. Moving a transparent widget repaints everything it
+        covers, with the mask only the old and the new border are repainted. The events
+        inside of the box are forwarded to it by the TransparentWindow.
+        '''
+        super().resizeEvent(event)
+        rect = self.rect()
+        width = max(self.border, self.resize_border)
+        self.setMask(QRegion(rect).subtracted(QRegion(rect.adjusted(width, width, -width, -width))))
 
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton:
+            self.move_throttle.flush()
             self.dragging = False
             self.offset = None
             self.resizing = False
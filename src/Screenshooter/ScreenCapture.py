@@ -0,0 +1,122 @@
+import threading
+import numpy as np
+from mss import mss
+from typing import List, Optional
+from src.utils.Box import Box
+
+
+class ScreenCapture:
+    '''
+    A persistent screen capture session. Opening an mss session connects to the display
+    server and queries the monitors which is slow, so the session is opened once and reused.
+    mss sessions must not be shared between threads so every thread gets its own session.
+
+    All boxes are in physical pixels of the virtual screen (the union of the monitors).
+    '''
+    def __init__(self, factory=mss):
+        '''
+        Parameters:
+            factory: creates a capture session (mss by default)
+        '''
+        self.factory = factory
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        '''
+        The capture session of the calling thread.
+        '''
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self.factory()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def close_session(self, session) -> None:
+        '''
+        Close the session of a single thread, e.g. of a recording thread which has finished.
+        The thread opens a new session if it captures again.
+        '''
+        with self._lock:
+            if session not in self._sessions:
+                return
+            self._sessions.remove(session)
+        session.close()
+        if getattr(self._local, 'session', None) is session:
+            self._local.session = None
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+        self._local = threading.local()
+
+    def monitors(self) -> List[Box]:
+        '''
+        The boxes of the individual monitors.
+        '''
+        return [self._to_box(monitor) for monitor in self.session.monitors[1:]]
+
+    def virtual_screen(self) -> Box:
+        '''
+        The box containing all the monitors.
+        '''
+        return self._to_box(self.session.monitors[0])
+
+    def monitor_at(self, x: int, y: int) -> Optional[int]:
+        '''
+        Return the index (in monitors()) of the monitor containing a point or None.
+        '''
+        for i, monitor in enumerate(self.monitors()):
+            if monitor.left <= x < monitor.left + monitor.width and monitor.top <= y < monitor.top + monitor.height:
+                return i
+        return None
+
+    def grab(self, region: Box) -> np.ndarray:
+        '''
+        Capture a region of the screen. Only the pixels of the region are captured.
+
+        Parameters:
+            region: the region of the virtual screen. It is clipped to the virtual screen
+        Returns:
+            np.ndarray: the BGRA image. It is a view of the buffer of mss, nothing is copied
+        Raises:
+            ValueError: if the region does not intersect the virtual screen
+        '''
+        region = self.clip(region)
+        if region is None:
+            raise ValueError('The region is outside of the screen')
+        screenshot = self.session.grab(region._asdict())
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+    def grab_monitor(self, index: int) -> np.ndarray:
+        '''
+        Capture a single monitor (an index in monitors()).
+        '''
+        return self.grab(self.monitors()[index])
+
+    def clip(self, region: Box) -> Optional[Box]:
+        '''
+        Return the intersection of a region and the virtual screen or None if they do not intersect.
+        '''
+        screen = self.virtual_screen()
+        left = max(region.left, screen.left)
+        top = max(region.top, screen.top)
+        right = min(region.left + region.width, screen.left + screen.width)
+        bottom = min(region.top + region.height, screen.top + screen.height)
+        if right <= left or bottom <= top:
+            return None
+        return Box(left, top, right - left, bottom - top)
+
+    @staticmethod
+    def _to_box(monitor: dict) -> Box:
+        return Box(monitor['left'], monitor['top'], monitor['width'], monitor['height'])
+
+
+# The capture session shared by the application
+screen_capture = ScreenCapture()
@@ -1,14 +1,31 @@
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import QObject, pyqtSignal, QTimer
+from PyQt5.QtGui import QCursor, QGuiApplication
 from src.Screenshooter.ScreenshooterGUI import ScreenshooterGUI
-from mss import mss
+import os
 import cv2
+import time
+import threading
 import numpy as np
-from typing import Callable
+from typing import Callable, List, Tuple
 from src.utils.Box import Box
 from src.Screenshooter.TransparentWindow import TransparentWindow
+from src.Screenshooter.ScreenCapture import ScreenCapture, screen_capture
+from src.Screenshooter.TileChangeDetector import TileChangeDetector
+from src.Screenshooter.CaptureHistory import CaptureHistory
+from src.Screenshooter.CapturePipeline import (CapturePipeline, CaptureStats, ImageSequenceEncoder,
+                                               ScreenFrameSource, VideoEncoder)
 from src.config import config
 
 
+class RecordingEmitter(QObject):
+    '''
+    Deliver the end of a recording from its capture thread to the GUI thread
+    '''
+
+    # Signals
+    finished = pyqtSignal(object) # the CapturePipeline whose capture ended
+
+
 class Screenshooter:
 
     # image_singal is the signal going to be emitted when a new
@@ -16,15 +33,54 @@ class Screenshooter:
     # format.
     image_signal = pyqtSignal(object) # object is np.ndarray
 
-    def __init__(self, callback_capture: Callable = None):
+    def __init__(self,
+                 callback_capture: Callable = None,
+                 callback_preview: Callable = None,
+                 callback_update_regions: Callable = None,
+                 callback_error: Callable = None,
+                 capture: ScreenCapture = screen_capture):
         # The transparent window with a screenshot
         self.transparent_window: TransparentWindow = None
 
+        # The persistent screen capture session
+        self.capture = capture
+        self.capture_region: Box = None # the captured area of the screen in physical pixels
+        self.recording: CapturePipeline = None # the recording of the selection if one is running
+        self.recording_emitter = RecordingEmitter()
+        self.recording_emitter.finished.connect(self.on_recording_finished)
+
         # Define the callback that will be executed when there is
         # a new capture. The new image/capture will be passed
         # to the callback.
         self.callback_capture = callback_capture
 
+        # The callback showing a live preview of the selection while it changes. It gets
+        # a BGRA view of the screenshot and must not keep or modify it
+        self.callback_preview = callback_preview
+
+        # The callback updating only the changed regions of the captured image (see recapture).
+        # It gets the new BGRA image and a list of the changed regions (Box)
+        self.callback_update_regions = callback_update_regions
+
+        # The callback telling the user about an error. It gets a title and a message
+        self.callback_error = callback_error
+        self.change_detector = TileChangeDetector(config['screenshot']['change_tile_size'])
+        self.selected_screen_region: Box = None # the part of the screen which was last captured
+
+        # The last screenshots so that the user can go back to them
+        history_options = config['capture_history']
+        self.history = CaptureHistory(max_entries=history_options['max_entries'],
+                                      max_bytes=history_options['max_bytes'],
+                                      compression_level=history_options['compression_level'],
+                                      thumbnail_size=history_options['thumbnail_size'],
+                                      perceptual_distance=history_options['perceptual_distance'])
+
+        # Capture the image (and rebuild the document) only once the selection settles
+        self.capture_timer = QTimer()
+        self.capture_timer.setSingleShot(True)
+        self.capture_timer.setInterval(config['screenshot']['preview_debounce_ms'])
+        self.capture_timer.timeout.connect(self.capture_image)
+
         self.gui = ScreenshooterGUI()
         self.connect_signals()
 
@@ -35,38 +91,112 @@ class Screenshooter:
         self.gui.take_screenshot.connect(self.take_screenshot)
         self.gui.close_screenshot.connect(self.close_screenshot)
         self.gui.selection_changed.connect(self.change_selection)
+        self.gui.toggle_recording.connect(self.toggle_recording)
+        self.gui.recapture.connect(self.recapture)
+        self.gui.history_selected.connect(self.open_history_entry)
 
     def close(self):
         '''
         React to the application being closed by cosing the transparent window
+        and the capture session
         '''
         if self.transparent_window:
             self.transparent_window.close()
+        if self.recording is not None:
+            self.stop_recording()
+        self.capture.close()
+        self.history.close()
 
     def take_screenshot(self):
         '''
         Open a transparent window with the screenshot
         '''
-        with mss() as sct:
-            screenshot = sct.grab({'left': 0, 'top': 0, 'width': 1920, 'height': 1080})
-            self.screenshot_image = cv2.cvtColor(np.array(screenshot), cv2.COLOR_BGRA2BGR) # convert to opencv image
-            cv2.imwrite(config['paths']['screenshot_background'], self.screenshot_image)
+        region, geometry = self.get_capture_area()
+        # The BGRA buffer of mss viewed as an opencv image without copying it
+        image = self.capture.grab(region)
+        if config['screenshot']['save_background']:
+            self.save_screenshot_async(config['paths']['screenshot_background'], image)
+        self.history.add(image, region, geometry)
+        self.gui.set_history(self.history.entries())
+        self.open_screenshot(image, region, geometry)
+
+    def open_history_entry(self, entry_id: int):
+        '''
+        Open an earlier screenshot from the capture history.
+        '''
+        entry = next((entry for entry in self.history.entries() if entry.id == entry_id), None)
+        if entry is None:
+            return # dropped from the history in the meantime
+        self.open_screenshot(entry.to_array(), entry.region, entry.geometry)
+
+    def open_screenshot(self, image: np.ndarray, region: Box, geometry: Box):
+        '''
+        Open a transparent window with a screenshot.
 
-        # Open a window with the background being the screenshot
-        self.transparent_window = TransparentWindow()
+        Parameters:
+            image: the BGRA screenshot
+            region: the captured part of the screen in physical pixels
+            geometry: the same part of the screen in logical pixels
+        '''
+        self.close_screenshot()
+        self.capture_region = region
+        self.screenshot_image = image
+
+        # Open a window with the background being the screenshot (it shares the buffer)
+        self.transparent_window = TransparentWindow(self.screenshot_image, geometry)
+        self.gui.set_selection_range(geometry.width, geometry.height)
         self.transparent_window.show()
 
         # Connect the signal from the DraggableBox for screenshot selection (tracks any movement)
         self.transparent_window.draggable_widget.signal_selection_change_light.connect(self.update_selection)
+        self.transparent_window.draggable_widget.signal_selection_change_light.connect(self.preview_selection)
         self.transparent_window.signal_selection_change.connect(self.update_selection)
 
         # Connect the signal from the TransparentWindow to get updates of the selection (not while dragging/resizing)
-        self.transparent_window.signal_selection_change.connect(self.capture_image)
+        self.transparent_window.signal_selection_change.connect(self.preview_selection)
+
+    def get_capture_area(self) -> Tuple[Box, Box]:
+        '''
+        Find the area to capture according to config['screenshot']['monitor']: -1 for the
+        monitor under the cursor, 0 for all monitors and n for the n-th monitor.
+
+        Returns:
+            (the region to capture in physical pixels, the same region in logical pixels of Qt)
+        '''
+        monitor = config['screenshot']['monitor']
+        screen = QGuiApplication.screenAt(QCursor.pos()) or QGuiApplication.primaryScreen()
+        ratio = screen.devicePixelRatio() if screen is not None else 1.0
+        if monitor == 0:
+            region = self.capture.virtual_screen()
+        else:
+            if monitor < 0:
+                cursor = QCursor.pos()
+                monitor_idx = self.capture.monitor_at(round(cursor.x() * ratio), round(cursor.y() * ratio))
+                monitor_idx = 0 if monitor_idx is None else monitor_idx
+            else:
+                monitor_idx = min(monitor, len(self.capture.monitors())) - 1
+            region = self.capture.monitors()[monitor_idx]
+        geometry = Box(round(region.left / ratio), round(region.top / ratio),
+                       round(region.width / ratio), round(region.height / ratio))
+        return region, geometry
+
+    def save_screenshot_async(self, path: str, image: np.ndarray) -> threading.Thread:
+        '''
+        Write the screenshot to a file on a background thread so that encoding does
+        not delay showing the screenshot.
+        '''
+        def write():
+            if not cv2.imwrite(path, image):
+                print(f'[Screenshooter] Failed to save the screenshot to {path}')
+        thread = threading.Thread(target=write, daemon=True)
+        thread.start()
+        return thread
 
     def close_screenshot(self):
         '''
         Close the screenshot i.e. close the transparent window.
         '''
+        self.capture_timer.stop()
         if self.transparent_window:
             self.transparent_window.close()
             self.transparent_window = None
@@ -82,7 +212,7 @@ class Screenshooter:
         # Send the selection to the TransparentWindow
         self.transparent_window.on_change_selection_from_gui(selection)
         # Update the image in the Zoomable label in PyPainter
-        self.capture_image()
+        self.preview_selection()
 
     def update_selection(self):
         '''
@@ -106,17 +236,162 @@ class Screenshooter:
         self.gui.field_width.blockSignals(False)
         self.gui.field_height.blockSignals(False)
 
+    def get_selected_region(self) -> np.ndarray:
+        '''
+        Return the selected part of the screenshot as a BGRA view (nothing is copied).
+        '''
+        selection = self.transparent_window.draggable_widget.selection
+        # The selection is in logical pixels and the screenshot in physical pixels
+        ratio = self.transparent_window.device_pixel_ratio
+        left, top = round(selection.left * ratio), round(selection.top * ratio)
+        right = round((selection.left + selection.width) * ratio)
+        bottom = round((selection.top + selection.height) * ratio)
+        return self.screenshot_image[top:bottom, left:right]
+
+    def get_selected_screen_region(self) -> Box:
+        '''
+        Return the selection in physical pixels of the screen.
+        '''
+        selection = self.transparent_window.draggable_widget.selection
+        ratio = self.transparent_window.device_pixel_ratio
+        return Box(self.capture_region.left + round(selection.left * ratio),
+                   self.capture_region.top + round(selection.top * ratio),
+                   round(selection.width * ratio),
+                   round(selection.height * ratio))
+
+    def toggle_recording(self):
+        '''
+        Start recording the selection or stop the running recording.
+        '''
+        if self.recording is None:
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def start_recording(self, path: str = None) -> bool:
+        '''
+        Record the live screen inside the selection. The screenshot is closed so that it does
+        not cover the screen. Video files are written for the video extensions (e.g. .mp4).
+        For other paths a directory with an image per frame is created (e.g. for time-lapses).
+
+        Parameters:
+            path: the video file or the directory. By default a new file in config['recording']['directory']
+        Returns:
+            bool: whether the recording started
+        '''
+        if self.transparent_window is None or self.recording is not None:
+            return False
+        options = config['recording']
+        if path is None:
+            name = time.strftime('recording_%Y%m%d_%H%M%S') + options['extension']
+            path = os.path.join(options['directory'], name)
+        region = self.get_selected_screen_region()
+        self.close_screenshot()
+
+        if os.path.splitext(path)[1].lower() in ('.mp4', '.avi'):
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            encoder = VideoEncoder(path, options['fps'])
+        else:
+            encoder = ImageSequenceEncoder(path, options['image_format'])
+        self.recording = CapturePipeline(ScreenFrameSource(self.capture, region),
+                                         encoder,
+                                         fps=options['fps'],
+                                         max_queue=options['max_queue'],
+                                         workers=options['workers'],
+                                         duration=options['max_duration_sec'],
+                                         change_detector=TileChangeDetector(config['screenshot']['change_tile_size']))
+        recording = self.recording
+        recording.on_finished = lambda: self.recording_emitter.finished.emit(recording)
+        self.recording.start()
+        self.gui.set_recording(True)
+        print(f'[Screenshooter] Recording {region} to {path}')
+        return True
+
+    def stop_recording(self) -> CaptureStats:
+        '''
+        Stop the recording and wait for the captured frames to be written.
+        '''
+        if self.recording is None:
+            return None
+        stats = self.recording.stop()
+        self.recording = None
+        self.gui.set_recording(False)
+        print(f'[Screenshooter] Recorded {stats.encoded} frames in {stats.elapsed:.1f}s '
+              f'({stats.unchanged} unchanged, {stats.dropped} dropped, {stats.missed} missed)')
+        return stats
+
+    def on_recording_finished(self, recording: CapturePipeline):
+        '''
+        Finish a recording which ended by itself (e.g. after config['recording']['max_duration_sec'])
+        '''
+        if recording is self.recording:
+            self.stop_recording()
+
+    def recapture(self) -> List[Box]:
+        '''
+        Capture the last captured part of the screen again and pass on only the tiles which
+        changed. The screenshot has to be closed, otherwise it covers the screen.
+
+        Returns:
+            List[Box]: the changed regions or None if nothing could be captured
+        '''
+        if self.selected_screen_region is None or self.transparent_window is not None:
+            return None
+        try:
+            image = self.capture.grab(self.selected_screen_region)
+        except ValueError as e:
+            # e.g. the monitor with the captured region was disconnected
+            print(f'[Screenshooter] Cannot capture {self.selected_screen_region} again: {e}')
+            if self.callback_error is not None:
+                self.callback_error('Recapture', f'Cannot capture the region again: {e}')
+            return None
+        region = self.selected_screen_region
+        regions = self.change_detector.changed_regions(image)
+        if regions and self.callback_update_regions is not None:
+            self.callback_update_regions(image, regions)
+            if self.selected_screen_region is None:
+                # The image replaced the whole document (e.g. its layer was deleted) so it is
+                # still the last capture
+                self.selected_screen_region = region
+                self.change_detector.reset(image)
+        return regions
+
+    def forget_capture(self):
+        '''
+        Forget the last captured part of the screen when the document is replaced (e.g. by
+        opening an image or a project) so that recapture does not paste into an unrelated image
+        '''
+        self.selected_screen_region = None
+        self.change_detector.reset()
+
+    def preview_selection(self):
+        '''
+        Show the selection while it changes without rebuilding the document. The image is
+        captured once the selection has not changed for config['screenshot']['preview_debounce_ms'].
+        '''
+        if self.transparent_window is None:
+            return
+        if self.callback_preview is not None:
+            region = self.get_selected_region()
+            if region.size > 0:
+                self.callback_preview(region)
+        self.capture_timer.start() # restart the debounce timer
+
     def capture_image(self):
         '''
         Capture the screenshot based on current selection and update the QLabel with the image
         Update the screenshot that is showing in the QLabel element for the creenshot based on the selection 
         '''
         try:
-            selection = self.transparent_window.draggable_widget.selection
-            image = self.screenshot_image[selection.top : selection.top + selection.height,
-                                          selection.left : selection.left + selection.width]
+            region = self.get_selected_region()
+            # Convert only the selected part of the screenshot to BGR
+            image = cv2.cvtColor(region, cv2.COLOR_BGRA2BGR)
             if self.callback_capture is not None:
-                self.callback_capture(image)
+                self.callback_capture(image) # replaces the document which calls forget_capture
+            # Remember what is on the canvas so that recapture can update only what changed
+            if self.capture_region is not None:
+                self.selected_screen_region = self.get_selected_screen_region()
+            self.change_detector.reset(region)
             return image
         except:
             return None
\ No newline at end of file
@@ -1,17 +1,23 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QGridLayout, QLabel,
-                             QSpinBox)
-from PyQt5.QtCore import pyqtSignal
+                             QSpinBox, QListWidget, QListWidgetItem, QListView)
+from PyQt5.QtCore import pyqtSignal, Qt, QSize
+from PyQt5.QtGui import QIcon
 from enum import IntEnum, auto
+from typing import List
 from src.config import config
 from src.utils.Box import Box
+from src.utils.image_rendering import cv2_to_qpixmap
 
 class ScreenshooterGUI(QWidget):
 
     # Signals
     take_screenshot = pyqtSignal()
     close_screenshot = pyqtSignal()
+    toggle_recording = pyqtSignal()
+    recapture = pyqtSignal()
     selection_changed = pyqtSignal(Box)
+    history_selected = pyqtSignal(int) # the id of an entry of the capture history
 
     def __init__(self):
         super().__init__()
@@ -31,8 +37,14 @@ class ScreenshooterGUI(QWidget):
         self.button_screenshot.clicked.connect(self.on_take_screenshot)
         self.button_close_screenshot = QPushButton('Close', self)
         self.button_close_screenshot.clicked.connect(self.on_close_screenshot)
+        self.button_recapture = QPushButton('Refresh', self)
+        self.button_recapture.clicked.connect(self.on_recapture)
+        self.button_record = QPushButton('Record', self)
+        self.button_record.clicked.connect(self.on_toggle_recording)
         screenshot_layout.addWidget(self.button_screenshot)
         screenshot_layout.addWidget(self.button_close_screenshot)
+        screenshot_layout.addWidget(self.button_recapture)
+        screenshot_layout.addWidget(self.button_record)
         self.layout.addLayout(screenshot_layout)
 
         # Menu for changing the screenshot selection
@@ -59,8 +71,29 @@ class ScreenshooterGUI(QWidget):
         grid_layout.addWidget(self.field_height, 1, 2)
         self.layout.addLayout(grid_layout)
 
+        # Thumbnails of the last screenshots
+        thumbnail_size = config['capture_history']['thumbnail_size']
+        self.history_list = QListWidget(self)
+        self.history_list.setViewMode(QListView.IconMode)
+        self.history_list.setFlow(QListView.LeftToRight)
+        self.history_list.setWrapping(False)
+        self.history_list.setIconSize(QSize(thumbnail_size, thumbnail_size))
+        self.history_list.setFixedHeight(thumbnail_size + 24)
+        self.history_list.itemClicked.connect(self.on_history_item_clicked)
+        self.layout.addWidget(self.history_list)
+
         self.setLayout(self.layout)
 
+    def set_selection_range(self, width: int, height: int):
+        '''
+        Limit the selection fields to the size of the captured area.
+        '''
+        for field, maximum in ((self.field_left, width), (self.field_top, height),
+                               (self.field_width, width), (self.field_height, height)):
+            field.blockSignals(True)
+            field.setRange(0, maximum)
+            field.blockSignals(False)
+
     def on_change_selection(self):
         '''
         Send a signal to the Screenshooter when the selection is changed through the spin
@@ -75,6 +108,24 @@ class ScreenshooterGUI(QWidget):
         # Emit a signal to the Screenshooter with the new selection.
         self.selection_changed.emit(selection)
 
+    def set_history(self, entries: List):
+        '''
+        Show the thumbnails of the capture history (from the newest to the oldest).
+        Only the thumbnails are converted, the screenshots are not decompressed.
+        '''
+        self.history_list.clear()
+        for entry in entries:
+            item = QListWidgetItem(QIcon(cv2_to_qpixmap(entry.thumbnail)), '')
+            item.setData(Qt.UserRole, entry.id)
+            item.setToolTip(f'{entry.shape[1]}x{entry.shape[0]}')
+            self.history_list.addItem(item)
+
+    def on_history_item_clicked(self, item: QListWidgetItem):
+        '''
+        Open the screenshot of a thumbnail.
+        '''
+        self.history_selected.emit(item.data(Qt.UserRole))
+
     def on_take_screenshot(self):
         '''
         Capture the screen.
@@ -86,4 +137,22 @@ class ScreenshooterGUI(QWidget):
         '''
         Close the captured screenshot
         '''
-        self.close_screenshot.emit()
\ No newline at end of file
+        self.close_screenshot.emit()
+
+    def on_recapture(self):
+        '''
+        Capture the selected part of the screen again.
+        '''
+        self.recapture.emit()
+
+    def on_toggle_recording(self):
+        '''
+        Start recording the selection or stop the recording.
+        '''
+        self.toggle_recording.emit()
+
+    def set_recording(self, recording: bool):
+        '''
+        Show whether a recording is running.
+        '''
+        self.button_record.setText('Stop' if recording else 'Record')
@@ -0,0 +1,87 @@
+import numpy as np
+from typing import List, Optional
+from src.utils.Box import Box
+
+
+class TileChangeDetector:
+    '''
+    Find the tiles which changed between successive captures of the same region.
+
+    The frames are compared with a vectorized diff: every BGRA pixel is viewed as one
+    uint32 and the per pixel differences are reduced to a boolean per tile. This is as
+    fast as hashing the tiles and has no false negatives. The previous frame is kept by
+    reference so the frames must not be modified after they are passed to update.
+    '''
+    def __init__(self, tile_size: int = 64):
+        self.tile_size = tile_size
+        self.previous: Optional[np.ndarray] = None
+        self._changed: Optional[np.ndarray] = None # per pixel differences padded to whole tiles (reused)
+
+    def reset(self, image: Optional[np.ndarray] = None) -> None:
+        '''
+        Forget the previous frame or set it, e.g. to the image which is on the canvas.
+        '''
+        self.previous = image
+
+    def update(self, image: np.ndarray) -> np.ndarray:
+        '''
+        Compare a frame with the previous frame and make it the previous frame.
+
+        Returns:
+            np.ndarray: a boolean array with a value for every tile (rows, columns). All the
+                tiles are changed for the first frame or when the size of the frames changes
+        '''
+        height, width = image.shape[:2]
+        rows = -(-height // self.tile_size)
+        columns = -(-width // self.tile_size)
+        previous, self.previous = self.previous, image
+        if previous is None or previous.shape != image.shape:
+            return np.ones((rows, columns), dtype=bool)
+        size = self.tile_size
+        if self._changed is None or self._changed.shape != (rows * size, columns * size):
+            self._changed = np.zeros((rows * size, columns * size), dtype=bool)
+        self._diff(image, previous, out=self._changed[:height, :width])
+        # Reduce the pixels to tiles. Reducing 8 booleans at once as an uint64 is faster
+        if size % 8 == 0:
+            changed = self._changed.view(np.uint64).reshape(rows, size, columns, size // 8)
+            return np.bitwise_or.reduce(np.bitwise_or.reduce(changed, axis=3), axis=1) != 0
+        return self._changed.reshape(rows, size, columns, size).any(axis=(1, 3))
+
+    def changed_regions(self, image: np.ndarray) -> List[Box]:
+        '''
+        Compare a frame with the previous frame and return the changed regions.
+        Neighbouring changed tiles in a row of tiles are merged into one region.
+        '''
+        return self.tiles_to_regions(self.update(image), image.shape[:2])
+
+    def tiles_to_regions(self, tiles: np.ndarray, shape) -> List[Box]:
+        '''
+        Convert a boolean array of tiles to boxes in pixels (clipped to the frame).
+        '''
+        height, width = shape
+        regions = []
+        for row, columns in enumerate(tiles):
+            if not columns.any():
+                continue
+            # Find the runs of changed tiles in the row
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], columns.astype(np.int8), [0]))))
+            top = row * self.tile_size
+            bottom = min(height, top + self.tile_size)
+            for start, end in zip(edges[::2], edges[1::2]):
+                left = start * self.tile_size
+                right = min(width, end * self.tile_size)
+                regions.append(Box(int(left), int(top), int(right - left), int(bottom - top)))
+        return regions
+
+    @staticmethod
+    def _diff(image: np.ndarray, previous: np.ndarray, out: np.ndarray) -> None:
+        '''
+        Set a boolean per pixel which is True where the images differ. Contiguous BGRA
+        images are viewed as one uint32 per pixel so that a pixel is compared in one operation.
+        '''
+        if image.ndim == 2:
+            np.not_equal(image, previous, out=out)
+        elif image.shape[2] == 4 and image.flags['C_CONTIGUOUS'] and previous.flags['C_CONTIGUOUS']:
+            np.not_equal(image.view(np.uint32)[..., 0], previous.view(np.uint32)[..., 0], out=out)
+        else:
+            np.any(image != previous, axis=2, out=out)
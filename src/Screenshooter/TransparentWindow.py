@@ -1,25 +1,60 @@
 import os
+import numpy as np
 from typing import List
-from PyQt5.QtCore import Qt, QObject, QEvent, QRect, pyqtSignal
-from PyQt5.QtGui import QPainter, QPen, QKeySequence
+from PyQt5.QtCore import Qt, QObject, QEvent, QRect, QPointF, pyqtSignal
+from PyQt5.QtGui import QPainter, QPen, QKeySequence, QImage, QMouseEvent, QRegion
 from PyQt5.QtWidgets import QMainWindow, QWidget, QApplication, QShortcut
 from src.Screenshooter.DraggableBox import DraggableBox
 from src.OverlayWidget import OverlayWidget
 from src.Screenshooter.MementoTransparentWindow import MementoTransparentWindow
 from src.Caretaker import caretaker
 from src.utils.Box import Box
+from src.utils.image_rendering import bgra_to_qimage
+from src.utils.repaint import FrameThrottle
 from src.config import *
 
+
+class ScreenshotBackground(QWidget):
+    '''
+    A widget painting the screenshot. The QImage shares the memory of the captured
+    BGRA buffer, so the screenshot is neither copied nor encoded to be shown.
+    The screenshot is in physical pixels and the widget in logical pixels so the
+    device pixel ratio of the image maps one to the other.
+    '''
+    def __init__(self, parent: QWidget, screenshot: np.ndarray, device_pixel_ratio: float = 1.0):
+        super().__init__(parent)
+        self.screenshot = screenshot # keep the buffer alive as long as the QImage
+        self.qimage: QImage = bgra_to_qimage(screenshot)
+        self.qimage.setDevicePixelRatio(device_pixel_ratio)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setClipRect(event.rect())
+        painter.drawImage(0, 0, self.qimage)
+        painter.end()
+
+
 class TransparentWindow(QMainWindow):
 
     signal_selection_change = pyqtSignal()
 
-    def __init__(self):
+    def __init__(self, screenshot: np.ndarray, geometry: Box = None):
+        '''
+        Parameters:
+            screenshot: the BGRA screenshot shown as the background (in physical pixels)
+            geometry: the logical geometry of the captured screen area. The window covers it.
+                      By default the configured monitor size at (0, 0)
+        '''
         super().__init__()
-        self.initUI()
+        if geometry is None:
+            geometry = Box(0, 0, int(config['monitor']['width']), int(config['monitor']['height']))
+        self.initUI(screenshot, geometry)
         self.is_drawing = False # True if we are creating a new draggable widget
         self.start_pos = None
         self.end_pos = None
+        self.forwarding_to_box = False # True while a drag started inside the DraggableBox is forwarded to it
+        # Apply the mouse moves while drawing at most once per frame
+        self.drawing_throttle = FrameThrottle(self.update_drawn_selection)
 
         # Create a widget which selects the area of the screenshot to save
         self.draggable_widget = DraggableBox(self, instance_TransparentWindow=self)
@@ -30,17 +65,17 @@ class TransparentWindow(QMainWindow):
         self.overlay.setGeometry(self.rect()) # Set the geometry to match the main window
         self.overlay.show()
 
-    def initUI(self):
+    def initUI(self, screenshot: np.ndarray, geometry: Box):
         '''
         Initialise the gui of the screenshot.
         This is a transparent window whose background is a screenshot
         '''
-        self.setGeometry(0, 0, int(config['monitor']['width']), int(config['monitor']['height']))
+        self.setGeometry(*geometry)
         self.setWindowFlags(Qt.FramelessWindowHint)
 
         # Create a widget which takes the whole space and has background=screenshot
-        self.screenshot_widget =  QWidget(self)
-        self.screenshot_widget.setStyleSheet(f"background-image: url('{config['paths']['screenshot_background']}'); background-repeat: no-repeat;")
+        self.device_pixel_ratio = screenshot.shape[1] / geometry.width
+        self.screenshot_widget = ScreenshotBackground(self, screenshot, self.device_pixel_ratio)
         self.setCentralWidget(self.screenshot_widget)
 
         # Define the keyboard shortcuts
@@ -71,6 +106,11 @@ class TransparentWindow(QMainWindow):
                     # self.draggable_widget.deleteLater()
                     # self.draggable_widget = None
                     pass
+            elif self.draggable_widget and self.draggable_widget.geometry().contains(event.pos()):
+                # The DraggableBox only receives events on its border (see its mask).
+                # Forward the drags started inside of it
+                self.forwarding_to_box = True
+                self.draggable_widget.mousePressEvent(self.map_event_to_box(event))
 
     def mouseMoveEvent(self, event, event_pos=None):
         '''
@@ -83,9 +123,19 @@ class TransparentWindow(QMainWindow):
         '''
         if self.is_drawing:
             event_pos = event.pos() if event_pos is None else event_pos
-            self.end_pos = event_pos # Track the other corner of the box
-            self.overlay.end_pos = self.end_pos
-            self.overlay.update()
+            self.drawing_throttle.post(event_pos)
+        elif self.forwarding_to_box:
+            self.draggable_widget.mouseMoveEvent(self.map_event_to_box(event))
+
+    def update_drawn_selection(self, end_pos):
+        '''
+        Move the second corner of the rectangle being drawn. Only the borders of
+        the old and the new rectangle are repainted.
+        '''
+        old_region = self.overlay.selection_region()
+        self.end_pos = end_pos # Track the other corner of the box
+        self.overlay.end_pos = self.end_pos
+        self.overlay.update(old_region.united(self.overlay.selection_region()))
 
     def mouseReleaseEvent(self, event, event_pos=None):
         '''
@@ -94,14 +144,28 @@ class TransparentWindow(QMainWindow):
         '''
         if event.button() == Qt.LeftButton and self.is_drawing:
             event_pos = event.pos() if event_pos is None else event_pos
+            self.drawing_throttle.flush()
             self.end_pos = event_pos
             self.overlay.end_pos = event_pos
             # Create the new draggable widget
             if self.start_pos and self.end_pos:
                 self.update_draggable_widget()
+            # Erase the drawn rectangle
+            self.overlay.update(self.overlay.selection_region())
+        elif event.button() == Qt.LeftButton and self.forwarding_to_box:
+            self.draggable_widget.mouseReleaseEvent(self.map_event_to_box(event))
+            self.forwarding_to_box = False
         self.is_drawing = False
         self.overlay.is_drawing = False
 
+    def map_event_to_box(self, event: QMouseEvent) -> QMouseEvent:
+        '''
+        Helper function. Create a copy of a mouse event with the position relative to the DraggableBox
+        '''
+        local_pos = QPointF(self.draggable_widget.mapFrom(self, event.pos()))
+        return QMouseEvent(event.type(), local_pos, event.windowPos(), event.screenPos(),
+                           event.button(), event.buttons(), event.modifiers())
+
     def eventFilter(self, obj, event):
         if obj == self.draggable_widget:
             if QApplication.keyboardModifiers() == Qt.ControlModifier or self.is_drawing:
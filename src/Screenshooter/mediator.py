@@ -10,7 +10,11 @@ from src.Screenshooter.Screenshooter import Screenshooter
 
 def ScreenshooterMediator(PyPainter) -> Screenshooter:
     screenshooter = Screenshooter(
-        callback_capture = PyPainter.update_image
+        callback_capture = PyPainter.update_image,
+        callback_preview = PyPainter.preview_image,
+        callback_update_regions = PyPainter.update_image_regions,
+        callback_error = PyPainter.show_error
     )
     PyPainter.close_application_signal.connect(screenshooter.close)
+    PyPainter.image_processor.document_replaced.connect(screenshooter.forget_capture)
     return screenshooter
\ No newline at end of file
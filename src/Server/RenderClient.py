@@ -0,0 +1,64 @@
+import base64
+import http.client
+import json
+from typing import List
+import cv2
+import numpy as np
+
+
+class RenderServerBusy(Exception):
+    '''
+    Raised when the render server refuses a job because its queue is full.
+    '''
+
+
+class RenderClient:
+    '''
+    A client for the local RenderServer.
+    '''
+    def __init__(self, port: int, host: str = '127.0.0.1', timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: bytes = None):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request(method, path, body=body,
+                               headers={'Content-Type': 'application/json'} if body is not None else {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def render_encoded(self, image_data: bytes, elements: List[dict], format: str = 'png') -> bytes:
+        '''
+        Render an encoded image file and return the encoded result.
+
+        Raises:
+            RenderServerBusy: if the queue of the server is full
+            RuntimeError: if the server failed to render the job
+        '''
+        body = json.dumps({'image': base64.b64encode(image_data).decode('ascii'),
+                           'elements': elements,
+                           'format': format}).encode('utf-8')
+        status, data = self._request('POST', '/render', body)
+        if status == 503:
+            raise RenderServerBusy('The render server queue is full')
+        if status != 200:
+            raise RuntimeError(f'The render server returned {status}: {data.decode("utf-8", "replace")}')
+        return data
+
+    def render(self, image: np.ndarray, elements: List[dict]) -> np.ndarray:
+        '''
+        Render elements on a cv2 image and return the flattened BGRA image.
+        '''
+        success, encoded = cv2.imencode('.png', image)
+        if not success:
+            raise ValueError('Failed to encode the image')
+        result = self.render_encoded(encoded.tobytes(), elements, 'png')
+        return cv2.imdecode(np.frombuffer(result, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+
+    def metrics(self) -> dict:
+        status, data = self._request('GET', '/metrics')
+        return json.loads(data)
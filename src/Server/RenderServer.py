@@ -0,0 +1,326 @@
+import argparse
+import base64
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+from src.Batch.BatchAnnotator import element_from_template
+from src.Rendering import compositing
+from src.Rendering.renderers import render_element
+from src.utils.image_rendering import to_bgra
+from src.config import config
+
+'''
+A local HTTP service rendering annotation jobs without the GUI.
+
+    POST /render   {"image": <base64 encoded image file>, "elements": [...], "format": "png"}
+                   -> the flattened image file (200), 503 if the queue is full
+    GET  /metrics  -> JSON with counters, queue depth, batch sizes, latency percentiles and throughput
+    GET  /health   -> 200
+
+The elements use the same format as the batch annotation templates (see BatchAnnotator).
+Requests are put in a bounded queue. Dispatcher threads take up to max_batch_size jobs
+from the queue and render them in a single task on a process pool. The server only
+listens on the loopback interface.
+'''
+
+
+class RenderJob:
+    '''
+    A render request waiting for its result.
+    '''
+    def __init__(self, image_data: bytes, elements: List[dict], format: str):
+        self.image_data = image_data
+        self.elements = elements
+        self.format = format
+        self.submitted = time.perf_counter()
+        self.result: Optional[bytes] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+
+def render_job(image_data: bytes, elements: List[dict], format: str) -> bytes:
+    '''
+    Decode an image, draw the elements on it and encode the result. Runs in a worker process.
+    '''
+    image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError('Failed to decode the image')
+    image = to_bgra(image)
+    for description in elements:
+        element = element_from_template(description, image.shape[:2])
+        if element.visible:
+            render_element(element)
+            compositing.overlay_element_on_image(image, element)
+    if format in ('jpg', 'jpeg'):
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    success, encoded = cv2.imencode('.' + format, image)
+    if not success:
+        raise ValueError(f'Failed to encode the image as {format}')
+    return encoded.tobytes()
+
+
+def render_batch(jobs: List[Tuple[bytes, List[dict], str]]) -> List[Tuple[Optional[bytes], Optional[str]]]:
+    '''
+    Render several jobs in one task so that the cost of sending work to a process is shared.
+
+    Returns:
+        (encoded image, None) or (None, error message) for every job
+    '''
+    results = []
+    for image_data, elements, format in jobs:
+        try:
+            results.append((render_job(image_data, elements, format), None))
+        except Exception as e:
+            results.append((None, f'{type(e).__name__}: {e}'))
+    return results
+
+
+class ServerMetrics:
+    '''
+    Thread-safe counters and a window of recent latencies.
+    '''
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.accepted = 0
+        self.rejected = 0 # requests refused because the queue was full
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.batched_jobs = 0
+        self.latencies = deque(maxlen=window) # seconds from submission to result
+
+    def record_accepted(self) -> None:
+        with self._lock:
+            self.accepted += 1
+
+    def record_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def record_batch(self, jobs: List[RenderJob]) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.batches += 1
+            self.batched_jobs += len(jobs)
+            for job in jobs:
+                if job.error is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.latencies.append(now - job.submitted)
+
+    def snapshot(self, queue_depth: int) -> dict:
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            elapsed = time.perf_counter() - self.start_time
+            percentiles = {}
+            if len(latencies) > 0:
+                for p in (50, 90, 99):
+                    percentiles[f'p{p}'] = float(np.percentile(latencies, p))
+                percentiles['max'] = float(latencies.max())
+            return {
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed,
+                'queue_depth': queue_depth,
+                'batches': self.batches,
+                'mean_batch_size': self.batched_jobs / self.batches if self.batches else 0.0,
+                'latency_ms': percentiles,
+                'throughput_images_per_sec': self.completed / elapsed if elapsed > 0 else 0.0,
+                'uptime_sec': elapsed,
+            }
+
+
+class RenderServer:
+    '''
+    The render service: an HTTP server, a bounded job queue and a pool of worker processes.
+    '''
+    def __init__(self,
+                 port: int = 0,
+                 workers: int = 2,
+                 max_queue: int = 64,
+                 max_batch_size: int = 8,
+                 batch_wait_ms: float = 5,
+                 max_request_bytes: int = 64 * 1024 * 1024):
+        '''
+        Parameters:
+            port: the port on 127.0.0.1. Use 0 to pick a free port (see self.port)
+            workers: the number of worker processes
+            max_queue: the number of jobs which can wait. Further requests get 503
+            max_batch_size: the maximum number of jobs rendered in one task
+            batch_wait_ms: how long to wait for more jobs to fill a batch
+            max_request_bytes: requests with a larger body get 413
+        '''
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.max_request_bytes = max_request_bytes
+        self.jobs: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.metrics = ServerMetrics()
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._running = True
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        '''
+        Start the dispatcher threads and serve HTTP requests on a background thread.
+        '''
+        # One dispatcher per worker process keeps every process busy
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._dispatch, name=f'RenderDispatcher-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self.httpd.serve_forever, name='RenderServer', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def serve_forever(self) -> None:
+        self.start()
+        try:
+            while self._running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._threads:
+            self.httpd.shutdown() # waits for serve_forever so it is only called once started
+        self.httpd.server_close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, job: RenderJob) -> bool:
+        '''
+        Queue a job. Returns False if the queue is full.
+        '''
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            self.metrics.record_rejected()
+            return False
+        self.metrics.record_accepted()
+        return True
+
+    def _next_batch(self) -> List[RenderJob]:
+        '''
+        Wait for a job and collect more jobs which arrive within batch_wait.
+        '''
+        try:
+            batch = [self.jobs.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self) -> None:
+        while self._running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                results = self.executor.submit(render_batch,
+                                               [(job.image_data, job.elements, job.format) for job in batch]).result()
+            except Exception as e:
+                results = [(None, f'{type(e).__name__}: {e}')] * len(batch)
+            for job, (result, error) in zip(batch, results):
+                job.result, job.error = result, error
+            self.metrics.record_batch(batch)
+            for job in batch:
+                job.done.set()
+
+
+def _make_handler(server: RenderServer):
+    '''
+    Helper function. Create the request handler class bound to a RenderServer.
+    '''
+    class RenderRequestHandler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass # do not log every request
+
+        def send_json(self, status: int, data: dict) -> None:
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self.send_json(200, server.metrics.snapshot(server.jobs.qsize()))
+            elif self.path == '/health':
+                self.send_json(200, {'status': 'ok'})
+            else:
+                self.send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/render':
+                self.send_json(404, {'error': 'not found'})
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            if length > server.max_request_bytes:
+                self.send_json(413, {'error': 'request too large'})
+                return
+            try:
+                request = json.loads(self.rfile.read(length))
+                job = RenderJob(base64.b64decode(request['image']),
+                                request.get('elements', []),
+                                request.get('format', 'png').lower().lstrip('.'))
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(400, {'error': f'invalid request: {e}'})
+                return
+            if not server.submit(job):
+                self.send_response(503)
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            job.done.wait()
+            if job.error is not None:
+                self.send_json(422, {'error': job.error})
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', f'image/{job.format}')
+            self.send_header('Content-Length', str(len(job.result)))
+            self.end_headers()
+            self.wfile.write(job.result)
+
+    return RenderRequestHandler
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    options = config['render_server']
+    parser = argparse.ArgumentParser(description='Serve annotation render jobs on 127.0.0.1.')
+    parser.add_argument('-p', '--port', type=int, default=options['port'])
+    parser.add_argument('-j', '--workers', type=int, default=options['workers'])
+    args = parser.parse_args(argv)
+    server = RenderServer(port=args.port,
+                          workers=args.workers,
+                          max_queue=options['max_queue'],
+                          max_batch_size=options['max_batch_size'],
+                          batch_wait_ms=options['batch_wait_ms'],
+                          max_request_bytes=options['max_request_bytes'])
+    print(f'[RenderServer] Listening on http://127.0.0.1:{server.port}')
+    server.serve_forever()
+    return 0
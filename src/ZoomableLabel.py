@@ -6,6 +6,7 @@ from typing import Tuple
 from src.utils.Box import Box
 from src.config import config
 from src.utils.Vector import Vect2d
+from src.utils.frame_timing import frame_timer
 
 class ZoomableLabel(QLabel):
 
@@ -34,10 +35,16 @@ class ZoomableLabel(QLabel):
         self.mouse_pressed = None
 
         self.drawing_enabled = False # Flag to track if drawing mode is active (i.e. send events to ImageProcessor)
+        self.editing_blocked = False # e.g. while the proxy of an image which is still loading is shown
 
-    def setImage(self, image):
+    def setImage(self, image, notify: bool = True):
         '''
         Set the OpenCV image and convert it to QImage
+
+        Parameters:
+            image: the image to show (np.ndarray or LazyRaster)
+            notify: whether to notify the ImageProcessor of the new image. Use False when the
+                ImageProcessor has already built the layers for the image (e.g. loading a project)
         '''
         self.original_image = image
         # Calculate new initial scale factor
@@ -62,7 +69,8 @@ class ZoomableLabel(QLabel):
         self.subimage_selection = Box(0, 0, self.img_width, self.img_height)
 
         # Notify the ImageProcessor of the new Image
-        self.new_image_signal.emit()
+        if notify:
+            self.new_image_signal.emit()
 
         self.update() # Update the label to repaint with the new image
 
@@ -104,7 +112,7 @@ class ZoomableLabel(QLabel):
         if event.button() != Qt.LeftButton:
             return
 
-        if self.drawing_enabled:
+        if self.drawing_enabled and not self.editing_blocked:
             # Emit a signal for the ImageProcessor
             x, y = self.convert_to_img_coor(event.pos())
             self.start_draw_signal.emit(x, y)
@@ -119,7 +127,7 @@ class ZoomableLabel(QLabel):
         if not self.mouse_pressed:
             return
 
-        if self.drawing_enabled:
+        if self.drawing_enabled and not self.editing_blocked:
             # Convert widget coordinates to image coordinates
             x, y = self.convert_to_img_coor(event.pos())
             # Emit a signal for the ImageProcessor
@@ -135,7 +143,7 @@ class ZoomableLabel(QLabel):
         if event.button() != Qt.LeftButton:
             return None
 
-        if self.drawing_enabled:
+        if self.drawing_enabled and not self.editing_blocked:
             # Emit a signal for the ImageProcessor
             x, y = self.convert_to_img_coor(event.pos().x(), event.pos().y())
             self.stop_draw_signal.emit(x, y)
@@ -150,6 +158,18 @@ class ZoomableLabel(QLabel):
         if self.original_image is None:
             return # No image to display
 
+        if frame_timer.enabled and event.rect() != self.rect() and self.zoomable_widget.overlay.hud_contains(event.rect()):
+            # Repainting below the frame timing HUD is not a new frame
+            self.draw_image()
+            return
+        with frame_timer.stage('paint'):
+            self.draw_image()
+        frame_timer.end_frame()
+
+    def draw_image(self):
+        '''
+        Helper function. Paint the visible part of the image.
+        '''
         # Update the subimage
         self.update_subimage()
 
@@ -158,12 +178,13 @@ class ZoomableLabel(QLabel):
             self.zoomable_widget.overlay.update()
 
         # Convert OpenCV image to QImage
-        height, width, channel = self.subimage.shape
-        bytes_per_line = channel * width
-        if channel == 3:
-            q_image = QImage(self.subimage.data.tobytes(), width, height, bytes_per_line, QImage.Format_BGR888)
-        else:
-            q_image = QImage(self.subimage.data.tobytes(), width, height, bytes_per_line, QImage.Format_ARGB32)
+        with frame_timer.stage('convert'):
+            height, width, channel = self.subimage.shape
+            bytes_per_line = channel * width
+            if channel == 3:
+                q_image = QImage(self.subimage.data.tobytes(), width, height, bytes_per_line, QImage.Format_BGR888)
+            else:
+                q_image = QImage(self.subimage.data.tobytes(), width, height, bytes_per_line, QImage.Format_ARGB32)
 
         # Draw the scaled and translated image
         painter = QPainter(self)
@@ -1,7 +1,12 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QStackedLayout
-from PyQt5.QtGui import QPainter, QPen, QColor
-from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QStackedLayout, QShortcut
+from PyQt5.QtGui import QPainter, QPen, QColor, QFont, QFontMetrics, QKeySequence
+from PyQt5.QtCore import Qt, QRect, QTimer
 from src.ZoomableLabel import ZoomableLabel
+from src.config import config
+from src.utils.frame_timing import frame_timer
+
+# The stages timed by the frame timer in the order in which they are shown in the HUD
+HUD_STAGES = ['plan', 'composite', 'warp', 'convert', 'paint']
 
 class Overlay(QWidget):
     def __init__(self, parent):
@@ -10,6 +15,14 @@ class Overlay(QWidget):
         self.setAttribute(Qt.WA_TransparentForMouseEvents, False)
         self.setMouseTracking(True)
 
+        # The frame timing HUD. It is refreshed by a timer so that it does not cause frames itself
+        self.hud_visible = False
+        self.hud_font = QFont('Monospace', 8)
+        self.hud_font.setStyleHint(QFont.TypeWriter)
+        self.hud_timer = QTimer(self)
+        self.hud_timer.setInterval(config['frame_timing']['hud_refresh_ms'])
+        self.hud_timer.timeout.connect(lambda: self.update(self.hud_rect()))
+
     def mousePressEvent(self, event):
         self.target.mousePressEvent(event)
 
@@ -26,6 +39,60 @@ class Overlay(QWidget):
         # Ensure the overlay resizes with its parent (ZoomableWidget)
         super().resizeEvent(event)
 
+    def set_hud_visible(self, visible: bool):
+        '''
+        Show or hide the frame timing HUD. The frame timer only runs while the HUD is shown.
+        '''
+        self.hud_visible = visible
+        frame_timer.set_enabled(visible)
+        if visible:
+            self.hud_timer.start()
+        else:
+            self.hud_timer.stop()
+        self.update(self.hud_rect())
+
+    def hud_lines(self) -> list:
+        '''
+        The text of the HUD: the frame time and FPS followed by the median / 90th percentile of every stage
+        '''
+        summary = frame_timer.summary()
+        frame = summary['frame']
+        lines = [f'frame {frame["p50"] * 1000:6.1f} ms  p90 {frame["p90"] * 1000:6.1f}  p99 {frame["p99"] * 1000:6.1f}',
+                 f'fps   {summary["fps"]:6.0f}']
+        stages = HUD_STAGES + sorted(set(summary['stages']) - set(HUD_STAGES))
+        for name in stages:
+            stage = summary['stages'].get(name)
+            if stage is None:
+                continue
+            lines.append(f'{name:<9} {stage["p50"] * 1000:6.2f} ms  p90 {stage["p90"] * 1000:6.2f}')
+        return lines
+
+    def hud_rect(self) -> QRect:
+        '''
+        The part of the overlay covered by the HUD (top left corner)
+        '''
+        metrics = QFontMetrics(self.hud_font)
+        num_lines = 2 + len(HUD_STAGES)
+        return QRect(4, 4, metrics.horizontalAdvance('x' * 42) + 12, metrics.lineSpacing() * num_lines + 12)
+
+    def hud_contains(self, rect: QRect) -> bool:
+        '''
+        Check if a rectangle (e.g. of a paint event) is covered by the HUD
+        '''
+        return self.hud_visible and self.hud_rect().contains(rect)
+
+    def paintEvent(self, event):
+        if not self.hud_visible:
+            return
+        painter = QPainter(self)
+        rect = self.hud_rect()
+        painter.fillRect(rect, QColor(0, 0, 0, 170))
+        painter.setFont(self.hud_font)
+        painter.setPen(QPen(QColor(255, 255, 255)))
+        metrics = QFontMetrics(self.hud_font)
+        for i, line in enumerate(self.hud_lines()[:2 + len(HUD_STAGES)]):
+            painter.drawText(rect.left() + 6, rect.top() + 6 + metrics.ascent() + i * metrics.lineSpacing(), line)
+
 class ZoomableWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -47,6 +114,18 @@ class ZoomableWidget(QWidget):
         # Make the overlay above the ZoomableLabel
         self.overlay.raise_()
 
+        # Toggle the frame timing HUD
+        self.hud_shortcut = QShortcut(QKeySequence(config['frame_timing']['hud_shortcut']), self)
+        self.hud_shortcut.activated.connect(self.toggle_hud)
+        if config['frame_timing']['hud_enabled']:
+            self.overlay.set_hud_visible(True)
+
+    def toggle_hud(self):
+        '''
+        Show or hide the frame timing HUD
+        '''
+        self.overlay.set_hud_visible(not self.overlay.hud_visible)
+
     def resizeEvent(self, event):
         # Resize the overlay to match the ZoomableLabel's size when ZoomableWidget is resized
         self.overlay.setGeometry(self.zoomable_label.geometry())
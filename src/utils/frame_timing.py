@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+import numpy as np
+
+"""
+Timing of the stages of a frame, e.g. planning the overlays, compositing, warping,
+color conversion and painting. The stages are timed with `with frame_timer.stage(name):`
+and a frame ends with `frame_timer.end_frame()` (after painting the canvas).
+
+When the timer is disabled stage() returns a shared no-op context manager, so the
+cost of the hooks is one attribute check. Nothing here depends on Qt so the hooks
+can stay in the headless rendering code.
+"""
+
+
+class _NullStage:
+    """
+    The context manager returned while the timer is disabled. It does nothing.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """
+    Add the time spent in a with block to a stage of the current frame.
+    """
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer: 'FrameTimer', name: str):
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        if self.timer._frame_start is None:
+            self.timer._frame_start = self.start
+        return self
+
+    def __exit__(self, *exc_info):
+        current = self.timer._current
+        current[self.name] = current.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class FrameTimer:
+    """
+    Aggregate the time spent in every stage per frame and keep the last frames in
+    rolling windows for percentiles. A frame starts with the first timed stage after
+    the previous frame ended. A stage which runs several times in a frame (e.g. one
+    overlay per layer) is summed. Stages may be nested, e.g. the color conversion
+    happens while painting, so the stages do not have to add up to the frame time.
+
+    Only the thread which enabled the timer (the GUI thread) is timed so that
+    background renders do not end up in the frames of the canvas.
+    """
+    def __init__(self, window: int = 120):
+        self.window = window # the number of frames in the rolling windows
+        self.enabled = False
+        self._thread_id = None
+        self.reset()
+
+    def reset(self) -> None:
+        self._current: Dict[str, float] = {} # stage -> seconds in the current frame
+        self._frame_start: Optional[float] = None
+        self.frame_times: Deque[float] = deque(maxlen=self.window)
+        self.frame_ends: Deque[float] = deque(maxlen=self.window) # perf_counter at the end of the frames
+        self.stage_times: Dict[str, Deque[float]] = {}
+        self.last_stage_times: Dict[str, float] = {} # the stages of the last frame
+
+    def set_enabled(self, enabled: bool) -> None:
+        """
+        Start or stop timing. Starting discards the previous measurements.
+
+        Args:
+            enabled (bool): Whether to time the stages. The calling thread is the one which is timed.
+        """
+        if enabled and not self.enabled:
+            self.reset()
+            self._thread_id = threading.get_ident()
+        self.enabled = enabled
+
+    def stage(self, name: str):
+        """
+        A context manager timing a stage of the current frame.
+
+        Args:
+            name (str): The name of the stage, e.g. 'composite'.
+        """
+        if not self.enabled or threading.get_ident() != self._thread_id:
+            return NULL_STAGE
+        return _Stage(self, name)
+
+    def end_frame(self) -> None:
+        """
+        End the current frame and add its times to the rolling windows.
+        """
+        if not self.enabled or threading.get_ident() != self._thread_id:
+            return
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self.frame_times.append(now - self._frame_start)
+        self.frame_ends.append(now)
+        for name, seconds in self._current.items():
+            if name not in self.stage_times:
+                self.stage_times[name] = deque(maxlen=self.window)
+            self.stage_times[name].append(seconds)
+        self.last_stage_times = self._current
+        self._current = {}
+        self._frame_start = None
+
+    def fps(self, now: Optional[float] = None) -> float:
+        """
+        The number of frames which ended during the last second.
+        """
+        now = time.perf_counter() if now is None else now
+        return float(sum(1 for end in self.frame_ends if now - end <= 1.0))
+
+    def summary(self) -> dict:
+        """
+        Get the percentiles of the frame time and of every stage in seconds.
+
+        Returns:
+            dict: {'frame': {'p50', 'p90', 'p99', 'last'}, 'fps': float,
+                'stages': {name: {'p50', 'p90', 'p99', 'last'}}}. The percentiles of a
+                stage are over the frames in which the stage ran.
+        """
+        return {
+            'frame': percentiles(self.frame_times),
+            'fps': self.fps(),
+            'stages': {name: dict(percentiles(times), last=self.last_stage_times.get(name, 0.0))
+                       for name, times in self.stage_times.items()},
+        }
+
+
+def percentiles(samples) -> Dict[str, float]:
+    """
+    Get the 50th, 90th and 99th percentiles and the last of samples (0 if there are none).
+    """
+    if len(samples) == 0:
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'last': 0.0}
+    p50, p90, p99 = np.percentile(np.fromiter(samples, dtype=float), (50, 90, 99))
+    return {'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'last': samples[-1]}
+
+
+# The timer of the frames of the canvas shared by the application
+frame_timer = FrameTimer()
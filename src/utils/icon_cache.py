@@ -0,0 +1,188 @@
+import hashlib
+import os
+from typing import Dict, Optional, Tuple
+from PyQt5.QtGui import QPixmap, QIcon, QPainter, QCursor, QGuiApplication
+from PyQt5.QtSvg import QSvgRenderer
+from PyQt5.QtCore import Qt
+
+"""
+A process-wide cache of the SVG icons and cursors rasterized with QSvgRenderer. The
+pixmaps are keyed by the path and modification time of the SVG file, the size and the
+device pixel ratio, so every icon is rasterized once per process. Optionally the pixmaps
+are also stored as PNG files in a directory so that the next start does not rasterize
+them either.
+"""
+
+# Increase when the way the icons are rasterized changes to ignore the stored PNG files
+CACHE_VERSION = 1
+
+# (absolute path, modification time, width, height, device pixel ratio)
+Key = Tuple[str, float, int, int, float]
+
+
+class IconCache:
+    """
+    Rasterize SVG files once per path, size and device pixel ratio.
+    """
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory (Optional[str]): Where to store the rasterized icons between runs.
+                None keeps them only in memory.
+        """
+        self.directory = None
+        self.set_directory(directory)
+        self.pixmaps: Dict[Key, QPixmap] = {}
+        self.icons: Dict[Key, QIcon] = {}
+        self.cursors: Dict[Tuple[Key, int, int], QCursor] = {}
+        self.hits = 0 # found in memory
+        self.disk_hits = 0 # read from the directory
+        self.misses = 0 # rasterized
+
+    def set_directory(self, directory: Optional[str]) -> None:
+        """
+        Store the rasterized icons in a directory (created if needed) or only in memory if None.
+        """
+        if directory is not None:
+            directory = os.path.expanduser(directory)
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as e:
+                print(f'[IconCache] Cannot use {directory}: {e}')
+                directory = None
+        self.directory = directory
+
+    def clear(self) -> None:
+        """
+        Forget the icons kept in memory. The stored PNG files are kept.
+        """
+        self.pixmaps.clear()
+        self.icons.clear()
+        self.cursors.clear()
+
+    def key(self, path: str, size: Tuple[int, int], device_pixel_ratio: Optional[float]) -> Key:
+        path = os.path.abspath(path)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = 0.0 # a missing file renders as a transparent pixmap like QSvgRenderer does
+        if device_pixel_ratio is None:
+            application = QGuiApplication.instance()
+            device_pixel_ratio = application.devicePixelRatio() if application is not None else 1.0
+        return (path, mtime, int(size[0]), int(size[1]), float(device_pixel_ratio))
+
+    def pixmap(self, path: str, size: Tuple[int, int] = (24, 24), device_pixel_ratio: Optional[float] = None) -> QPixmap:
+        """
+        Get an SVG file rasterized at a size.
+
+        Args:
+            path (str): The path of the SVG file.
+            size (Tuple[int, int]): The (width, height) in device independent pixels.
+            device_pixel_ratio (Optional[float]): The ratio of the screen. The ratio of the
+                application by default. The pixmap has size * device_pixel_ratio pixels.
+
+        Returns:
+            QPixmap: The shared pixmap. QPixmaps are copied on write so it can be modified.
+        """
+        key = self.key(path, size, device_pixel_ratio)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.hits += 1
+            return pixmap
+
+        pixmap = self.load(key)
+        if pixmap is None:
+            self.misses += 1
+            pixmap = rasterize_svg(path, size, key[4])
+            self.store(key, pixmap)
+        else:
+            self.disk_hits += 1
+        self.pixmaps[key] = pixmap
+        return pixmap
+
+    def icon(self, path: str, size: Tuple[int, int] = (24, 24), device_pixel_ratio: Optional[float] = None) -> QIcon:
+        """
+        Get a QIcon of an SVG file rasterized at a size (see pixmap()).
+        """
+        key = self.key(path, size, device_pixel_ratio)
+        icon = self.icons.get(key)
+        if icon is not None:
+            self.hits += 1
+            return icon
+        icon = QIcon()
+        icon.addPixmap(self.pixmap(path, size, device_pixel_ratio))
+        self.icons[key] = icon
+        return icon
+
+    def cursor(self, path: str, size: Tuple[int, int] = (32, 32), hotspot: Optional[Tuple[int, int]] = None,
+               device_pixel_ratio: Optional[float] = None) -> QCursor:
+        """
+        Get a cursor showing an SVG file.
+
+        Args:
+            hotspot (Optional[Tuple[int, int]]): The (x, y) of the point of the cursor in
+                device independent pixels. The lower-left corner by default.
+        """
+        if hotspot is None:
+            hotspot = (0, size[1] - 1)
+        key = (self.key(path, size, device_pixel_ratio), *hotspot)
+        cursor = self.cursors.get(key)
+        if cursor is not None:
+            self.hits += 1
+            return cursor
+        cursor = QCursor(self.pixmap(path, size, device_pixel_ratio), *hotspot)
+        self.cursors[key] = cursor
+        return cursor
+
+    def file_path(self, key: Key) -> str:
+        digest = hashlib.sha1(repr((CACHE_VERSION, key)).encode()).hexdigest()
+        return os.path.join(self.directory, f'{digest}.png')
+
+    def load(self, key: Key) -> Optional[QPixmap]:
+        """
+        Read a pixmap stored by a previous run. None if it is not stored.
+        """
+        if self.directory is None:
+            return None
+        file_path = self.file_path(key)
+        if not os.path.exists(file_path):
+            return None
+        pixmap = QPixmap()
+        if not pixmap.load(file_path, 'PNG'):
+            return None
+        pixmap.setDevicePixelRatio(key[4])
+        return pixmap
+
+    def store(self, key: Key, pixmap: QPixmap) -> None:
+        if self.directory is None:
+            return
+        file_path = self.file_path(key)
+        temporary_path = f'{file_path}.{os.getpid()}.tmp'
+        # Written under another name first so that another instance never reads half a file
+        if pixmap.save(temporary_path, 'PNG'):
+            try:
+                os.replace(temporary_path, file_path)
+            except OSError:
+                pass
+
+
+def rasterize_svg(path: str, size: Tuple[int, int], device_pixel_ratio: float = 1.0) -> QPixmap:
+    """
+    Render an SVG file on a transparent pixmap.
+
+    Args:
+        path (str): The path of the SVG file.
+        size (Tuple[int, int]): The (width, height) in device independent pixels.
+        device_pixel_ratio (float): The pixmap has size * device_pixel_ratio pixels.
+    """
+    pixmap = QPixmap(round(size[0] * device_pixel_ratio), round(size[1] * device_pixel_ratio))
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    QSvgRenderer(path).render(painter)
+    painter.end()
+    pixmap.setDevicePixelRatio(device_pixel_ratio)
+    return pixmap
+
+
+# The icons of the application
+icon_cache = IconCache()
@@ -2,8 +2,8 @@ import numpy as np
 import cv2
 from typing import Tuple
 from PyQt5.QtGui import QPixmap, QImage, QIcon, QPainter, QColor
-from PyQt5.QtSvg import QSvgRenderer
 from PyQt5.QtCore import Qt
+from src.utils.icon_cache import icon_cache
 
 def qpixmap_to_qimage(pixmap: QPixmap) -> QImage:
     """Convert QPixmap to QImage."""
@@ -22,6 +22,35 @@ def qpixmap_to_cv2(pixmap: QPixmap) -> np.ndarray:
     """Convert QPixmap to OpenCV (cv2) image."""
     return qimage_to_cv2(qpixmap_to_qimage(pixmap))
 
+def to_bgra(image: np.ndarray) -> np.ndarray:
+    """
+    Convert a cv2 image to BGRA. The conversion allocates a new image (cv2.cvtColor does
+    not convert in place) but it is the only copy. Images which already have an alpha
+    channel are returned as they are without copying.
+    """
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    if image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    return image
+
+def bgra_to_qimage(image: np.ndarray, opaque: bool = True) -> QImage:
+    """
+    Wrap a BGRA image in a QImage without copying the pixels.
+    QImage.Format_(A)RGB32 is stored as BGRA on little-endian machines, i.e. the cv2 layout.
+    The QImage does not own the buffer so the caller has to keep the array alive.
+
+    Args:
+        image (np.ndarray): A C-contiguous BGRA image.
+        opaque (bool): If True the alpha channel is ignored.
+
+    Returns:
+        QImage: The image sharing the memory of the array.
+    """
+    height, width = image.shape[:2]
+    image_format = QImage.Format_RGB32 if opaque else QImage.Format_ARGB32
+    return QImage(image.ctypes.data, width, height, image.strides[0], image_format)
+
 def cv2_to_qpixmap(cv_image: np.ndarray) -> QPixmap:
     """Converts a cv2 image (numpy array) to a QPixmap."""
     # Check if the image has an alpha channel (i.e., 4 channels)
@@ -47,17 +76,10 @@ def cv2_to_qpixmap(cv_image: np.ndarray) -> QPixmap:
 
 def create_svg_icon(icon_path:str, size: Tuple[int, int]=(24, 24)):
         '''
-        Helper function to create QIcon from SVG file path
+        Helper function to create QIcon from SVG file path. The icons are rasterized once
+        and shared (see icon_cache)
         '''
-        icon = QIcon()
-        renderer = QSvgRenderer(icon_path)
-        pixmap = QPixmap(size[0], size[1])
-        pixmap.fill(Qt.transparent)
-        painter = QPainter(pixmap)
-        renderer.render(painter)
-        painter.end()
-        icon.addPixmap(pixmap)
-        return icon
+        return icon_cache.icon(icon_path, size)
 
 def generate_checkerboard(width: int, height: int, square_size: int = 10) -> QPixmap:
     """
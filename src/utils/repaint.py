@@ -0,0 +1,58 @@
+from typing import Callable
+from PyQt5.QtCore import QRect, QTimer
+from PyQt5.QtGui import QRegion
+
+
+def border_region(rect: QRect, width: int) -> QRegion:
+    """
+    The region of a border of a rectangle, i.e. the ring of the given width centered on its edges.
+
+    Args:
+        rect (QRect): The rectangle.
+        width (int): The width of the ring.
+
+    Returns:
+        QRegion: The region covered by the border.
+    """
+    outer = rect.adjusted(-width, -width, width, width)
+    inner = rect.adjusted(width, width, -width, -width)
+    if inner.isEmpty():
+        return QRegion(outer)
+    return QRegion(outer).subtracted(QRegion(inner))
+
+
+class FrameThrottle:
+    """
+    Call a function at most once per frame with the latest arguments. The first call
+    is made immediately. Calls during the following frame are coalesced into one call
+    at the end of the frame. Used for mouse moves which arrive faster than the screen refreshes.
+    """
+    def __init__(self, callback: Callable, interval_ms: int = 16):
+        self.callback = callback
+        self.pending = None # the arguments of the coalesced call
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._on_timeout)
+
+    def post(self, *args) -> None:
+        if self.timer.isActive():
+            self.pending = args
+            return
+        self.callback(*args)
+        self.timer.start()
+
+    def flush(self) -> None:
+        """
+        Make the pending call now, e.g. before a mouse release.
+        """
+        self.timer.stop()
+        if self.pending is not None:
+            args, self.pending = self.pending, None
+            self.callback(*args)
+
+    def _on_timeout(self) -> None:
+        if self.pending is not None:
+            args, self.pending = self.pending, None
+            self.callback(*args)
+            self.timer.start()
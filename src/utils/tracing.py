@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+"""
+A low overhead trace of what the application does: spans with a duration (e.g. deleting
+a layer and rendering the layers again) and instant events (e.g. a click on a button).
+The events are kept in a ring buffer so that the trace of the last minutes of a laggy
+session can be exported at any time. The export is in the Chrome trace event format,
+which can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+Recording an event appends a tuple to a deque. Nothing is formatted or written until
+the trace is exported.
+"""
+
+# (phase, name, category, timestamp in ns, duration in ns, thread id, args)
+Event = Tuple[str, str, str, int, int, int, Optional[dict]]
+
+
+class _NullSpan:
+    """
+    The context manager returned while tracing is disabled. It does nothing.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """
+    Record a complete event with the duration of a with block.
+    """
+    __slots__ = ('events', 'name', 'category', 'args', 'start')
+
+    def __init__(self, events: Deque[Event], name: str, category: str, args: Optional[dict]):
+        self.events = events
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        self.events.append(('X', self.name, self.category, self.start, end - self.start,
+                            threading.get_ident(), self.args))
+        return False
+
+
+class Tracer:
+    """
+    Record trace events in a ring buffer. The oldest events are dropped when it is full.
+    """
+    def __init__(self, buffer_size: int = 100000, enabled: bool = True):
+        """
+        Args:
+            buffer_size (int): The maximum number of events kept.
+            enabled (bool): Whether events are recorded.
+        """
+        self.enabled = enabled
+        self.events: Deque[Event] = deque(maxlen=buffer_size)
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def set_buffer_size(self, buffer_size: int) -> None:
+        """
+        Change the size of the ring buffer keeping the newest events.
+        """
+        self.events = deque(self.events, maxlen=buffer_size)
+
+    def clear(self) -> None:
+        self.events.clear()
+
+    def span(self, name: str, category: str = '', **args):
+        """
+        A context manager recording a span with the duration of a with block.
+
+        Args:
+            name (str): The name of the span, e.g. 'delete_layer'.
+            category (str): The category, e.g. 'layers'. Used for filtering in the trace viewers.
+            **args: Details such as the id of the layer. They must be JSON serializable.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self.events, name, category, args or None)
+
+    def instant(self, name: str, category: str = '', **args) -> None:
+        """
+        Record an event without a duration, e.g. a click.
+        """
+        if self.enabled:
+            self.events.append(('i', name, category, time.perf_counter_ns(), 0, threading.get_ident(), args or None))
+
+    def begin(self, name: str, category: str = '', **args) -> None:
+        """
+        Begin a span which ends in another function, e.g. a stroke from the mouse press to
+        the mouse release. It must be ended with end() on the same thread.
+        """
+        if self.enabled:
+            self.events.append(('B', name, category, time.perf_counter_ns(), 0, threading.get_ident(), args or None))
+
+    def end(self, name: str, category: str = '', **args) -> None:
+        """
+        End the last span begun with begin().
+        """
+        if self.enabled:
+            self.events.append(('E', name, category, time.perf_counter_ns(), 0, threading.get_ident(), args or None))
+
+    def to_chrome_trace(self) -> dict:
+        """
+        Convert the recorded events to the Chrome trace event format.
+
+        Returns:
+            dict: {'traceEvents': [...], 'displayTimeUnit': 'ms'}. The timestamps are in microseconds.
+        """
+        pid = os.getpid()
+        events: List[Event] = list(self.events) # a copy, events may be added meanwhile
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        trace_events = []
+        for phase, name, category, timestamp, duration, tid, args in events:
+            event = {'name': name, 'cat': category, 'ph': phase, 'ts': timestamp / 1000, 'pid': pid, 'tid': tid}
+            if phase == 'X':
+                event['dur'] = duration / 1000
+            elif phase == 'i':
+                event['s'] = 't' # the event belongs to the thread
+            if args:
+                event['args'] = args
+            trace_events.append(event)
+        # Name the threads in the viewers
+        for tid in sorted({event['tid'] for event in trace_events}):
+            trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                                 'args': {'name': thread_names.get(tid, str(tid))}})
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path: str) -> int:
+        """
+        Write the recorded events to a JSON file in the Chrome trace event format.
+
+        Returns:
+            int: The number of events written.
+        """
+        trace = self.to_chrome_trace()
+        with open(path, 'w') as file:
+            json.dump(trace, file, default=str)
+        return sum(1 for event in trace['traceEvents'] if event['ph'] != 'M')
+
+
+# The trace of the application
+tracer = Tracer()
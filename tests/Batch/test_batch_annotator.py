@@ -0,0 +1,46 @@
+import json
+import cv2
+import numpy as np
+import pytest
+from src.Batch.BatchAnnotator import annotate_images, load_template, main, resolve_inputs
+
+
+@pytest.fixture
+def images_dir(tmp_path):
+    directory = tmp_path / 'images'
+    directory.mkdir()
+    for i in range(4):
+        cv2.imwrite(str(directory / f'image{i}.png'), np.full((20, 30, 3), 10 * i, dtype=np.uint8))
+    (directory / 'notes.txt').write_text('not an image')
+    return directory
+
+@pytest.fixture
+def template_path(tmp_path):
+    path = tmp_path / 'template.json'
+    path.write_text(json.dumps({'elements': [
+        {'tool': 'PencilTool',
+         'instructions': {'points': [[2, 5], [25, 5]], 'color': [0, 0, 255], 'thickness': 1, 'alpha': 255}},
+    ]}))
+    return str(path)
+
+def test_resolve_inputs(images_dir):
+    """Ensure directories and globs are expanded to image files only."""
+    assert len(resolve_inputs([str(images_dir)])) == 4
+    assert len(resolve_inputs([str(images_dir / 'image[01].png')])) == 2
+
+def test_annotate_images(images_dir, template_path, tmp_path):
+    """Ensure every image is annotated by the process pool and written to the output directory."""
+    output_dir = tmp_path / 'out'
+    inputs = resolve_inputs([str(images_dir)])
+    results = list(annotate_images(inputs, load_template(template_path), str(output_dir), max_workers=2))
+    assert sorted(path for path, _ in results) == inputs
+    assert all(error is None for _, error in results)
+    annotated = cv2.imread(str(output_dir / 'image3.png'), cv2.IMREAD_UNCHANGED)
+    assert tuple(annotated[5, 10]) == (0, 0, 255, 255)
+    assert tuple(annotated[10, 10]) == (30, 30, 30, 255)
+
+def test_main_reports_throughput(images_dir, template_path, tmp_path, capsys):
+    """Ensure the CLI converts the format and reports images per second."""
+    assert main([str(images_dir), '-t', template_path, '-o', str(tmp_path / 'out'), '-f', 'jpg', '-j', '1']) == 0
+    assert len(list((tmp_path / 'out').glob('*.jpg'))) == 4
+    assert 'images/sec' in capsys.readouterr().out
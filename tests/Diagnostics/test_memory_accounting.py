@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from src.DrawableElement import DrawableElement
+from src.Diagnostics.MemoryAccounting import MemoryAccountant, MemoryNode, account_image_processor, format_bytes, process_rss
+from src.Diagnostics.MemoryPanel import MemoryPanel
+from src.Layers.Layer import Layer
+from src.Layers.LayerList import LayerList
+from src.Project.LazyRaster import LazyRaster
+
+
+def make_element(height=5, width=6):
+    return DrawableElement('PencilTool', image=np.zeros((height, width, 4), dtype=np.uint8), size=(height, width),
+                           touch_mask=np.zeros((height, width), dtype=np.uint8))
+
+@pytest.fixture
+def image_processor(monkeypatch):
+    """A stand-in for an ImageProcessor with two layers and a cached union of them."""
+    monkeypatch.setattr(Layer, '_id_counter', 0) # restored afterwards for the tests expecting the first ids
+    layer_list = LayerList()
+    image = np.zeros((10, 20, 4), dtype=np.uint8)
+    background = Layer(image=image)
+    layer_list.add_layer(background)
+    drawn = Layer(image=np.zeros_like(image))
+    drawn.add_element(make_element())
+    layer_list.add_layer(drawn)
+    union = np.zeros_like(image)
+    layer_list.cache.add_cache((0, 1), union)
+    return SimpleNamespace(layer_list=layer_list, fake_layer=None, final_image=union,
+                           zoomable_label=SimpleNamespace(original_image=None, transformed_image=None))
+
+def test_arrays_are_counted_once():
+    """Ensure aliases and views of a counted array add nothing and a view keeps its whole array."""
+    accountant = MemoryAccountant()
+    image = np.zeros((10, 20, 4), dtype=np.uint8)
+    assert accountant.array('image', image).nbytes == 800
+    alias = accountant.array('final_image', image)
+    assert alias.nbytes == 0 and alias.note == 'shared'
+    assert accountant.array('crop', image[:2, :2]).nbytes == 0
+
+    crop = MemoryAccountant().array('crop', image[:2, :2])
+    assert crop.nbytes == 800
+    assert 'view of 10x20x4' in crop.note
+    assert accountant.array('missing', None).nbytes == 0
+
+def test_lazy_rasters_count_decoded_tiles():
+    image = np.arange(16 * 16, dtype=np.uint8).reshape(16, 16)
+    raster = LazyRaster(image.tobytes(), image.shape, np.uint8, 16, [(0, image.nbytes, 'raw')])
+    accountant = MemoryAccountant()
+    assert accountant.array('image', raster).nbytes == 0
+    np.asarray(raster)
+    assert accountant.array('image', raster).nbytes == raster.decoded_nbytes
+
+def test_account_layers_elements_and_cache(image_processor):
+    """Ensure every layer, element and cached union is accounted for and the totals add up."""
+    report = account_image_processor(image_processor)
+    layer = image_processor.layer_list[1]
+    element = layer.elements[0]
+
+    element_node = report.find('layers', f'layer {layer.id}', 'elements', f'element {element.id} (PencilTool)')
+    assert element_node.find('image').nbytes == 5 * 6 * 4
+    assert element_node.find('touch_mask').nbytes == 5 * 6
+    assert report.find('layers', f'layer {layer.id}', 'final_image').nbytes == 800
+    assert report.find('layers cache', 'layers (0, 1)').nbytes == 800
+    # The final image of the canvas is the cached union
+    assert report.find('canvas', 'final_image').note == 'shared'
+    assert report.total == 5 * 800 + 5 * 6 * 5 # the layers copy their image to their final image
+    assert report.to_dict()['bytes'] == report.total
+
+def test_totals_include_children():
+    root = MemoryNode('root', 1)
+    child = root.add(MemoryNode('child', 2))
+    child.add(MemoryNode('grandchild', 3))
+    assert root.total == 6
+    assert root.find('child', 'grandchild').total == 3
+    assert root.find('missing') is None
+
+def test_format_bytes_and_rss():
+    assert format_bytes(512) == '512 B'
+    assert format_bytes(1536) == '1.5 KiB'
+    assert format_bytes(3 * 1024 ** 3) == '3.0 GiB'
+    assert process_rss() > 0
+
+def test_memory_panel_keeps_expanded_items(qtbot, image_processor):
+    """Ensure the panel shows the biggest subsystem first and keeps the tree expanded when refreshed."""
+    panel = MemoryPanel(lambda: account_image_processor(image_processor))
+    qtbot.addWidget(panel)
+    panel.show()
+    assert panel.tree.topLevelItem(0).text(MemoryPanel.COLUMN_NAME) == 'layers'
+    assert 'Accounted: 4.1 KiB' in panel.summary_label.text()
+    panel.tree.topLevelItem(0).setExpanded(True)
+
+    image_processor.layer_list.add_layer(Layer(image=np.zeros((10, 20, 4), dtype=np.uint8)))
+    panel.refresh()
+    layers_item = panel.tree.topLevelItem(0)
+    assert layers_item.isExpanded()
+    assert layers_item.childCount() == 3
+    panel.hide()
+    assert not panel.refresh_timer.isActive()
@@ -0,0 +1,76 @@
+import os
+import pytest
+import cv2
+import numpy as np
+from src.Export.Exporter import Exporter, ExportTarget, encode_image, flatten_alpha
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (40, 60, 4), dtype=np.uint8)
+    image[:, :, 3] = 255
+    return image
+
+@pytest.fixture
+def exporter():
+    exporter = Exporter(max_workers=3)
+    yield exporter
+    exporter.shutdown()
+
+def test_export_formats_and_scales(exporter: Exporter, image, tmp_path):
+    """Ensure several formats and scales are exported in parallel with progress reporting."""
+    targets = [ExportTarget(str(tmp_path / 'image.png')),
+               ExportTarget(str(tmp_path / 'image.jpeg')),
+               ExportTarget(str(tmp_path / 'image.webp'), scale=0.5),
+               ExportTarget(str(tmp_path / 'image.tif'), scale=2)]
+    progress = []
+    job = exporter.export(image, targets, lambda done, total, target, error: progress.append((done, total, error)))
+    paths = job.wait(timeout=10)
+
+    assert paths == [target.path for target in targets]
+    assert sorted(done for done, _, _ in progress) == [1, 2, 3, 4]
+    assert all(total == 4 and error is None for _, total, error in progress)
+    assert np.array_equal(cv2.imread(paths[0], cv2.IMREAD_UNCHANGED), image)
+    assert cv2.imread(paths[1]).shape == (40, 60, 3)
+    assert cv2.imread(paths[2], cv2.IMREAD_UNCHANGED).shape[:2] == (20, 30)
+    assert cv2.imread(paths[3], cv2.IMREAD_UNCHANGED).shape[:2] == (80, 120)
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
+
+def test_export_error_is_reported(exporter: Exporter, image, tmp_path):
+    """Ensure a failed export is reported to the progress callback and raised by wait."""
+    errors = []
+    job = exporter.export(image, [ExportTarget(str(tmp_path / 'missing' / 'image.png'))],
+                          lambda done, total, target, error: errors.append(error))
+    with pytest.raises(OSError):
+        job.wait(timeout=10)
+    assert isinstance(errors[0], OSError)
+
+def test_unsupported_format():
+    """Ensure unknown formats are rejected when the target is created."""
+    with pytest.raises(ValueError):
+        ExportTarget('image.gif')
+
+def test_jpeg_is_blended_on_white(image):
+    """Ensure transparent pixels become white in formats without alpha."""
+    image[:, :, 3] = 0
+    assert (flatten_alpha(image) == 255).all()
+    decoded = cv2.imdecode(np.frombuffer(encode_image(image, ExportTarget('a.jpg')), np.uint8), cv2.IMREAD_UNCHANGED)
+    assert decoded.shape == (40, 60, 3)
+
+def test_all_errors_are_recorded_when_the_last_target_finishes(exporter: Exporter, image, tmp_path):
+    """Ensure the errors of every target are known when the progress reaches the total."""
+    targets = [ExportTarget(str(tmp_path / 'missing' / f'image{i}.png')) for i in range(3)] + \
+              [ExportTarget(str(tmp_path / 'image.png'))]
+    jobs, errors_at_the_end = [], []
+    def on_progress(done, total, target, error):
+        while not jobs:
+            pass # the job is returned right after the targets are submitted
+        if done == total:
+            errors_at_the_end.append(len(jobs[0].errors))
+    jobs.append(exporter.export(image, targets, on_progress))
+    with pytest.raises(OSError):
+        jobs[0].wait(timeout=10)
+    for future in jobs[0].futures:
+        future.exception(timeout=10)
+    assert errors_at_the_end == [3]
@@ -0,0 +1,31 @@
+import pytest
+import numpy as np
+from src.Export.Exporter import Exporter, ExportTarget
+from src.Export.QtExporter import QtExporter
+
+
+@pytest.fixture
+def qt_exporter():
+    qt_exporter = QtExporter(Exporter(max_workers=2))
+    yield qt_exporter
+    qt_exporter.exporter.shutdown()
+
+def test_overlapping_jobs_have_their_own_signals(qt_exporter: QtExporter, qtbot, tmp_path):
+    """Ensure two exports in progress at the same time only report their own progress."""
+    image = np.zeros((40, 60, 4), dtype=np.uint8)
+    first = qt_exporter.create_job([ExportTarget(str(tmp_path / 'first.png'))])
+    second = qt_exporter.create_job([ExportTarget(str(tmp_path / 'second.png')),
+                                     ExportTarget(str(tmp_path / 'missing' / 'second.png'))])
+    progress = {first: [], second: []}
+    for job in (first, second):
+        job.progress.connect(lambda done, total, job=job: progress[job].append((done, total)))
+
+    with qtbot.waitSignals([first.finished, second.finished], timeout=5000):
+        qt_exporter.start(first, image)
+        qt_exporter.start(second, image)
+
+    assert progress[first] == [(1, 1)]
+    assert sorted(progress[second]) == [(1, 2), (2, 2)]
+    assert first.errors == []
+    assert [path for path, _ in second.errors] == [str(tmp_path / 'missing' / 'second.png')]
+    qtbot.waitUntil(lambda: not qt_exporter.jobs) # finished jobs are released
@@ -41,3 +41,39 @@ def test_load_tool_already_loaded(tool_manager):
         tool_manager.load_tool("MockTool")
         mock_import.assert_not_called()
 
+
+def test_tools_from_config_are_loaded_on_first_use(tool_manager: ToolManager):
+    """Ensure the tools of the config are registered without importing them and loaded once when used."""
+    tools_config = [{'name': 'MockTool', 'order': 2}, {'name': 'OtherTool', 'order': 1}]
+    mock_module = MagicMock()
+    with patch.dict('src.ImageProcessingTools.ToolManager.config', {'tools': tools_config}), \
+         patch("importlib.import_module", return_value=mock_module) as mock_import:
+        tool_manager.load_tools_from_config()
+        assert tool_manager.tools['OtherTool']['order'] == 1
+        assert not tool_manager.is_loaded('MockTool')
+        mock_import.assert_not_called()
+
+        tool = tool_manager.get_tool('MockTool')
+        assert tool is mock_module.MockTool.return_value
+        assert tool_manager.get_tool('MockTool') is tool
+        mock_import.assert_called_once_with('src.ImageProcessingTools.MockTool.MockTool')
+        tool.create_ui.assert_called_once_with(None)
+        assert not tool_manager.is_loaded('OtherTool')
+
+def test_get_unregistered_tool(tool_manager: ToolManager):
+    with pytest.raises(KeyError):
+        tool_manager.get_tool('MissingTool')
+
+def test_tool_button_loads_the_tool_when_clicked(tool_manager: ToolManager, qtbot):
+    """Ensure the button of a tool is shown before the tool is loaded and is given to the tool."""
+    tool_manager.register_tool('MockTool')
+    mock_module = MagicMock()
+    with patch("importlib.import_module", return_value=mock_module) as mock_import:
+        button = tool_manager.create_tool_button('MockTool')
+        qtbot.addWidget(button)
+        mock_import.assert_not_called()
+
+        button.click()
+        tool = tool_manager.tools['MockTool']['object']
+        tool.create_ui.assert_called_once_with(button)
+        tool.set_tool.assert_called_once()
@@ -0,0 +1,48 @@
+import numpy as np
+from unittest.mock import patch
+from PyQt5.QtCore import Qt
+from src.DrawableElement import DrawableElement
+from src.Layers import ElementListGUI as element_list_gui_module
+from src.Layers import Layer as layer_module
+from src.Layers.ElementListGUI import ElementListGUI
+from src.Layers.Layer import Layer, FakeLayer
+
+
+def element(width=400, height=200):
+    return DrawableElement('PencilTool', {}, image=np.full((height, width, 4), 255, dtype=np.uint8),
+                           size=(height, width))
+
+def test_thumbnails_are_generated_when_shown(qtbot):
+    """Ensure rows are added without thumbnails and each thumbnail is generated once from the element raster."""
+    gui = ElementListGUI([element() for _ in range(50)])
+    qtbot.addWidget(gui)
+    gui.add_element_in_gui(element(), index=-1)
+    assert gui.model.rowCount() == 51
+    assert gui.thumbnail_pixmaps() == []
+
+    with patch.object(element_list_gui_module, 'create_thumbnail', wraps=element_list_gui_module.create_thumbnail) as create_thumbnail:
+        index = gui.model.index(50)
+        thumbnail = index.data(Qt.DecorationRole)
+        assert index.data(Qt.DecorationRole).cacheKey() == thumbnail.cacheKey()
+        create_thumbnail.assert_called_once()
+    assert (thumbnail.width(), thumbnail.height()) == (100, 75)
+    assert len(gui.thumbnail_pixmaps()) == 1
+
+def test_element_list_gui_exists_only_for_the_active_layer(qtbot, monkeypatch):
+    """Ensure layers create their ElementListGUI when they become active and delete it when inactive."""
+    monkeypatch.setattr(Layer, '_id_counter', 0)
+    monkeypatch.setattr(layer_module, 'WITHGUI', True)
+    monkeypatch.setattr(ElementListGUI, 'set_as_active', lambda self: None)
+    monkeypatch.setattr(ElementListGUI, 'set_as_inactive', lambda self: None)
+    image = np.zeros((10, 10, 4), dtype=np.uint8)
+    layer, fake_layer = Layer(image), FakeLayer(image)
+    layer.add_element(element())
+    assert layer.gui is None and fake_layer.gui is None
+
+    layer.set_as_active()
+    assert layer.gui.model.elements == layer.elements
+    layer.add_element(element())
+    assert layer.gui.model.rowCount() == 2
+
+    layer.set_as_inactive()
+    assert layer.gui is None
@@ -1,3 +1,4 @@
+import json
 import pytest
 import cv2
 import numpy as np
@@ -14,6 +15,8 @@ def menubar() -> MenuBar:
     """
     menu_bar = MenuBar()
     menu_bar.callback_update_image = MagicMock()
+    menu_bar.callback_show_proxy_image = MagicMock()
+    menu_bar.callback_hide_proxy_image = MagicMock()
     return menu_bar
 
 def test_load_image(menubar: MenuBar, mocker):
@@ -34,3 +37,67 @@ def test_load_image_cancel(menubar: MenuBar, mocker):
 
     cv2.imread.assert_not_called()
     menubar.callback_update_image.assert_not_called()
+
+def test_load_large_image_with_proxy(menubar: MenuBar, mocker, qtbot, tmp_path):
+    """Ensure a proxy is only shown first and the full image decoded in the background replaces the document."""
+    path = str(tmp_path / 'large.jpg')
+    cv2.imwrite(path, np.full((64, 96, 3), 128, dtype=np.uint8))
+    mocker.patch.object(QFileDialog, 'getOpenFileName', return_value=(path, ""))
+    mocker.patch.dict('src.MenuBar.MenuBar.config', {'image_import': {
+        'background_min_file_bytes': 0, 'proxy_extensions': ['.jpg'], 'proxy_reduction': 4}})
+
+    with qtbot.waitSignal(menubar.image_loader.image_loaded, timeout=5000):
+        menubar.load_image()
+    proxy = menubar.callback_show_proxy_image.call_args.args[0]
+    assert proxy.shape == (16, 24, 3)
+    image = menubar.callback_update_image.call_args.args[0]
+    assert image.shape == (64, 96, 4) # the alpha channel is added in the background
+    menubar.callback_update_image.assert_called_once()
+    menubar.callback_hide_proxy_image.assert_not_called()
+
+def test_proxy_is_hidden_if_the_image_fails_to_load(menubar: MenuBar):
+    """Ensure the document is shown again if the image of a shown proxy cannot be decoded."""
+    menubar.showing_proxy = True
+    menubar.on_image_loaded(menubar.image_loader.generation, None)
+    menubar.callback_hide_proxy_image.assert_called_once()
+    menubar.callback_update_image.assert_not_called()
+
+@pytest.mark.parametrize('configured, expected', [(1, 2), (2, 2), (3, 2), (4, 4), (6, 4), (8, 8), (16, 8)])
+def test_proxy_reduction_is_clamped(menubar: MenuBar, mocker, configured, expected):
+    """Ensure proxy reductions which cv2 cannot decode are rounded down to one which it can."""
+    mocker.patch.dict('src.MenuBar.MenuBar.config', {'image_import': {'proxy_reduction': configured}})
+    assert menubar.proxy_reduction() == expected
+
+def test_stale_image_is_ignored(menubar: MenuBar):
+    """Ensure an image which finishes loading after a newer one was requested is not shown."""
+    menubar.image_loader.generation = 2
+    menubar.on_image_loaded(1, np.zeros((4, 4, 4), dtype=np.uint8))
+    menubar.callback_update_image.assert_not_called()
+
+def test_export_trace(menubar: MenuBar, mocker, tmp_path):
+    """Ensure the trace of the session is exported as Chrome trace JSON."""
+    path = str(tmp_path / 'session')
+    mocker.patch.object(QFileDialog, 'getSaveFileName', return_value=(path, ""))
+    menubar.export_trace()
+    with open(path + '.json') as file:
+        assert 'traceEvents' in json.load(file)
+
+def test_toggle_input_recording(menubar: MenuBar, mocker, tmp_path):
+    """Ensure the first toggle starts recording and the second saves the recorded trace."""
+    path = str(tmp_path / 'strokes')
+    trace = MagicMock()
+    trace.__len__.return_value = 3
+    menubar.callback_start_input_recording = MagicMock()
+    menubar.callback_stop_input_recording = MagicMock(return_value=trace)
+    mocker.patch.object(QFileDialog, 'getSaveFileName', return_value=(path, ""))
+
+    menubar.toggle_input_recording()
+    menubar.callback_start_input_recording.assert_called_once()
+    assert menubar.recording_input
+
+    menubar.showing_proxy = True # a large image is still loading
+    menubar.toggle_input_recording()
+    menubar.callback_stop_input_recording.assert_called_once()
+    assert menubar.showing_proxy
+    trace.save.assert_called_once_with(path + '.json')
+    assert not menubar.recording_input
@@ -0,0 +1,142 @@
+import os
+import pytest
+import numpy as np
+from src.DrawableElement import DrawableElement
+from src.Project.AutosaveJournal import AutosaveJournal, read_journal, TAG_TILE, iter_records
+from src.utils.Box import Box
+
+
+class FakeLayer:
+    """A minimal stand-in for Layer with the attributes used by the journal."""
+    def __init__(self, layer_id, image):
+        self.id = layer_id
+        self.image = image
+        self.final_image = image.copy()
+        self.visible = True
+        self.elements = []
+        self.dirty_regions = []
+        self.image_dirty_regions = []
+
+    def take_dirty_regions(self):
+        regions = self.dirty_regions
+        self.dirty_regions = []
+        return regions
+
+    def take_image_dirty_regions(self):
+        regions = self.image_dirty_regions
+        self.image_dirty_regions = []
+        return regions
+
+
+@pytest.fixture
+def layer():
+    rng = np.random.default_rng(0)
+    return FakeLayer(1, rng.integers(0, 255, (40, 50, 4), dtype=np.uint8))
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = AutosaveJournal(str(tmp_path / 'autosave.journal'), tile_size=16,
+                              compression_level=1, compact_bytes=1 << 30)
+    yield journal
+    journal.close()
+
+def count_tiles(path):
+    return sum(1 for tag, _ in iter_records(path) if tag == TAG_TILE)
+
+def test_recover_document(journal, layer):
+    """Ensure the layers and elements are recovered from the journal."""
+    element = DrawableElement('PencilTool', {'points': [(1, 2)], 'color': (0, 0, 255), 'thickness': 1},
+                              size=(40, 50))
+    layer.elements.append(element)
+    journal.checkpoint([layer], (40, 50))
+    journal.flush()
+
+    document = read_journal(journal.path)
+    assert document.canvas_shape == (40, 50)
+    assert np.array_equal(document.layers[0].image, layer.image)
+    assert np.array_equal(document.layers[0].final_image, layer.final_image)
+    recovered = document.layers[0].elements[0]
+    assert recovered.tool == 'PencilTool'
+    assert recovered.image is None
+    assert recovered.instructions['points'] == [[1, 2]]
+
+def test_only_dirty_tiles_are_appended(journal, layer):
+    """Ensure a checkpoint appends only the changed tiles inside the dirty regions."""
+    journal.checkpoint([layer], (40, 50))
+    journal.flush()
+    num_tiles = count_tiles(journal.path)
+    assert num_tiles == 2 * 3 * 4 # image and final image, 3x4 tiles each
+
+    # Nothing changed
+    assert journal.checkpoint([layer], (40, 50)) == 0
+
+    # Change a single tile but mark two tiles as dirty
+    layer.final_image[20:22, 20:22] = 0
+    layer.dirty_regions.append(Box(10, 18, 20, 4))
+    journal.checkpoint([layer], (40, 50))
+    journal.flush()
+    assert count_tiles(journal.path) == num_tiles + 1
+    assert np.array_equal(read_journal(journal.path).layers[0].final_image, layer.final_image)
+
+def test_compaction(tmp_path, layer):
+    """Ensure compaction keeps only the latest version of each tile."""
+    journal = AutosaveJournal(str(tmp_path / 'autosave.journal'), tile_size=16,
+                              compression_level=0, compact_bytes=1)
+    for value in range(5):
+        layer.final_image[:] = value
+        layer.dirty_regions.append(Box(0, 0, 50, 40))
+        journal.checkpoint([layer], (40, 50))
+    journal.close()
+    assert count_tiles(journal.path) < 12 + 5 * 12 # fewer than all the tiles ever journaled
+    assert np.array_equal(read_journal(journal.path).layers[0].final_image, layer.final_image)
+
+def test_torn_tail_is_ignored(journal, layer):
+    """Ensure a partially written checkpoint is not replayed."""
+    journal.checkpoint([layer], (40, 50))
+    journal.flush()
+    expected = layer.final_image.copy()
+    layer.final_image[:] = 7
+    layer.dirty_regions.append(Box(0, 0, 50, 40))
+    journal.checkpoint([layer], (40, 50))
+    journal.flush()
+    size = os.path.getsize(journal.path)
+    with open(journal.path, 'r+b') as file:
+        file.truncate(size - 10)
+    assert np.array_equal(read_journal(journal.path).layers[0].final_image, expected)
+
+def test_failed_write_is_reported_and_retried(journal, layer):
+    """Ensure a failed write is reported once and the next checkpoint journals everything again."""
+    write = journal._write
+    def fail_once(records):
+        journal._write = write
+        raise OSError('No space left on device')
+    journal._write = fail_once
+    journal.checkpoint([layer], (40, 50))
+    layer.final_image[:] = 3
+    layer.dirty_regions.append(Box(0, 0, 16, 16))
+    journal.checkpoint([layer], (40, 50)) # dropped: it only contains the changes
+    journal.flush()
+    assert journal.checkpoints_written == 0
+
+    error = journal.take_error()
+    assert isinstance(error, OSError)
+    assert journal.take_error() is None # reported once
+
+    journal.checkpoint([layer], (40, 50))
+    journal.flush()
+    assert journal.error is None
+    assert journal.checkpoints_written == 1
+    assert np.array_equal(read_journal(journal.path).layers[0].final_image, layer.final_image)
+
+def test_changes_of_the_starting_image_are_journaled(journal, layer):
+    """Ensure regions of the starting image changed in place (e.g. by a recapture) are recovered."""
+    journal.checkpoint([layer], (40, 50))
+    journal.flush()
+    num_tiles = count_tiles(journal.path)
+
+    layer.image[0:4, 0:4] = 9
+    layer.image_dirty_regions.append(Box(0, 0, 4, 4))
+    journal.checkpoint([layer], (40, 50))
+    journal.flush()
+    assert count_tiles(journal.path) == num_tiles + 1
+    assert np.array_equal(read_journal(journal.path).layers[0].image, layer.image)
@@ -0,0 +1,140 @@
+import copy
+import os
+import pytest
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import patch
+from src.DrawableElement import DrawableElement
+from src.Project.LazyRaster import LazyRaster, materialize
+from src.Project.ProjectFile import read_project, write_project
+from src.Layers.LayersCache import LayersCache
+from src.Rendering import compositing
+
+
+@pytest.fixture(autouse=True)
+def project_config():
+    with patch.dict('src.Project.ProjectFile.config', {'project': {'tile_size': 16, 'compression_level': 1}}):
+        yield
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (50, 40, 4), dtype=np.uint8)
+    image[:16, :16] = 0 # an empty tile
+    return image
+
+@pytest.fixture
+def element():
+    element = DrawableElement('PencilTool',
+                              {'points': [(1, 2), (3, 4)], 'color': (0, 255, 0), 'thickness': 2, 'alpha': 191.25},
+                              image=np.full((5, 6, 4), 200, dtype=np.uint8),
+                              size=(5, 6),
+                              touch_mask=np.full((5, 6), 255, dtype=np.uint8),
+                              transformation=np.array([[1, 0, 7], [0, 1, 9]], dtype=np.float32))
+    element.visible = False
+    return element
+
+@pytest.fixture
+def project_path(tmp_path, image, element):
+    """Fixture saving a project with two layers and returning its path."""
+    layers = [
+        SimpleNamespace(image=image, final_image=image, visible=True, elements=[]),
+        SimpleNamespace(image=np.zeros_like(image), final_image=image[::-1].copy(), visible=False, elements=[element]),
+    ]
+    path = str(tmp_path / 'project.pypaint')
+    write_project(path, layers, image.shape[:2], active_layer_idx=1)
+    return path
+
+def test_round_trip(project_path, image):
+    """Ensure the layers are restored as they were saved."""
+    document = read_project(project_path)
+    assert document.canvas_shape == (50, 40)
+    assert document.active_layer_idx == 1
+    assert len(document.layers) == 2
+    assert document.layers[0].visible is True
+    assert document.layers[1].visible is False
+    assert np.array_equal(np.asarray(document.layers[0].final_image), image)
+    assert np.array_equal(np.asarray(document.layers[1].final_image), image[::-1])
+    assert not np.asarray(document.layers[1].image).any()
+
+def test_elements_round_trip(project_path, element):
+    """Ensure the drawable elements keep their instructions, transformation and rasters."""
+    loaded = read_project(project_path).layers[1].elements[0]
+    assert loaded.tool == 'PencilTool'
+    assert loaded.instructions['points'] == [[1, 2], [3, 4]]
+    assert loaded.visible is False
+    assert loaded.size == (5, 6)
+    assert np.array_equal(loaded.get_transformation(), element.transformation)
+    assert np.array_equal(np.asarray(loaded.image), element.image)
+    assert loaded.is_touched(8, 10, 0)
+
+def test_lazy_tile_decoding(project_path, image):
+    """Ensure slicing a lazily loaded raster decodes only the tiles that intersect the slice."""
+    raster = read_project(project_path).layers[0].final_image
+    assert isinstance(raster, LazyRaster)
+    assert raster.shape == image.shape
+    assert raster.decoded_nbytes == 0
+    region = raster[20:30, 18:35]
+    assert np.array_equal(region, image[20:30, 18:35])
+    assert set(raster._decoded.keys()) == {(1, 1), (1, 2)}
+    assert np.array_equal(raster[5, :, 3], image[5, :, 3])
+
+def test_layer_preview(project_path):
+    """Ensure a preview is stored for the layer thumbnails."""
+    raster = read_project(project_path).layers[0].final_image
+    assert raster.preview is not None
+    assert raster.preview.shape == raster.shape
+
+def test_materialize_returns_writable_copy(project_path, image):
+    """Ensure materialize gives a writable array and deepcopy keeps the raster lazy."""
+    raster = read_project(project_path).layers[0].final_image
+    copied = copy.deepcopy(raster)
+    assert isinstance(copied, LazyRaster)
+    array = materialize(copied)
+    array[0, 0] = 1
+    assert np.array_equal(np.asarray(raster), image)
+
+def test_not_a_project(tmp_path):
+    """Ensure reading a file which is not a project raises an error."""
+    path = tmp_path / 'image.png'
+    path.write_bytes(b'not a project' * 4)
+    with pytest.raises(ValueError):
+        read_project(str(path))
+
+def test_composite_of_lazy_layers_decodes_only_requested_tiles(project_path, image):
+    """Ensure compositing several lazy layers decodes only the tiles of the region which is read."""
+    document = read_project(project_path)
+    for layer in document.layers:
+        layer.visible = True
+    composite = compositing.composite_layers(document.layers, LayersCache(), document.canvas_shape)
+    assert isinstance(composite, compositing.LazyComposite)
+    assert all(layer.final_image.decoded_nbytes == 0 for layer in document.layers)
+
+    region = composite[20:30, 18:35]
+    expected = compositing.overlay_images(image, image[::-1].copy())
+    assert np.array_equal(region, expected[20:30, 18:35])
+    for layer in document.layers:
+        assert set(layer.final_image._decoded.keys()) == {(1, 1), (1, 2)}
+    assert np.array_equal(np.asarray(composite), expected)
+
+def test_close_releases_the_mapped_file(project_path):
+    """Ensure closing a document closes its memory-mapped file even if raw tiles were decoded."""
+    with patch.dict('src.Project.ProjectFile.config', {'project': {'tile_size': 16, 'compression_level': 0}}):
+        write_project(project_path, read_project(project_path).layers, (50, 40))
+    document = read_project(project_path)
+    raster = document.layers[0].final_image
+    raster[0:20, 0:20] # raw tiles are views of the mapped file
+    buffer = document.buffer
+    document.close()
+    assert buffer.closed and raster.buffer is None
+    with pytest.raises(ValueError):
+        raster[20:30, 20:30]
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, image):
+    """Ensure a project which fails to be written does not leave a partial file behind."""
+    layers = [SimpleNamespace(image=image, final_image=image, visible=True, elements=[])]
+    path = str(tmp_path / 'project.pypaint')
+    with patch('src.Project.ProjectFile.make_preview', side_effect=OSError('No space left on device')):
+        with pytest.raises(OSError):
+            write_project(path, layers, image.shape[:2])
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,48 @@
+import numpy as np
+from src.DrawableElement import DrawableElement
+from src.Layers.LayersCache import LayersCache
+from src.Rendering import compositing
+
+
+class FakeLayer:
+    """A layer stand-in with just the attributes used by compositing."""
+    def __init__(self, final_image, visible=True):
+        self.final_image = final_image
+        self.visible = visible
+        self.elements = []
+
+def solid(color, alpha=255, shape=(4, 5)):
+    image = np.zeros((*shape, 4), dtype=np.uint8)
+    image[:, :, :3] = color
+    image[:, :, 3] = alpha
+    return image
+
+def test_overlay_opaque_top_wins():
+    """Ensure an opaque image on top hides the bottom one."""
+    result = compositing.overlay_images(solid(10), solid(200))
+    assert (result == solid(200)).all()
+
+def test_overlay_element_applies_transformation():
+    """Ensure the element is placed using its transformation."""
+    element = DrawableElement('PencilTool', {}, image=solid(255, shape=(1, 1)),
+                              transformation=np.array([[1, 0, 3], [0, 1, 2]], dtype=np.float32))
+    image = compositing.overlay_element_on_image(np.zeros((4, 5, 4), dtype=np.uint8), element)
+    assert image[2, 3, 3] == 255
+    assert image[:, :, 3].sum() == 255
+
+def test_composite_uses_and_invalidates_cache():
+    """Ensure composited unions are cached and dropped once a layer changes."""
+    layers = [FakeLayer(solid(10)), FakeLayer(solid(20, alpha=0)), FakeLayer(solid(30, alpha=0))]
+    cache = LayersCache()
+    assert (compositing.composite_layers(layers, cache, (4, 5))[:, :, 0] == 10).all()
+    assert (0, 1, 2) in cache.cache
+
+    layers[2].final_image = solid(40)
+    cache.invalidate(2)
+    assert (0, 1) in cache.cache and (0, 1, 2) not in cache.cache
+    assert (compositing.composite_layers(layers, cache, (4, 5))[:, :, 0] == 40).all()
+
+def test_composite_without_visible_layers():
+    """Ensure an empty transparent image is returned when no layer is visible."""
+    result = compositing.composite_layers([FakeLayer(solid(10), visible=False)], LayersCache(), (4, 5))
+    assert result.shape == (4, 5, 4) and not result.any()
@@ -0,0 +1,54 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.DrawableElement import DrawableElement
+from src.Rendering.Document import Document
+from src.Rendering.renderers import render_element
+
+
+def pencil_element():
+    return DrawableElement('PencilTool',
+                           {'points': [(2, 2), (8, 2), (8, 8), (2, 8)], 'color': (0, 0, 255),
+                            'thickness': 1, 'alpha': 255, 'origin': (1, 1)},
+                           size=(9, 9),
+                           transformation=np.array([[1, 0, 1], [0, 1, 1]], dtype=np.float32))
+
+def test_pencil_renderer_respects_origin():
+    """Ensure the pencil is drawn relative to the origin of the cropped element image."""
+    element = pencil_element()
+    render_element(element)
+    assert element.image.shape == (9, 9, 4)
+    assert tuple(element.image[1, 1]) == (0, 0, 255, 255) # canvas point (2, 2)
+    assert element.touch_mask[1, 1] == 255
+
+def test_document_render():
+    """Ensure elements added to a headless document are drawn and composited."""
+    document = Document.from_image(np.zeros((12, 12, 3), dtype=np.uint8))
+    document.add_layer()
+    document.add_element(pencil_element())
+    image = document.render()
+    assert tuple(image[2, 2]) == (0, 0, 255, 255)
+    assert tuple(image[0, 0]) == (0, 0, 0, 255)
+
+    document.set_visibility(1, False)
+    assert tuple(document.render()[2, 2]) == (0, 0, 0, 255)
+
+def test_document_renders_in_process_pool():
+    """Ensure a document can be pickled and rendered in a worker process."""
+    document = Document.from_image(np.full((12, 12, 4), 50, dtype=np.uint8))
+    document.add_element(pencil_element())
+    pickle.dumps(document)
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        image = executor.submit(Document.render, document).result(timeout=60)
+    assert np.array_equal(image, document.render())
+
+def test_text_renderer_without_widgets():
+    """Ensure text is drawn into a BGRA image without creating any widgets."""
+    element = DrawableElement('TextTool',
+                              {'html': '<p>Hello</p>', 'text_color': '#ff0000', 'text_opacity': 1.0,
+                               'font_size': 12, 'width': 80, 'height': 30})
+    render_element(element)
+    assert element.image.shape == (30, 80, 4)
+    opaque = element.image[element.image[:, :, 3] == 255]
+    assert len(opaque) > 0
+    assert (opaque[:, :3] == (0, 0, 255)).all() # red in BGR
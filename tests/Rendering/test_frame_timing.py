@@ -0,0 +1,76 @@
+import numpy as np
+from src.Layers.LayersCache import LayersCache
+from src.Rendering import compositing
+from src.utils.frame_timing import FrameTimer, NULL_STAGE, frame_timer, percentiles
+from src.ZoomableWidget import ZoomableWidget
+
+
+class FakeLayer:
+    """A layer stand-in with just the attributes used by compositing."""
+    def __init__(self, final_image, visible=True):
+        self.final_image = final_image
+        self.visible = visible
+        self.elements = []
+
+def test_disabled_timer_returns_a_no_op():
+    """Ensure the hooks cost nothing but a check while the timer is disabled."""
+    timer = FrameTimer()
+    assert timer.stage('composite') is NULL_STAGE
+    with timer.stage('composite'):
+        pass
+    timer.end_frame()
+    assert len(timer.frame_times) == 0 and timer.stage_times == {}
+
+def test_stages_are_summed_per_frame():
+    """Ensure a stage which runs several times in a frame is added up."""
+    timer = FrameTimer(window=3)
+    timer.set_enabled(True)
+    for _ in range(5):
+        for _ in range(2):
+            with timer.stage('composite'):
+                pass
+        with timer.stage('paint'):
+            pass
+        timer.end_frame()
+    assert len(timer.frame_times) == 3
+    assert len(timer.stage_times['composite']) == 3
+    summary = timer.summary()
+    assert summary['fps'] == 3 # the frames in the window
+    assert summary['stages']['composite']['p50'] <= summary['frame']['p99']
+    assert set(summary['stages']) == {'composite', 'paint'}
+
+def test_percentiles():
+    result = percentiles(list(range(101)))
+    assert (result['p50'], result['p90'], result['p99'], result['last']) == (50, 90, 99, 100)
+    assert percentiles([])['p50'] == 0.0
+
+def test_compositing_is_timed():
+    """Ensure planning and compositing the layers are timed while the timer is enabled."""
+    image = np.full((4, 5, 4), 255, dtype=np.uint8)
+    layers = [FakeLayer(image), FakeLayer(image), FakeLayer(image)]
+    frame_timer.set_enabled(True)
+    try:
+        compositing.composite_layers(layers, LayersCache(), (4, 5))
+        frame_timer.end_frame()
+        assert {'plan', 'composite'} <= set(frame_timer.stage_times)
+    finally:
+        frame_timer.set_enabled(False)
+
+def test_hud_toggle(qtbot):
+    """Ensure the HUD enables the frame timer and lists the stages."""
+    widget = ZoomableWidget()
+    qtbot.addWidget(widget)
+    widget.toggle_hud()
+    try:
+        assert frame_timer.enabled
+        widget.zoomable_label.setImage(np.zeros((20, 30, 4), dtype=np.uint8), notify=False)
+        widget.resize(640, 480)
+        widget.show()
+        qtbot.waitExposed(widget)
+        widget.zoomable_label.update()
+        qtbot.waitUntil(lambda: 'paint' in frame_timer.stage_times)
+        assert any(line.startswith('paint') for line in widget.overlay.hud_lines())
+        assert widget.overlay.hud_contains(widget.overlay.hud_rect().adjusted(2, 2, -2, -2))
+    finally:
+        widget.toggle_hud()
+    assert not frame_timer.enabled
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+from src.DrawableElement import DrawableElement
+from src.Rendering import renderers
+from src.Rendering.TextRenderCache import TextRenderCache
+
+
+def text_element(**changes):
+    instructions = {'html': '<p>Cached</p>', 'text_color': '#00ff00', 'text_opacity': 1.0,
+                    'font_size': 12, 'width': 80, 'height': 30}
+    instructions.update(changes)
+    return DrawableElement('TextTool', instructions)
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = TextRenderCache()
+    monkeypatch.setattr(renderers, 'text_render_cache', cache)
+    return cache
+
+def test_same_text_is_laid_out_once(cache):
+    """Ensure elements with the same instructions share one drawn image and other colors are drawn again."""
+    with patch.object(renderers, 'layout_text', wraps=renderers.layout_text) as layout_text:
+        first, second = text_element(), text_element()
+        renderers.render_element(first)
+        renderers.render_element(second)
+        assert layout_text.call_count == 1
+        assert second.image is first.image and second.touch_mask is first.touch_mask
+        assert not first.image.flags.writeable
+
+        renderers.render_element(text_element(text_color='#0000ff'))
+        assert layout_text.call_count == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert first.size == (30, 80)
+
+def test_least_recently_used_texts_are_evicted():
+    """Ensure the cache keeps at most max_entries texts and within max_bytes, dropping the least recently used."""
+    cache = TextRenderCache(max_entries=2)
+    for name in 'abc':
+        if name == 'c':
+            cache.get(('a',)) # 'a' becomes the most recently used
+        cache.put((name,), np.zeros((2, 2, 4), dtype=np.uint8), np.zeros((2, 2), dtype=np.uint8))
+    assert [key for key, _ in cache.entries()] == [('c',), ('a',)]
+    assert cache.nbytes == 2 * 20
+
+    cache.max_bytes = 30
+    cache.put(('d',), np.zeros((2, 2, 4), dtype=np.uint8), np.zeros((2, 2), dtype=np.uint8))
+    assert [key for key, _ in cache.entries()] == [('d',)]
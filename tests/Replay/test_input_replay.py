@@ -0,0 +1,85 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+from src.Replay.InputTrace import InputEvent, InputRecorder, InputTrace, DOWN, MOVE, UP
+from src.Replay.InputReplayer import InputReplayer
+from src.ZoomableWidget import ZoomableWidget
+
+
+def stroke(tool='PencilTool', points=((5, 5), (6, 7), (8, 9), (10, 12))):
+    """A trace of one stroke through the points on a 20x30 canvas."""
+    (x0, y0), *moves = points
+    events = [InputEvent(0.0, DOWN, x0, y0, tool)]
+    events += [InputEvent(0.01 * (i + 1), MOVE, x, y, tool) for i, (x, y) in enumerate(moves)]
+    events.append(InputEvent(0.01 * (len(moves) + 1), UP, *moves[-1], tool))
+    return InputTrace((20, 30), events)
+
+def test_trace_round_trip(tmp_path):
+    """Ensure a saved trace loads with the same events."""
+    path = str(tmp_path / 'trace.json')
+    trace = stroke()
+    trace.save(path)
+    loaded = InputTrace.load(path)
+    assert loaded.canvas_shape == (20, 30)
+    assert loaded.events == trace.events
+    assert loaded.tools() == ['PencilTool']
+    assert loaded.duration == pytest.approx(0.04)
+
+def test_load_rejects_unknown_versions(tmp_path):
+    path = tmp_path / 'trace.json'
+    path.write_text(json.dumps({'version': 99, 'canvas_shape': [1, 1], 'events': []}))
+    with pytest.raises(ValueError):
+        InputTrace.load(str(path))
+
+def test_recorder_records_the_drawing_signals(qtbot):
+    """Ensure the signals of the canvas are recorded with the active tool until stopped."""
+    widget = ZoomableWidget()
+    qtbot.addWidget(widget)
+    label = widget.zoomable_label
+    image_processor = MagicMock(canvas_shape=(20, 30))
+    image_processor.current_tool = type('PencilTool', (), {})()
+    recorder = InputRecorder(label, image_processor)
+
+    recorder.start()
+    label.start_draw_signal.emit(1, 2)
+    label.draw_signal.emit(3, 4)
+    label.stop_draw_signal.emit(3, 4)
+    trace = recorder.stop()
+    label.draw_signal.emit(5, 6) # not recorded anymore
+
+    assert [(event.kind, event.x, event.y) for event in trace.events] == [(DOWN, 1, 2), (MOVE, 3, 4), (UP, 3, 4)]
+    assert trace.tools() == ['PencilTool']
+    assert trace.canvas_shape == (20, 30)
+    assert not recorder.is_recording()
+
+@pytest.fixture
+def replayer(qtbot) -> InputReplayer:
+    """
+    A replayer feeding a mock ImageProcessor (the ImageProcessor needs the GUI) which
+    draws on the label of a real canvas.
+    """
+    widget = ZoomableWidget()
+    qtbot.addWidget(widget)
+    image_processor = MagicMock()
+    image_processor.zoomable_label = widget.zoomable_label
+    image_processor.tool_manager.tools = {'PencilTool': {'object': MagicMock()}}
+    return InputReplayer(image_processor)
+
+def test_replay_reports_the_latency_of_every_event(replayer: InputReplayer):
+    """Ensure every event is handled in order with the tool of the trace and has a latency."""
+    result = replayer.replay(stroke())
+    summary = result.summary()
+
+    image_processor = replayer.image_processor
+    image_processor.tool_manager.get_tool.assert_called_once_with('PencilTool')
+    image_processor.tool_manager.get_tool.return_value.set_tool.assert_called_once()
+    image_processor.on_mouse_down.assert_called_once_with(5, 5)
+    assert [call.args for call in image_processor.on_mouse_move.call_args_list] == [(6, 7), (8, 9), (10, 12)]
+    image_processor.on_mouse_up.assert_called_once_with(10, 12)
+    assert [summary[kind]['count'] for kind in (DOWN, MOVE, UP, 'all')] == [1, 3, 1, 5]
+    assert 0 < summary['all']['p50'] <= summary['all']['max'] <= summary['elapsed']
+    assert replayer.zoomable_label.original_image.shape[:2] == (20, 30) # a white canvas of the trace size
+
+def test_replay_rejects_tools_which_are_not_loaded(replayer: InputReplayer):
+    with pytest.raises(KeyError):
+        replayer.replay(stroke(tool='MissingTool'))
@@ -0,0 +1,92 @@
+import numpy as np
+from src.Screenshooter.CaptureHistory import CaptureHistory, difference_hash
+from src.Screenshooter.Screenshooter import Screenshooter
+from src.utils.Box import Box
+
+
+def screenshot(value=0, height=120, width=160):
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    image[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+    image[..., 1] = value
+    image[..., 3] = 255
+    return image
+
+def test_identical_screenshots_are_stored_once():
+    """Ensure taking the same screenshot again reuses the existing entry."""
+    history = CaptureHistory()
+    first = history.add(screenshot(1))
+    history.add(screenshot(2))
+    again = history.add(screenshot(1))
+    assert again is first
+    assert len(history) == 2
+    assert history.entries()[0] is first # moved to the front
+    history.close()
+
+def test_oldest_screenshots_are_evicted():
+    """Ensure the history keeps at most max_entries screenshots and stays within max_bytes."""
+    history = CaptureHistory(max_entries=3)
+    entries = [history.add(screenshot(i)) for i in range(5)]
+    assert [entry.id for entry in history.entries()] == [entry.id for entry in entries[:1:-1]]
+    history.close()
+
+    image = screenshot()
+    history = CaptureHistory(max_bytes=2 * image.nbytes, compression_level=0)
+    for i in range(4):
+        history.add(screenshot(i))
+        history.wait()
+    assert 1 <= len(history) < 4
+    assert history.nbytes <= 2 * image.nbytes
+    history.close()
+
+def test_screenshots_are_compressed_in_the_background():
+    """Ensure the screenshots are compressed and restored exactly."""
+    history = CaptureHistory()
+    image = screenshot(7)
+    entry = history.add(image, Box(0, 0, 160, 120), Box(0, 0, 80, 60))
+    history.wait()
+    assert entry.image is None
+    assert entry.nbytes < image.nbytes
+    assert np.array_equal(history.get(entry.id), image)
+    assert history.get(-1) is None
+    history.close()
+
+def test_thumbnail_size():
+    history = CaptureHistory(thumbnail_size=40)
+    entry = history.add(screenshot(height=1080, width=1920))
+    assert entry.thumbnail.shape == (22, 40, 4)
+    history.close()
+
+def test_similar_screenshots_are_merged_with_perceptual_distance():
+    """Ensure screenshots which differ slightly are duplicates only when perceptual_distance > 0."""
+    image = screenshot()
+    similar = image.copy()
+    similar[0, 0, 2] = 255
+    assert difference_hash(image) == difference_hash(similar)
+
+    history = CaptureHistory()
+    history.add(image)
+    history.add(similar)
+    assert len(history) == 2
+    history.close()
+
+    history = CaptureHistory(perceptual_distance=4)
+    history.add(image)
+    history.add(similar)
+    assert len(history) == 1
+    history.close()
+
+def test_open_history_entry(qtbot):
+    """Ensure a screenshot can be reopened from the history."""
+    screenshooter = Screenshooter()
+    qtbot.addWidget(screenshooter.gui)
+    image = screenshot(3)
+    screenshooter.history.add(image, Box(0, 0, 160, 120), Box(0, 0, 160, 120))
+    screenshooter.gui.set_history(screenshooter.history.entries())
+    assert screenshooter.gui.history_list.count() == 1
+
+    screenshooter.gui.on_history_item_clicked(screenshooter.gui.history_list.item(0))
+    qtbot.addWidget(screenshooter.transparent_window)
+    assert np.array_equal(screenshooter.screenshot_image, image)
+    assert screenshooter.capture_region == Box(0, 0, 160, 120)
+    screenshooter.close_screenshot()
+    screenshooter.history.close()
@@ -0,0 +1,131 @@
+import threading
+import time
+import cv2
+import numpy as np
+from src.Screenshooter.CapturePipeline import (CapturePipeline, FrameEncoder, ImageSequenceEncoder,
+                                               SyntheticFrameSource, VideoEncoder, Frame, ScreenFrameSource)
+from src.Screenshooter.ScreenCapture import ScreenCapture
+from src.utils.Box import Box
+
+
+class SlowEncoder(FrameEncoder):
+    """An encoder which falls behind the capture."""
+    def __init__(self):
+        self.indices = []
+
+    def encode(self, frame):
+        time.sleep(0.05)
+        self.indices.append(frame.index)
+
+def test_image_sequence(tmp_path):
+    """Ensure every captured frame is written when the encoders keep up."""
+    encoder = ImageSequenceEncoder(str(tmp_path / 'frames'))
+    pipeline = CapturePipeline(SyntheticFrameSource((40, 60), square_size=8), encoder,
+                               fps=200, max_queue=16, workers=2, max_frames=6)
+    pipeline.start()
+    stats = pipeline.wait()
+    assert stats.captured == 6
+    assert stats.encoded + stats.dropped == 6
+    assert len(list((tmp_path / 'frames').glob('frame_*.png'))) == stats.encoded
+    assert cv2.imread(encoder.path(0), cv2.IMREAD_UNCHANGED).shape == (40, 60, 4)
+
+def test_frames_are_dropped_when_the_queue_is_full():
+    """Ensure a slow encoder makes the pipeline drop and count frames instead of blocking the capture."""
+    encoder = SlowEncoder()
+    pipeline = CapturePipeline(SyntheticFrameSource((20, 20)), encoder,
+                               fps=200, max_queue=1, workers=1, duration=0.3)
+    pipeline.start()
+    stats = pipeline.wait()
+    assert stats.dropped > 0
+    assert stats.captured == stats.encoded + stats.dropped
+    assert encoder.indices == sorted(encoder.indices)
+
+def test_stop():
+    """Ensure a recording without a limit can be stopped."""
+    pipeline = CapturePipeline(SyntheticFrameSource((20, 20)), SlowEncoder(), fps=50)
+    pipeline.start()
+    time.sleep(0.1)
+    assert pipeline.is_running()
+    stats = pipeline.stop()
+    assert not pipeline.is_running()
+    assert stats.captured > 0
+
+def test_video_frames_are_written_in_order(tmp_path):
+    """Ensure the video encoder reorders frames and skips the dropped ones."""
+    encoder = VideoEncoder(str(tmp_path / 'clip.avi'), fps=10, fourcc='MJPG')
+    source = SyntheticFrameSource((32, 48), square_size=8)
+    frames = [Frame(i, i / 10, source.grab()) for i in range(4)]
+    encoder.encode(frames[1])
+    assert encoder.num_written == 0
+    encoder.skip(2)
+    encoder.encode(frames[0])
+    assert encoder.num_written == 2
+    encoder.encode(frames[3])
+    encoder.close()
+    assert encoder.num_written == 3
+    video = cv2.VideoCapture(str(tmp_path / 'clip.avi'))
+    assert int(video.get(cv2.CAP_PROP_FRAME_COUNT)) == 3
+    video.release()
+
+class StillFrameSource(SyntheticFrameSource):
+    """A source whose frames change only every third frame."""
+    def grab(self):
+        image = self.background.copy()
+        image[:8, :8, :3] = (self.num_frames // 3) % 255
+        self.num_frames += 1
+        return image
+
+def test_unchanged_frames_are_skipped(tmp_path):
+    """Ensure the change detector marks identical frames and only changed frames are written."""
+    from src.Screenshooter.TileChangeDetector import TileChangeDetector
+    encoder = ImageSequenceEncoder(str(tmp_path / 'frames'))
+    pipeline = CapturePipeline(StillFrameSource((32, 48)), encoder, fps=500, max_queue=32,
+                               max_frames=9, change_detector=TileChangeDetector(16))
+    pipeline.start()
+    stats = pipeline.wait()
+    assert stats.dropped == 0
+    assert stats.unchanged == 6
+    assert len(list((tmp_path / 'frames').glob('*.png'))) == 3
+
+def test_video_converts_only_changed_regions(tmp_path):
+    """Ensure a frame with known changes updates the last written image."""
+    from src.utils.Box import Box
+    encoder = VideoEncoder(str(tmp_path / 'clip.avi'), fps=10, fourcc='MJPG')
+    first = np.zeros((32, 48, 4), dtype=np.uint8)
+    second = first.copy()
+    second[:16, :16] = 255
+    encoder.encode(Frame(0, 0, first))
+    encoder.encode(Frame(1, 0.1, second, changed=[Box(0, 0, 16, 16)]))
+    assert (encoder.last_image[:16, :16] == 255).all()
+    assert (encoder.last_image[16:] == 0).all()
+    encoder.encode(Frame(2, 0.2, second, changed=[]))
+    encoder.close()
+    assert encoder.num_written == 3
+
+def test_on_finished_is_called_when_the_recording_ends_by_itself():
+    """Ensure the owner of the pipeline is told when max_frames or duration end the capture."""
+    finished = threading.Event()
+    pipeline = CapturePipeline(SyntheticFrameSource((20, 20)), SlowEncoder(), fps=100, duration=0.05,
+                               on_finished=finished.set)
+    pipeline.start()
+    assert finished.wait(5)
+    pipeline.wait()
+
+def test_screen_source_closes_the_session_of_the_capture_thread():
+    """Ensure every recording closes the capture session its thread opened."""
+    class FakeSession:
+        def __init__(self):
+            self.closed = False
+            sessions.append(self)
+        def close(self):
+            self.closed = True
+
+    sessions = []
+    capture = ScreenCapture(factory=FakeSession)
+    capture.grab = lambda region: np.zeros((region.height, region.width, 4), dtype=np.uint8)
+    pipeline = CapturePipeline(ScreenFrameSource(capture, Box(0, 0, 20, 10)), SlowEncoder(), fps=100,
+                               max_frames=2)
+    pipeline.start()
+    assert pipeline.wait().captured == 2
+    assert len(sessions) == 1 and sessions[0].closed
+    assert capture._sessions == []
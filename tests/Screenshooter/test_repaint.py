@@ -0,0 +1,50 @@
+import numpy as np
+from PyQt5.QtCore import QEvent, QPoint, QPointF, QRect, Qt
+from PyQt5.QtGui import QMouseEvent
+from src.Screenshooter.TransparentWindow import TransparentWindow
+from src.utils.Box import Box
+from src.utils.repaint import FrameThrottle, border_region
+
+
+def mouse_event(event_type, widget, pos, buttons=Qt.LeftButton):
+    button = Qt.LeftButton if event_type != QEvent.MouseMove else Qt.NoButton
+    global_pos = QPointF(widget.mapToGlobal(pos))
+    return QMouseEvent(event_type, QPointF(pos), QPointF(pos), global_pos, button, buttons, Qt.NoModifier)
+
+def test_border_region():
+    """Ensure only the ring around the edges of a rectangle is covered."""
+    region = border_region(QRect(10, 10, 100, 50), 2)
+    assert region.contains(QPoint(10, 30))
+    assert region.contains(QPoint(60, 59))
+    assert not region.contains(QPoint(60, 30))
+
+def test_frame_throttle_coalesces_calls(qtbot):
+    """Ensure the first call is immediate and the calls during a frame are coalesced."""
+    calls = []
+    throttle = FrameThrottle(calls.append, interval_ms=20)
+    for i in range(5):
+        throttle.post(i)
+    assert calls == [0]
+    qtbot.waitUntil(lambda: calls == [0, 4], timeout=1000)
+    throttle.post(5)
+    throttle.post(6)
+    throttle.flush()
+    assert calls == [0, 4, 6]
+
+def test_drag_inside_the_box_is_forwarded(qtbot):
+    """Ensure the box is masked to its border and drags inside of it still move it."""
+    window = TransparentWindow(np.zeros((200, 300, 4), dtype=np.uint8), Box(0, 0, 300, 200))
+    qtbot.addWidget(window)
+    window.show()
+    window.set_draggable_widget(Box(50, 50, 100, 80))
+    box = window.draggable_widget
+    assert not box.mask().contains(box.rect().center())
+    assert box.mask().contains(QPoint(1, 1))
+
+    window.mousePressEvent(mouse_event(QEvent.MouseButtonPress, window, QPoint(100, 90)))
+    assert box.dragging
+    window.mouseMoveEvent(mouse_event(QEvent.MouseMove, window, QPoint(110, 95)))
+    window.mouseMoveEvent(mouse_event(QEvent.MouseMove, window, QPoint(120, 100)))
+    window.mouseReleaseEvent(mouse_event(QEvent.MouseButtonRelease, window, QPoint(120, 100), Qt.NoButton))
+    assert not box.dragging
+    assert box.selection == Box(70, 60, 100, 80)
@@ -0,0 +1,77 @@
+import threading
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from src.Screenshooter.ScreenCapture import ScreenCapture
+from src.utils.Box import Box
+
+
+class FakeSession:
+    """A stand-in for mss with two monitors side by side."""
+    instances = []
+
+    def __init__(self):
+        self.monitors = [
+            {'left': 0, 'top': 0, 'width': 300, 'height': 100},
+            {'left': 0, 'top': 0, 'width': 100, 'height': 100},
+            {'left': 100, 'top': 0, 'width': 200, 'height': 80},
+        ]
+        self.grabbed = []
+        self.closed = False
+        FakeSession.instances.append(self)
+
+    def grab(self, region):
+        self.grabbed.append(region)
+        raw = bytearray(np.full((region['height'], region['width'], 4), region['left'] % 256, dtype=np.uint8).tobytes())
+        return SimpleNamespace(raw=raw, width=region['width'], height=region['height'])
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def capture():
+    FakeSession.instances = []
+    capture = ScreenCapture(factory=FakeSession)
+    yield capture
+    capture.close()
+
+def test_monitors(capture):
+    """Ensure the monitors and the virtual screen are enumerated."""
+    assert capture.monitors() == [Box(0, 0, 100, 100), Box(100, 0, 200, 80)]
+    assert capture.virtual_screen() == Box(0, 0, 300, 100)
+    assert capture.monitor_at(150, 10) == 1
+    assert capture.monitor_at(150, 90) is None
+
+def test_grab_only_the_region(capture):
+    """Ensure only the requested region is captured, clipped to the screen."""
+    image = capture.grab(Box(250, 50, 100, 100))
+    assert image.shape == (50, 50, 4)
+    assert FakeSession.instances[0].grabbed == [{'left': 250, 'top': 50, 'width': 50, 'height': 50}]
+    assert capture.grab_monitor(1).shape == (80, 200, 4)
+    with pytest.raises(ValueError):
+        capture.grab(Box(400, 0, 10, 10))
+
+def test_session_is_reused_per_thread(capture):
+    """Ensure one session is opened per thread and closed with the capture."""
+    capture.grab(Box(0, 0, 10, 10))
+    capture.grab(Box(0, 0, 10, 10))
+    assert len(FakeSession.instances) == 1
+    thread = threading.Thread(target=capture.grab, args=(Box(0, 0, 10, 10),))
+    thread.start()
+    thread.join()
+    assert len(FakeSession.instances) == 2
+    capture.close()
+    assert all(session.closed for session in FakeSession.instances)
+
+def test_session_of_a_finished_thread_is_closed(capture):
+    """Ensure the session of a single thread can be closed without closing the others."""
+    capture.grab(Box(0, 0, 10, 10))
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(capture.session))
+    thread.start()
+    thread.join()
+    capture.close_session(sessions[0])
+    assert sessions[0].closed
+    assert not FakeSession.instances[0].closed
+    assert capture._sessions == [FakeSession.instances[0]]
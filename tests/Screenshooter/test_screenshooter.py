@@ -0,0 +1,159 @@
+import cv2
+import numpy as np
+from unittest.mock import patch
+from src.Screenshooter.Screenshooter import Screenshooter
+from src.Screenshooter.TransparentWindow import TransparentWindow
+from src.utils.Box import Box
+from src.config import config
+
+
+def screenshot(height=60, width=80):
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    image[..., 2] = 200 # red
+    image[..., 3] = 255
+    return image
+
+def test_background_shares_the_screenshot_buffer(qtbot):
+    """Ensure the screenshot is shown from memory without copying it."""
+    image = screenshot()
+    window = TransparentWindow(image)
+    qtbot.addWidget(window)
+    qimage = window.screenshot_widget.qimage
+    assert (qimage.width(), qimage.height()) == (80, 60)
+    assert qimage.pixelColor(5, 5).red() == 200
+    image[5, 5] = (255, 0, 0, 255)
+    assert qimage.pixelColor(5, 5).blue() == 255
+
+def test_save_screenshot_async(qtbot, tmp_path):
+    """Ensure the screenshot can be written to disk on a background thread."""
+    screenshooter = Screenshooter()
+    qtbot.addWidget(screenshooter.gui)
+    path = str(tmp_path / 'screenshot.png')
+    screenshooter.save_screenshot_async(path, screenshot()).join()
+    assert tuple(cv2.imread(path)[0, 0]) == (0, 0, 200)
+
+def test_capture_image_on_high_dpi_screen(qtbot):
+    """Ensure the logical selection is mapped to the physical pixels of the screenshot."""
+    image = screenshot(120, 160)
+    image[20:40, 30:50] = (0, 255, 0, 255)
+    captured = []
+    screenshooter = Screenshooter(callback_capture=captured.append)
+    qtbot.addWidget(screenshooter.gui)
+    screenshooter.screenshot_image = image
+    screenshooter.transparent_window = TransparentWindow(image, Box(0, 0, 80, 60))
+    qtbot.addWidget(screenshooter.transparent_window)
+    assert screenshooter.transparent_window.device_pixel_ratio == 2
+    screenshooter.transparent_window.set_draggable_widget(Box(15, 10, 10, 10))
+    screenshooter.capture_image()
+    assert captured[-1].shape == (20, 20, 3)
+    assert (captured[-1] == (0, 255, 0)).all()
+
+def test_selection_preview_is_debounced(qtbot):
+    """Ensure every selection change is previewed but the image is captured once it settles."""
+    image = screenshot()
+    previews, captured = [], []
+    with patch.dict(config['screenshot'], {'preview_debounce_ms': 20}):
+        screenshooter = Screenshooter(callback_capture=captured.append, callback_preview=previews.append)
+    qtbot.addWidget(screenshooter.gui)
+    screenshooter.screenshot_image = image
+    screenshooter.transparent_window = TransparentWindow(image, Box(0, 0, 80, 60))
+    qtbot.addWidget(screenshooter.transparent_window)
+    for left in range(5):
+        screenshooter.transparent_window.draggable_widget.selection = Box(left, 0, 10, 10)
+        screenshooter.preview_selection()
+    assert len(previews) == 5
+    assert previews[-1].base is not None # a view of the screenshot, not a copy
+    assert captured == []
+    qtbot.waitUntil(lambda: len(captured) == 1, timeout=1000)
+    qtbot.wait(50)
+    assert len(captured) == 1
+    assert captured[0].shape == (10, 10, 3)
+
+def test_recapture_updates_only_changed_tiles(qtbot):
+    """Ensure capturing the same region again passes on only the changed tiles."""
+    changed = screenshot()
+    changed[40:45, 10:20] = (255, 255, 255, 255)
+
+    class FakeCapture:
+        def grab(self, region):
+            assert region == Box(0, 0, 80, 60)
+            return changed
+        def close(self):
+            pass
+
+    updates = []
+    screenshooter = Screenshooter(callback_update_regions=lambda image, regions: updates.append(regions),
+                                  capture=FakeCapture())
+    qtbot.addWidget(screenshooter.gui)
+    screenshooter.change_detector.tile_size = 16
+    screenshooter.change_detector.reset(screenshot()) # the image on the canvas
+    screenshooter.selected_screen_region = Box(0, 0, 80, 60)
+    assert screenshooter.recapture() == [Box(0, 32, 32, 16)]
+    assert screenshooter.recapture() == [] # nothing changed since
+    assert updates == [[Box(0, 32, 32, 16)]]
+
+def test_recording_which_ends_by_itself_is_stopped(qtbot, tmp_path):
+    """Ensure the encoder is finalized and the GUI updated when max_duration_sec ends a recording."""
+    class FakeCapture:
+        session = None
+        def grab(self, region):
+            return screenshot(region.height, region.width)
+        def close_session(self, session):
+            pass
+        def close(self):
+            pass
+
+    screenshooter = Screenshooter(capture=FakeCapture())
+    qtbot.addWidget(screenshooter.gui)
+    screenshooter.transparent_window = object()
+    options = dict(config['recording'], fps=50, max_duration_sec=0.1, image_format='png')
+    with patch.dict(config, {'recording': options}), \
+         patch.object(screenshooter, 'get_selected_screen_region', return_value=Box(0, 0, 16, 16)), \
+         patch.object(screenshooter, 'close_screenshot'), \
+         patch.object(screenshooter.gui, 'set_recording') as set_recording:
+        assert screenshooter.start_recording(str(tmp_path / 'frames'))
+        qtbot.waitUntil(lambda: screenshooter.recording is None, timeout=5000)
+    set_recording.assert_called_with(False)
+    assert len(list((tmp_path / 'frames').glob('frame_*.png'))) > 0
+
+def test_recapture_of_a_region_outside_of_the_screen_is_reported(qtbot):
+    """Ensure a region which cannot be captured again is reported instead of raising."""
+    class FakeCapture:
+        def grab(self, region):
+            raise ValueError('The region is outside of the screen')
+        def close(self):
+            pass
+
+    errors = []
+    screenshooter = Screenshooter(callback_error=lambda title, message: errors.append(message),
+                                  capture=FakeCapture())
+    qtbot.addWidget(screenshooter.gui)
+    screenshooter.selected_screen_region = Box(5000, 0, 80, 60)
+    assert screenshooter.recapture() is None
+    assert len(errors) == 1
+
+def test_replaced_document_is_not_recaptured(qtbot):
+    """Ensure recapture does nothing after the captured image was replaced by another document."""
+    screenshooter = Screenshooter(callback_update_regions=lambda image, regions: None)
+    qtbot.addWidget(screenshooter.gui)
+    screenshooter.change_detector.reset(screenshot())
+    screenshooter.selected_screen_region = Box(0, 0, 80, 60)
+    screenshooter.forget_capture()
+    assert screenshooter.recapture() is None
+    assert screenshooter.change_detector.previous is None
+
+def test_recapture_which_replaces_the_document_is_remembered(qtbot):
+    """Ensure a recapture loaded as a new document (e.g. its layer was deleted) can be refreshed again."""
+    class FakeCapture:
+        def grab(self, region):
+            return screenshot()
+        def close(self):
+            pass
+
+    screenshooter = Screenshooter(callback_update_regions=lambda image, regions: screenshooter.forget_capture(),
+                                  capture=FakeCapture())
+    qtbot.addWidget(screenshooter.gui)
+    screenshooter.selected_screen_region = Box(0, 0, 80, 60)
+    assert screenshooter.recapture() # everything changed since there is no baseline
+    assert screenshooter.selected_screen_region == Box(0, 0, 80, 60)
+    assert screenshooter.recapture() == []
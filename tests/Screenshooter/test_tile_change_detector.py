@@ -0,0 +1,35 @@
+import numpy as np
+from src.Screenshooter.TileChangeDetector import TileChangeDetector
+from src.utils.Box import Box
+
+
+def frame(height=50, width=70):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (height, width, 4), dtype=np.uint8)
+
+def test_first_frame_changes_everything():
+    """Ensure all the tiles are reported for the first frame and when the size changes."""
+    detector = TileChangeDetector(16)
+    assert detector.update(frame()).shape == (4, 5)
+    assert detector.update(frame()).sum() == 0
+    assert detector.update(frame(40, 70)).all()
+
+def test_changed_regions():
+    """Ensure only the changed tiles are reported, merged per row and clipped to the frame."""
+    detector = TileChangeDetector(16)
+    image = frame()
+    detector.update(image)
+    changed = image.copy()
+    changed[20, 20] = 0 # tile (1, 1)
+    changed[25, 40, 3] = 0 # tile (1, 2), only the alpha channel
+    changed[49, 69] = 0 # the last (partial) tile
+    assert detector.changed_regions(changed) == [Box(16, 16, 32, 16), Box(64, 48, 6, 2)]
+
+def test_non_contiguous_and_odd_tile_size():
+    """Ensure views of images and tile sizes which are not multiples of 8 are compared."""
+    detector = TileChangeDetector(10)
+    image = frame()
+    detector.update(image[:, :, :3])
+    changed = image.copy()
+    changed[5, 35] = 0
+    assert detector.changed_regions(changed[:, :, :3]) == [Box(30, 0, 10, 10)]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from src.Server.RenderClient import RenderClient
+from src.Server.RenderServer import RenderJob, RenderServer
+
+ELEMENTS = [
+    {'tool': 'PencilTool',
+     'instructions': {'points': [[2, 5], [25, 5]], 'color': [0, 0, 255], 'thickness': 1, 'alpha': 255}},
+]
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = RenderServer(port=0, workers=1, max_queue=8, max_batch_size=4)
+    server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def client(server):
+    return RenderClient(server.port)
+
+def test_render(client):
+    """Ensure the elements are drawn on the image sent to the server."""
+    image = np.full((20, 30, 3), 30, dtype=np.uint8)
+    rendered = client.render(image, ELEMENTS)
+    assert rendered.shape == (20, 30, 4)
+    assert tuple(rendered[5, 10]) == (0, 0, 255, 255)
+    assert tuple(rendered[10, 10]) == (30, 30, 30, 255)
+
+def test_invalid_image(client):
+    """Ensure a job which fails to render is reported to the client."""
+    with pytest.raises(RuntimeError):
+        client.render_encoded(b'not an image', ELEMENTS)
+
+def test_metrics(client):
+    """Ensure the metrics report the completed jobs and their latency."""
+    client.render(np.zeros((10, 10, 3), dtype=np.uint8), [])
+    metrics = client.metrics()
+    assert metrics['completed'] >= 1
+    assert metrics['batches'] >= 1
+    assert metrics['latency_ms']['p50'] > 0
+    assert metrics['throughput_images_per_sec'] > 0
+
+def test_full_queue_is_rejected():
+    """Ensure jobs are refused instead of queued without limit."""
+    server = RenderServer(port=0, workers=1, max_queue=1)
+    try:
+        assert server.submit(RenderJob(b'', [], 'png'))
+        assert not server.submit(RenderJob(b'', [], 'png'))
+        assert server.metrics.snapshot(server.jobs.qsize())['rejected'] == 1
+    finally:
+        server.stop()
@@ -0,0 +1,148 @@
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+'''
+A small benchmark harness. A benchmark is a setup function which prepares the data and
+returns the function to time, so the setup is not measured. The timings are written
+as JSON and compared with a stored baseline to find regressions.
+'''
+
+# name -> setup function returning the function to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], None]]] = {}
+
+
+def register_benchmark(name: str) -> Callable:
+    '''
+    Decorator registering the setup function of a benchmark.
+    '''
+    def decorator(setup: Callable[[], Callable[[], None]]) -> Callable[[], Callable[[], None]]:
+        if name in BENCHMARKS:
+            raise ValueError(f'The benchmark {name} is already registered')
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def time_function(function: Callable[[], None], repeat: int = 5, min_time: float = 0.05) -> dict:
+    '''
+    Time a function. The function is called in batches of `number` calls so that a batch
+    takes at least min_time seconds (calibrated like timeit.autorange).
+
+    Parameters:
+        function: the function to time
+        repeat: the number of batches
+        min_time: the minimum duration of a batch in seconds. 0 makes a single call per batch
+    Returns:
+        dict: the seconds per call (min, median, mean and stdev over the batches) and the
+            number of calls per batch
+    '''
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        # Aim for twice the minimum time to avoid calibrating again
+        number = max(number * 2, int(number * 2 * min_time / max(elapsed, 1e-9)))
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'number': number,
+        'repeat': len(timings),
+    }
+
+
+def run_benchmarks(names: Optional[List[str]] = None, repeat: int = 5, min_time: float = 0.05,
+                   log: Callable[[str], None] = None) -> dict:
+    '''
+    Run benchmarks and collect the results with a description of the machine.
+
+    Parameters:
+        names: the benchmarks to run (all by default)
+        repeat: see time_function
+        min_time: see time_function
+        log: called with a line for every finished benchmark
+    '''
+    results = {}
+    for name in names if names is not None else BENCHMARKS:
+        function = BENCHMARKS[name]()
+        results[name] = time_function(function, repeat=repeat, min_time=min_time)
+        if log is not None:
+            log(f'{name:<50} {format_seconds(results[name]["median"]):>10}')
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'results': results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.25, key: str = 'median') -> dict:
+    '''
+    Compare results with a baseline (both as returned by run_benchmarks).
+
+    Parameters:
+        threshold: a benchmark regressed if it became slower by more than this fraction
+        key: the timing which is compared
+    Returns:
+        dict: name -> {'baseline', 'current', 'ratio', 'status'} for the benchmarks in both.
+            status is 'regression', 'improvement' or 'ok'
+    '''
+    comparison = {}
+    for name, current in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name][key]
+        ratio = current[key] / before if before > 0 else float('inf')
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        comparison[name] = {'baseline': before, 'current': current[key], 'ratio': ratio, 'status': status}
+    return comparison
+
+
+def machine_info() -> dict:
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+    }
+
+
+def load_results(path: str) -> dict:
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def save_results(results: dict, path: str) -> None:
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=4, sort_keys=True)
+        file.write('\n')
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
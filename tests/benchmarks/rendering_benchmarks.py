@@ -0,0 +1,329 @@
+import argparse
+import fnmatch
+import glob
+import os
+import subprocess
+import sys
+from typing import List, Optional
+import cv2
+import numpy as np
+from src.DrawableElement import DrawableElement
+from src.Layers.LayersCache import LayersCache
+from src.Rendering import compositing
+from src.Rendering.Document import DocumentLayer
+from src.Rendering.renderers import draw_pencil
+from src.Replay.InputTrace import InputTrace
+from tests.benchmarks.harness import (BENCHMARKS, register_benchmark, run_benchmarks, compare,
+                                      load_results, save_results, format_seconds)
+
+'''
+Microbenchmarks of the rendering hot paths. Run them from the root of the repository:
+
+    python -m tests.benchmarks.rendering_benchmarks                   # compare with baseline.json
+    python -m tests.benchmarks.rendering_benchmarks -o results.json   # also write the results
+    python -m tests.benchmarks.rendering_benchmarks -k 'overlay_*'    # only some benchmarks
+    python -m tests.benchmarks.rendering_benchmarks --update-baseline # after an intended change
+
+The exit code is 1 if a benchmark became slower than the baseline by more than the threshold.
+The baseline is only meaningful on the machine it was recorded on, so record it there first.
+'''
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+TRACES_DIR = os.path.join(os.path.dirname(__file__), 'traces')
+
+CANVAS_SHAPES = {'480p': (480, 640), '1080p': (1080, 1920), '2160p': (2160, 3840)}
+
+
+def random_image(shape, seed: int = 0, alpha: Optional[int] = None) -> np.ndarray:
+    image = np.random.default_rng(seed).integers(0, 256, (*shape, 4), dtype=np.uint8)
+    if alpha is not None:
+        image[..., 3] = alpha
+    return image
+
+
+def stroke_points(num_points: int, shape, seed: int = 0) -> List[tuple]:
+    '''
+    A random walk across the canvas like a hand drawn stroke.
+    '''
+    height, width = shape
+    steps = np.random.default_rng(seed).normal(0, 12, (num_points, 2))
+    points = np.cumsum(steps, axis=0) + (width / 2, height / 2)
+    points = np.clip(points, 0, (width - 1, height - 1)).astype(int)
+    return [tuple(map(int, point)) for point in points]
+
+
+def pencil_element(points: List[tuple], shape, thickness: int = 5) -> DrawableElement:
+    element = DrawableElement('PencilTool', {'points': points, 'color': (255, 0, 0),
+                                             'thickness': thickness, 'alpha': 255.0})
+    element.size = tuple(shape)
+    return element
+
+
+#############
+# Compositing
+#############
+
+def overlay_images_benchmark(shape):
+    def setup():
+        bottom, top = random_image(shape, 0), random_image(shape, 1)
+        return lambda: compositing.overlay_images(bottom, top)
+    return setup
+
+
+def overlay_element_benchmark(shape):
+    def setup():
+        image = random_image(shape, 0, alpha=255)
+        # An element covering a quarter of the canvas placed in its middle
+        height, width = shape[0] // 2, shape[1] // 2
+        element = DrawableElement('PencilTool', {}, image=random_image((height, width), 1),
+                                  transformation=np.array([[1, 0, width // 2], [0, 1, height // 2]], dtype=np.float32))
+        return lambda: compositing.overlay_element_on_image(image, element)
+    return setup
+
+
+for _label, _shape in CANVAS_SHAPES.items():
+    register_benchmark(f'overlay_images/{_label}')(overlay_images_benchmark(_shape))
+    register_benchmark(f'overlay_element_on_image/{_label}')(overlay_element_benchmark(_shape))
+
+
+##########
+# Layers
+##########
+
+LAYER_SHAPE = CANVAS_SHAPES['480p']
+
+# pattern -> which of n layers are visible
+VISIBILITY_PATTERNS = {
+    'all': lambda i, n: True,
+    'alternate': lambda i, n: i % 2 == 0,
+    'bottom_half': lambda i, n: i < n // 2,
+}
+
+
+def render_layers_benchmark(num_layers: int, pattern: str, cached: bool):
+    '''
+    Composite the layers from scratch or, with cached=True, after changing a single layer in
+    the middle so that the cached unions of the other layers are reused.
+    '''
+    def setup():
+        layers = [DocumentLayer(random_image(LAYER_SHAPE, i, alpha=(255 if i == 0 else 128)))
+                  for i in range(num_layers)]
+        for i, layer in enumerate(layers):
+            layer.visible = VISIBILITY_PATTERNS[pattern](i, num_layers)
+        cache = LayersCache()
+        changed = next(i for i in range(num_layers // 2, -1, -1) if layers[i].visible)
+
+        def run():
+            if cached:
+                cache.invalidate(changed)
+            else:
+                cache.clear()
+            compositing.composite_layers(layers, cache, LAYER_SHAPE)
+        return run
+    return setup
+
+
+for _num_layers in (4, 16):
+    for _pattern in VISIBILITY_PATTERNS:
+        register_benchmark(f'render_layers/{_num_layers}/{_pattern}')(
+            render_layers_benchmark(_num_layers, _pattern, cached=False))
+        register_benchmark(f'render_layers/{_num_layers}/{_pattern}/cached')(
+            render_layers_benchmark(_num_layers, _pattern, cached=True))
+
+
+def overlay_instructions_benchmark(num_layers: int):
+    '''
+    Plan the overlays of all the layers with a cache of unions of neighbouring layers
+    like the cache left by rendering, toggling and editing layers.
+    '''
+    def setup():
+        cache = LayersCache()
+        for start in range(0, num_layers - 1, 3):
+            cache.add_cache((start, start + 1), None)
+        for start in range(0, num_layers - 7, 8):
+            cache.add_cache(tuple(range(start, start + 5)), None)
+        layers_tuple = tuple(i for i in range(num_layers) if i % 7 != 3)
+        return lambda: cache.get_overlay_instructions(layers_tuple)
+    return setup
+
+
+for _num_layers in (8, 32, 128):
+    register_benchmark(f'get_overlay_instructions/{_num_layers}')(overlay_instructions_benchmark(_num_layers))
+
+
+#########
+# Tools
+#########
+
+def pencil_stroke_benchmark(num_points: int):
+    def setup():
+        shape = CANVAS_SHAPES['1080p']
+        element = pencil_element(stroke_points(num_points, shape), shape)
+        return lambda: draw_pencil(element)
+    return setup
+
+
+def is_touched_benchmark(radius: int, hit: bool):
+    '''
+    Hit test a drawn stroke. A miss scans the whole circle around the point (the worst case).
+    '''
+    def setup():
+        shape = CANVAS_SHAPES['1080p']
+        element = pencil_element(stroke_points(100, shape), shape)
+        draw_pencil(element)
+        element.transformation = np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float32)
+        ys, xs = np.nonzero(element.touch_mask)
+        if hit:
+            x, y = int(xs[0]), int(ys[0])
+        else:
+            # A point far away from the stroke
+            distance = cv2.distanceTransform(255 - element.touch_mask, cv2.DIST_L2, 3)
+            y, x = np.unravel_index(np.argmax(distance), distance.shape)
+        return lambda: element.is_touched(int(x), int(y), radius)
+    return setup
+
+
+for _num_points in (10, 50, 200):
+    register_benchmark(f'pencil_stroke/{_num_points}_points')(pencil_stroke_benchmark(_num_points))
+
+for _radius in (2, 10, 30):
+    register_benchmark(f'is_touched/r{_radius}/hit')(is_touched_benchmark(_radius, hit=True))
+    register_benchmark(f'is_touched/r{_radius}/miss')(is_touched_benchmark(_radius, hit=False))
+
+
+###########
+# Startup
+###########
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Build the canvas with the tools like the application does at startup
+STARTUP_SCRIPT = '''
+from PyQt5.QtWidgets import QApplication
+application = QApplication([])
+from src.ZoomableWidget import ZoomableWidget
+from src.ImageProcessor import ImageProcessor
+from src.ImageProcessingToolSetting import ImageProcessingToolSetting
+image_processor = ImageProcessor(ZoomableWidget(), ImageProcessingToolSetting())
+image_processor.show()
+application.processEvents()
+'''
+
+
+_application = None # the QApplication created for the benchmarks if there was none
+
+
+def headless_environment() -> dict:
+    env = dict(os.environ, WITHGUI='1')
+    if not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+@register_benchmark('startup/process')
+def startup_process():
+    '''
+    A new interpreter importing the modules and building the canvas with the tools (cold start).
+    '''
+    env = headless_environment()
+    return lambda: subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=REPOSITORY_DIR, env=env, check=True)
+
+
+@register_benchmark('startup/image_processor')
+def startup_image_processor():
+    '''
+    Building the canvas with the tools once the modules are imported.
+    '''
+    global _application
+    from PyQt5.QtWidgets import QApplication
+    if QApplication.instance() is None:
+        os.environ.update(headless_environment())
+        _application = QApplication([])
+    from src.ZoomableWidget import ZoomableWidget
+    from src.ImageProcessor import ImageProcessor
+    from src.ImageProcessingToolSetting import ImageProcessingToolSetting
+
+    def build():
+        image_processor = ImageProcessor(ZoomableWidget(), ImageProcessingToolSetting())
+        image_processor.show()
+        QApplication.processEvents()
+        image_processor.zoomable_widget.deleteLater()
+        image_processor.deleteLater()
+    return build
+
+
+################
+# Input traces
+################
+
+def replay_benchmark(path: str):
+    '''
+    Replay a recorded input trace (see src/Replay) on a headless ImageProcessor, painting
+    the canvas after every event.
+    '''
+    def setup():
+        from src.Replay.InputReplayer import InputReplayer
+        trace = InputTrace.load(path)
+        replayer = InputReplayer.create_headless()
+        return lambda: replayer.replay(trace)
+    return setup
+
+
+for _path in sorted(glob.glob(os.path.join(TRACES_DIR, '*.json'))):
+    register_benchmark(f'replay/{os.path.splitext(os.path.basename(_path))[0]}')(replay_benchmark(_path))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Run the rendering microbenchmarks.')
+    parser.add_argument('-k', '--filter', action='append', default=None,
+                        help='glob pattern of the benchmarks to run (can be repeated)')
+    parser.add_argument('-o', '--output', default=None, help='write the results to this JSON file')
+    parser.add_argument('-b', '--baseline', default=BASELINE_PATH, help='JSON file with the baseline results')
+    parser.add_argument('-t', '--threshold', type=float, default=0.25,
+                        help='fraction by which a benchmark may be slower than the baseline (default: 0.25)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of timed batches per benchmark')
+    parser.add_argument('--min-time', type=float, default=0.05, help='minimum seconds per batch')
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS
+             if args.filter is None or any(fnmatch.fnmatch(name, pattern) for pattern in args.filter)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+    if not names:
+        print('[benchmarks] No benchmarks match the filter', file=sys.stderr)
+        return 1
+
+    results = run_benchmarks(names, repeat=args.repeat, min_time=args.min_time, log=print)
+    if args.output:
+        save_results(results, args.output)
+    if args.update_baseline:
+        if os.path.exists(args.baseline):
+            # Keep the benchmarks which were not run
+            baseline = load_results(args.baseline)
+            baseline['results'].update(results['results'])
+            results = dict(results, results=baseline['results'])
+        save_results(results, args.baseline)
+        print(f'[benchmarks] Updated the baseline {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'[benchmarks] No baseline at {args.baseline}, run with --update-baseline to create it')
+        return 0
+
+    comparison = compare(results, load_results(args.baseline), args.threshold)
+    regressions = [name for name, row in comparison.items() if row['status'] == 'regression']
+    print(f'\n{"benchmark":<50} {"baseline":>10} {"current":>10} {"ratio":>7}')
+    for name, row in comparison.items():
+        flag = {'regression': '  SLOWER', 'improvement': '  faster'}.get(row['status'], '')
+        print(f'{name:<50} {format_seconds(row["baseline"]):>10} {format_seconds(row["current"]):>10} '
+              f'{row["ratio"]:>6.2f}x{flag}')
+    if regressions:
+        print(f'[benchmarks] {len(regressions)} regressions: {", ".join(regressions)}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import json
+from tests.benchmarks.harness import BENCHMARKS, compare, run_benchmarks, save_results, time_function
+from tests.benchmarks import rendering_benchmarks
+
+# One small case per family so that the suite keeps working without slowing the tests down
+SMALL_CASES = ['overlay_images/480p', 'overlay_element_on_image/480p', 'render_layers/4/alternate/cached',
+               'get_overlay_instructions/8', 'pencil_stroke/10_points', 'is_touched/r2/miss']
+
+def results(**medians):
+    return {'results': {name: {'median': median} for name, median in medians.items()}}
+
+def test_all_families_are_registered():
+    """Ensure every hot path has benchmarks."""
+    families = {name.split('/')[0] for name in BENCHMARKS}
+    assert families == {'overlay_images', 'overlay_element_on_image', 'render_layers',
+                        'get_overlay_instructions', 'pencil_stroke', 'is_touched', 'startup', 'replay'}
+    assert all(name in BENCHMARKS for name in SMALL_CASES)
+
+def test_small_benchmarks_run():
+    """Ensure the benchmarks run and report the timings per call."""
+    output = run_benchmarks(SMALL_CASES, repeat=1, min_time=0)
+    assert set(output['results']) == set(SMALL_CASES)
+    for timing in output['results'].values():
+        assert timing['number'] == 1 and timing['median'] > 0
+    assert 'python' in output['machine']
+
+def test_time_function_calibrates_batches():
+    calls = []
+    timing = time_function(lambda: calls.append(1), repeat=3, min_time=0.001)
+    assert timing['repeat'] == 3
+    assert timing['number'] > 1
+    assert timing['min'] <= timing['median']
+
+def test_compare_flags_regressions():
+    """Ensure benchmarks slower than the threshold are regressions."""
+    comparison = compare(results(a=1.3, b=0.5, c=1.1, new=1.0), results(a=1.0, b=1.0, c=1.0), threshold=0.25)
+    assert {name: row['status'] for name, row in comparison.items()} == \
+        {'a': 'regression', 'b': 'improvement', 'c': 'ok'}
+    assert comparison['a']['ratio'] == 1.3
+
+def test_main_writes_results_and_fails_on_regression(tmp_path):
+    """Ensure the command line writes machine readable results and fails on a regression."""
+    output, baseline = tmp_path / 'results.json', tmp_path / 'baseline.json'
+    save_results(results(**{'get_overlay_instructions/8': 1e-12}), str(baseline))
+    args = ['-k', 'get_overlay_instructions/8', '-r', '1', '--min-time', '0', '-b', str(baseline)]
+    assert rendering_benchmarks.main(args + ['-o', str(output)]) == 1
+    assert 'get_overlay_instructions/8' in json.loads(output.read_text())['results']
+
+    assert rendering_benchmarks.main(args + ['--update-baseline']) == 0
+    assert rendering_benchmarks.main(args + ['-t', '1000']) == 0
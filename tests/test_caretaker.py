@@ -0,0 +1,89 @@
+import pytest
+import zlib
+import numpy as np
+from unittest.mock import patch
+from src.Caretaker import Caretaker, PackedMemento
+from src.Memento import Memento
+
+
+@pytest.fixture
+def mementos_config():
+    return {
+        'max_num_mementos': 5,
+        'num_uncompressed': 2,
+        'compression_level': 1,
+        'spill_threshold_bytes': 1024,
+    }
+
+@pytest.fixture
+def caretaker(mementos_config):
+    with patch.dict('src.Caretaker.config', {'mementos': mementos_config}):
+        yield Caretaker()
+
+def test_undo_redo(caretaker: Caretaker):
+    """Ensure undo and redo walk through the saved mementos."""
+    for i in range(3):
+        caretaker.save('obj', Memento(value=i))
+    assert caretaker.undo('obj').value == 1
+    assert caretaker.undo('obj').value == 0
+    assert caretaker.undo('obj') is None
+    assert caretaker.redo('obj').value == 1
+    assert caretaker.redo('obj').value == 2
+    assert caretaker.redo('obj') is None
+
+def test_unknown_object(caretaker: Caretaker):
+    """Ensure undo and redo return None for objects without mementos."""
+    assert caretaker.undo('unknown') is None
+    assert caretaker.redo('unknown') is None
+
+def test_ring_buffer_drops_oldest(caretaker: Caretaker):
+    """Ensure only the newest max_num_mementos mementos are kept."""
+    for i in range(8):
+        caretaker.save('obj', Memento(value=i))
+    history = caretaker._mementos['obj']
+    assert len(history) == 5
+    assert [history[i].value for i in range(5)] == [3, 4, 5, 6, 7]
+
+def test_save_after_undo_drops_redo_branch(caretaker: Caretaker):
+    """Ensure saving after an undo removes the undone mementos."""
+    for i in range(4):
+        caretaker.save('obj', Memento(value=i))
+    caretaker.undo('obj')
+    caretaker.undo('obj')
+    caretaker.save('obj', Memento(value=10))
+    assert caretaker.redo('obj') is None
+    assert caretaker.undo('obj').value == 1
+
+def test_old_mementos_are_packed(caretaker: Caretaker):
+    """Ensure mementos outside of the recent window are compressed and restored transparently."""
+    for i in range(5):
+        caretaker.save('obj', Memento(value=i))
+    slots = caretaker._mementos['obj']._slots
+    packed = [slot for slot in slots if isinstance(slot, PackedMemento)]
+    assert len(packed) == 3
+    for _ in range(4):
+        memento = caretaker.undo('obj')
+    assert memento.value == 0
+
+def test_large_mementos_are_spilled(caretaker: Caretaker):
+    """Ensure large compressed mementos are spilled to disk and loaded back."""
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (64, 64, 3), dtype=np.uint8) for _ in range(4)]
+    for image in images:
+        caretaker.save('obj', Memento(image=image))
+    spilled = [slot for slot in caretaker._mementos['obj']._slots
+               if isinstance(slot, PackedMemento) and slot.is_spilled]
+    assert len(spilled) == 2
+    caretaker.undo('obj')
+    caretaker.undo('obj')
+    memento = caretaker.undo('obj')
+    assert np.array_equal(memento.image, images[0])
+
+def test_spilled_mementos_are_compressed_once(caretaker: Caretaker):
+    """Ensure a memento spilled to disk is not compressed a second time."""
+    rng = np.random.default_rng(1)
+    with patch('src.Caretaker.zlib.compress', wraps=zlib.compress) as compress:
+        for _ in range(3):
+            caretaker.save('obj', Memento(image=rng.integers(0, 255, (64, 64, 3), dtype=np.uint8)))
+        assert compress.call_count == 1 # only the memento which left the uncompressed window
+    assert caretaker._mementos['obj']._slots[0].is_spilled
@@ -0,0 +1,51 @@
+import os
+import pytest
+from unittest.mock import patch
+from src.utils import icon_cache
+from src.utils.icon_cache import IconCache
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"><rect width="10" height="10" fill="red"/></svg>'
+
+
+@pytest.fixture
+def svg_path(tmp_path):
+    path = tmp_path / 'icon.svg'
+    path.write_text(SVG)
+    return str(path)
+
+def test_svg_is_rasterized_once_per_size(qtbot, svg_path):
+    """Ensure the same path, size and ratio share one pixmap and other sizes are rasterized separately."""
+    cache = IconCache()
+    with patch.object(icon_cache, 'rasterize_svg', wraps=icon_cache.rasterize_svg) as rasterize:
+        first = cache.pixmap(svg_path, (24, 24), device_pixel_ratio=1.0)
+        assert cache.pixmap(svg_path, (24, 24), device_pixel_ratio=1.0) is first
+        cache.icon(svg_path, (24, 24), device_pixel_ratio=1.0)
+        cache.cursor(svg_path, (24, 24), device_pixel_ratio=1.0)
+        assert rasterize.call_count == 1
+
+        high_dpi = cache.pixmap(svg_path, (24, 24), device_pixel_ratio=2.0)
+        assert (high_dpi.width(), high_dpi.devicePixelRatio()) == (48, 2.0)
+        cache.pixmap(svg_path, (16, 16), device_pixel_ratio=1.0)
+        assert rasterize.call_count == 3
+    assert first.toImage().pixelColor(5, 5).red() == 255
+
+def test_cursor_hotspot_defaults_to_lower_left(qtbot, svg_path):
+    cursor = IconCache().cursor(svg_path, (32, 32), device_pixel_ratio=1.0)
+    assert (cursor.hotSpot().x(), cursor.hotSpot().y()) == (0, 31)
+
+def test_icons_persist_between_runs(qtbot, svg_path, tmp_path):
+    """Ensure a new cache reads the stored icons instead of rasterizing them and ignores outdated ones."""
+    directory = str(tmp_path / 'icons')
+    IconCache(directory).pixmap(svg_path, (24, 24), device_pixel_ratio=1.0)
+    assert len(os.listdir(directory)) == 1
+
+    cache = IconCache(directory)
+    pixmap = cache.pixmap(svg_path, (24, 24), device_pixel_ratio=1.0)
+    assert (cache.disk_hits, cache.misses) == (1, 0)
+    assert pixmap.width() == 24
+
+    # Changing the SVG file makes the stored icon outdated
+    os.utime(svg_path, (0, os.path.getmtime(svg_path) + 10))
+    cache = IconCache(directory)
+    cache.pixmap(svg_path, (24, 24), device_pixel_ratio=1.0)
+    assert (cache.disk_hits, cache.misses) == (0, 1)
@@ -0,0 +1,36 @@
+from unittest.mock import MagicMock, patch
+from PyQt5.QtWidgets import QWidget
+from src.ImageProcessingToolSetting import ImageProcessingToolSetting
+from src.ImageProcessingTools.ImageProcessingTool import ImageProcessingTool
+
+
+class SettingsTool(ImageProcessingTool):
+    def create_settings_ui(self):
+        return QWidget()
+
+
+def test_settings_widgets_are_kept_between_switches(qtbot):
+    """Ensure switching back to a tool shows its widget again instead of deleting and rebuilding it."""
+    tool_setting = ImageProcessingToolSetting()
+    qtbot.addWidget(tool_setting)
+    first, second = QWidget(), QWidget()
+
+    tool_setting.set_tool_settings_ui(first)
+    tool_setting.set_tool_settings_ui(second)
+    tool_setting.set_tool_settings_ui(first)
+    assert tool_setting.stack.currentWidget() is first
+    assert tool_setting.stack.indexOf(second) != -1
+    assert tool_setting.stack.count() == 3 # the empty widget and the two settings widgets
+
+    tool_setting.set_tool_settings_ui(None)
+    assert tool_setting.stack.currentWidget() is tool_setting.empty_widget
+    assert tool_setting.current_settings_widget is None
+
+def test_settings_ui_is_created_once(qtbot):
+    """Ensure a tool builds its settings widget on the first activation only."""
+    with patch.object(ImageProcessingTool, 'load_config', return_value={}):
+        tool = SettingsTool(MagicMock())
+    with patch.object(tool, 'create_settings_ui', wraps=tool.create_settings_ui) as create_settings_ui:
+        widget = tool.get_settings_ui()
+        assert tool.get_settings_ui() is widget
+        create_settings_ui.assert_called_once()
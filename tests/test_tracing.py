@@ -0,0 +1,62 @@
+import json
+import threading
+import pytest
+from src.utils.tracing import Tracer, NULL_SPAN
+
+
+def test_disabled_tracer_records_nothing():
+    """Ensure nothing is recorded and spans are a shared no-op while tracing is disabled."""
+    tracer = Tracer(enabled=False)
+    assert tracer.span('render_layers') is NULL_SPAN
+    with tracer.span('render_layers'):
+        pass
+    tracer.instant('click')
+    tracer.begin('stroke')
+    tracer.end('stroke')
+    assert len(tracer.events) == 0
+
+def test_span_records_duration_and_args():
+    tracer = Tracer()
+    with tracer.span('delete_layer', 'layers', layer=3):
+        with tracer.span('render_layers', 'render'):
+            pass
+    inner, outer = tracer.events
+    assert (outer[0], outer[1], outer[2], outer[6]) == ('X', 'delete_layer', 'layers', {'layer': 3})
+    assert outer[3] <= inner[3] and inner[3] + inner[4] <= outer[3] + outer[4] # nested in time
+
+def test_failed_span_records_the_error():
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        with tracer.span('delete_layer', layer=1):
+            raise ValueError
+    assert tracer.events[0][6] == {'layer': 1, 'error': 'ValueError'}
+
+def test_ring_buffer_keeps_the_newest_events():
+    tracer = Tracer(buffer_size=3)
+    for i in range(5):
+        tracer.instant('click', i=i)
+    assert [event[6]['i'] for event in tracer.events] == [2, 3, 4]
+    tracer.set_buffer_size(2)
+    assert [event[6]['i'] for event in tracer.events] == [3, 4]
+
+def test_export_chrome_trace(tmp_path):
+    """Ensure the trace can be loaded in the Chrome trace viewers."""
+    tracer = Tracer()
+    tracer.begin('stroke', 'input', tool='PencilTool')
+    with tracer.span('mouse_move', 'input'):
+        pass
+    tracer.end('stroke', 'input')
+    thread = threading.Thread(target=lambda: tracer.instant('saved', 'project'), name='Saver')
+    thread.start()
+    thread.join()
+
+    path = str(tmp_path / 'trace.json')
+    assert tracer.export_chrome_trace(path) == 4
+    with open(path) as file:
+        trace = json.load(file)
+    events = trace['traceEvents']
+    assert [event['ph'] for event in events[:4]] == ['B', 'X', 'E', 'i']
+    assert events[0]['args'] == {'tool': 'PencilTool'}
+    assert 'dur' in events[1] and events[1]['ts'] >= events[0]['ts']
+    thread_names = [event for event in events if event['ph'] == 'M']
+    assert len(thread_names) == 2